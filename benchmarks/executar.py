@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+import cv2
+import numpy as np
+from benchmarks.sintetico import gerar_video
+from src.utils import EstacionaClassifier
+
+
+def medir(funcao: Callable[[], object], repeticoes: int, aquecimento: int = 1) -> Dict[str, float]:
+    """Mediana, mínimo e p90 em ms de `repeticoes` chamadas (depois do aquecimento)"""
+    for _ in range(aquecimento):
+        funcao()
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    tempos = np.array(tempos)
+    return {
+        "mediana_ms": round(float(np.median(tempos)), 4),
+        "min_ms": round(float(tempos.min()), 4),
+        "p90_ms": round(float(np.percentile(tempos, 90)), 4),
+        "repeticoes": repeticoes,
+    }
+
+
+def _ler_quadros(video_path: Path, n: int) -> List[np.ndarray]:
+    cap = cv2.VideoCapture(str(video_path))
+    quadros = []
+    while len(quadros) < n:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        quadros.append(frame)
+    cap.release()
+    return quadros
+
+
+def _medir_video_processor(video_path: Path, layout_path: Path, quadros: int) -> Dict[str, float] | None:
+    """Quadros por segundo do VideoProcessor completo (sem cadência de exibição)"""
+    try:
+        from PyQt5.QtCore import QCoreApplication
+        from src.interface import VideoProcessor
+    except ImportError:
+        return None
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    processor = VideoProcessor(str(video_path), EstacionaClassifier(layout_path), fps_alvo=0)
+
+    inicio = time.perf_counter()
+    processor.start()
+    # o VideoProcessor volta ao início no fim do vídeo: mede os primeiros `quadros` desenhados
+    while True:
+        app.processEvents()
+        estatisticas = processor.estatisticas()
+        feitos = estatisticas.get("desenhar", {}).get("processados", 0)
+        if feitos >= quadros or processor.isFinished():
+            break
+        time.sleep(0.005)
+    segundos = time.perf_counter() - inicio
+    processor.stop()
+    processor.wait()
+
+    return {
+        "quadros": feitos,
+        "quadros_por_s": round(feitos / segundos, 3),
+        "mediana_ms": round(1000 * segundos / max(feitos, 1), 4),
+    }
+
+
+def _medir_multicamera(video_path: Path, layout_path: Path, cameras: int) -> Dict[str, float]:
+    """Vazão do MotorMultiCamera com `cameras` cópias do vídeo, sem descarte e sem cadência"""
+    from src.multicamera import MotorMultiCamera
+
+    cap = cv2.VideoCapture(str(video_path))
+    fps_video = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    motor = MotorMultiCamera()
+    for k in range(cameras):
+        motor.adicionar_camera(f"camera-{k}", video_path, layout_path, descartar_antigos=False)
+
+    inicio = time.perf_counter()
+    motor.iniciar()
+    motor.aguardar()
+    segundos = time.perf_counter() - inicio
+    motor.parar()
+
+    feitos = sum(e["classificados"] for e in motor.estatisticas().values())
+    por_camera = feitos / cameras / segundos
+    return {
+        "cameras": cameras,
+        "workers": motor.workers,
+        "quadros": feitos,
+        "quadros_por_s": round(feitos / segundos, 3),
+        "quadros_por_s_por_camera": round(por_camera, 3),
+        # cada câmera acompanha o fps do vídeo?
+        "tempo_real": bool(por_camera >= fps_video),
+        "mediana_ms": round(1000 * segundos / max(feitos, 1), 4),
+    }
+
+
+def executar(config: dict, pasta: Path, repeticoes: int) -> dict:
+    gerado = gerar_video(pasta, config["largura"], config["altura"], config["vagas"], config["angulos"],
+                         config["quadros"], troca=config["troca"], semente=config["semente"])
+    video_path, layout_path = gerado["video"], gerado["layout"]
+    quadros = _ler_quadros(video_path, min(config["quadros"], 30))
+    n_vagas = config["vagas"]
+    resultados = {}
+
+    classifier = EstacionaClassifier(layout_path)
+    ciclo = {"i": 0}
+
+    def proximo() -> np.ndarray:
+        ciclo["i"] = (ciclo["i"] + 1) % len(quadros)
+        return quadros[ciclo["i"]]
+
+    resultados["implement_process"] = medir(lambda: classifier.implement_process(proximo()), repeticoes)
+
+    processados = [classifier.implement_process(q) for q in quadros]
+    for modo in EstacionaClassifier.FEATURE_MODES:
+        c = EstacionaClassifier(layout_path, feature_mode=modo)
+
+        def analisar():
+            i = ciclo["i"] = (ciclo["i"] + 1) % len(quadros)
+            c.analisar(quadros[i], processados[i])
+
+        medida = medir(analisar, repeticoes)
+        medida["por_vaga_ms"] = round(medida["mediana_ms"] / n_vagas, 5)
+        resultados[f"analisar[{modo}]"] = medida
+
+    def classificar():
+        i = ciclo["i"] = (ciclo["i"] + 1) % len(quadros)
+        classifier.classificar(quadros[i].copy(), processados[i])
+
+    medida = medir(classificar, repeticoes)
+    medida["por_vaga_ms"] = round(medida["mediana_ms"] / n_vagas, 5)
+    resultados["classificar"] = medida
+
+    vagas = [classifier._normalizar_vaga(v) for v in classifier.posicao_carro_vaga_full]
+
+    def recortes():
+        frame = proximo()
+        for x, y, w, h, angle in vagas:
+            classifier._get_rotated_crop(frame, x, y, w, h, angle)
+
+    medida = medir(recortes, repeticoes)
+    medida["por_vaga_ms"] = round(medida["mediana_ms"] / n_vagas, 5)
+    resultados["_get_rotated_crop"] = medida
+
+    video_processor = _medir_video_processor(video_path, layout_path, min(config["quadros"], 60))
+    if video_processor is not None:
+        resultados["video_processor"] = video_processor
+
+    if config["cameras"]:
+        resultados[f"multicamera[{config['cameras']}]"] = _medir_multicamera(video_path, layout_path,
+                                                                              config["cameras"])
+    return resultados
+
+
+def ambiente() -> dict:
+    return {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparar(atual: dict, baseline: dict, tolerancia: float, metrica: str = "mediana_ms") -> List[str]:
+    """Medidas cuja `metrica` piorou mais que `tolerancia` (fração) em relação ao baseline"""
+    if atual["config"] != baseline["config"]:
+        print("Aviso: configuração diferente da do baseline; a comparação pode não fazer sentido", file=sys.stderr)
+
+    regressoes = []
+    for nome, medida in atual["resultados"].items():
+        referencia = baseline["resultados"].get(nome)
+        if referencia is None:
+            continue
+        if metrica not in medida or metrica not in referencia:
+            continue
+        if medida[metrica] > referencia[metrica] * (1 + tolerancia):
+            regressoes.append(f"{nome}: {medida[metrica]:.3f} ms > {referencia[metrica]:.3f} ms "
+                              f"(+{100 * (medida[metrica] / referencia[metrica] - 1):.1f}%)")
+    return regressoes
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmarks reproduzíveis com estacionamento sintético")
+    parser.add_argument("--largura", type=int, default=1280)
+    parser.add_argument("--altura", type=int, default=720)
+    parser.add_argument("--vagas", type=int, default=60)
+    parser.add_argument("--angulos", default="0,15,-30", help="ângulos por fileira, separados por vírgula")
+    parser.add_argument("--quadros", type=int, default=90, help="quadros do vídeo sintético")
+    parser.add_argument("--troca", type=float, default=0.02, help="probabilidade de troca por vaga e quadro")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--cameras", type=int, default=16,
+                        help="câmeras simultâneas no MotorMultiCamera (0 desliga a medição)")
+    parser.add_argument("-o", "--saida", help="arquivo JSON de resultados (padrão: stdout)")
+    parser.add_argument("--baseline", help="compara com um resultado salvo e falha se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="piora máxima aceita (0.15 = 15%%)")
+    parser.add_argument("--metrica", choices=["mediana_ms", "min_ms", "p90_ms"], default="mediana_ms",
+                        help="medida comparada com o baseline (min_ms é a mais estável em máquinas ruidosas)")
+    parser.add_argument("--pasta", help="onde gerar o vídeo sintético (padrão: pasta temporária)")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = criar_parser().parse_args(argv)
+    config = {
+        "largura": args.largura,
+        "altura": args.altura,
+        "vagas": args.vagas,
+        "angulos": [float(a) for a in args.angulos.split(",")],
+        "quadros": args.quadros,
+        "troca": args.troca,
+        "semente": args.semente,
+        "cameras": args.cameras,
+    }
+
+    if args.pasta:
+        resultados = executar(config, Path(args.pasta), args.repeticoes)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_vagas_") as pasta:
+            resultados = executar(config, Path(pasta), args.repeticoes)
+
+    relatorio = {"config": config, "ambiente": ambiente(), "resultados": resultados}
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        Path(args.saida).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+
+    for nome, medida in resultados.items():
+        print(f"{nome:>22}: {medida['mediana_ms']:9.3f} ms", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressoes = comparar(relatorio, baseline, args.tolerancia, args.metrica)
+        if regressoes:
+            print("Regressões de desempenho:", file=sys.stderr)
+            for linha in regressoes:
+                print(f"  {linha}", file=sys.stderr)
+            return 1
+        print(f"Sem regressões (tolerância {100 * args.tolerancia:.0f}%)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
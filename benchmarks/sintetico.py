@@ -0,0 +1,148 @@
+import argparse
+import json
+import pickle
+from pathlib import Path
+from typing import List, Sequence
+import cv2
+import numpy as np
+from src.layout import salvar_resolucao_referencia
+
+
+def gerar_layout(largura: int, altura: int, n_vagas: int, angulos: Sequence[float] = (0,)) -> List[tuple]:
+    """Vagas (x, y, w, h, angle) em fileiras que cobrem a imagem; o ângulo alterna por fileira"""
+    w = max(8, largura // 18)
+    h = max(4, int(w * 0.45))
+    passo_x = int(w * 1.25)
+    passo_y = int(h * 2.2)
+
+    colunas = max(1, (largura - w) // passo_x)
+    fileiras = max(1, (altura - 2 * h) // passo_y)
+    if n_vagas > colunas * fileiras:
+        raise ValueError(f"{n_vagas} vagas não cabem em {largura}x{altura} (máximo {colunas * fileiras})")
+
+    vagas = []
+    for index in range(n_vagas):
+        fileira, coluna = divmod(index, colunas)
+        angle = angulos[fileira % len(angulos)]
+        vagas.append((w // 4 + coluna * passo_x, h + fileira * passo_y, w, h, angle))
+    return vagas
+
+
+def _poligono(vaga: tuple, encolher: int = 0) -> np.ndarray:
+    x, y, w, h, angle = vaga
+    # mesmo centro e sentido de rotação do desenho em EstacionaClassifier.desenhar_vagas
+    rect = ((x + w // 2, y + h // 2), (w - encolher, h - encolher), angle)
+    return np.int32(cv2.boxPoints(rect))
+
+
+def _fundo(largura: int, altura: int, vagas: List[tuple], rng: np.random.Generator) -> np.ndarray:
+    # asfalto liso visto de cima: a textura fina ficaria acima dos limites de vaga vazia
+    asfalto = rng.normal(85, 4, (altura, largura)).clip(0, 255).astype(np.uint8)
+    asfalto = cv2.GaussianBlur(asfalto, (5, 5), 0)
+    imagem = cv2.cvtColor(asfalto, cv2.COLOR_GRAY2BGR)
+    for vaga in vagas:
+        # faixas pintadas em volta da vaga, fora do recorte analisado (como numa marcação real)
+        folga = max(3, min(vaga[2], vaga[3]) // 8)
+        cv2.polylines(imagem, [_poligono(vaga, -2 * folga)], True, (230, 230, 230), 2)
+    return imagem
+
+
+def _desenhar_carro(imagem: np.ndarray, vaga: tuple, cor: tuple):
+    w, h = vaga[2], vaga[3]
+    margem = max(2, min(w, h) // 6)
+    cv2.fillPoly(imagem, [_poligono(vaga, margem)], cor)
+    cv2.polylines(imagem, [_poligono(vaga, margem)], True, (20, 20, 20), 2)
+
+    # para-brisa e teto dão bordas e textura, como num carro visto de cima
+    x, y, _, _, angle = vaga
+    centro = (x + w // 2, y + h // 2)
+    for fator, tom in ((0.55, 40), (0.3, 200)):
+        rect = (centro, (w * fator, h * 0.6), angle)
+        cv2.fillPoly(imagem, [np.int32(cv2.boxPoints(rect))], (tom, tom, tom))
+
+
+def gerar_video(destino: str | Path, largura: int = 1280, altura: int = 720, n_vagas: int = 60,
+                angulos: Sequence[float] = (0,), quadros: int = 120, fps: float = 30.0,
+                ocupacao: float = 0.5, troca: float = 0.02, ruido: float = 3.0, semente: int = 0) -> dict:
+    """Gera um estacionamento sintético reproduzível (mesma semente -> mesmos arquivos)
+
+    Em `destino` ficam o vídeo (video.avi, MJPG), o layout (estacionamentoPos,
+    estacionamentoPos_full e a resolução de referência) e o gabarito de
+    ocupação por quadro (gabarito.npy, True = vaga livre). `troca` é a
+    probabilidade de cada vaga mudar de estado a cada quadro.
+    """
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semente)
+
+    vagas = gerar_layout(largura, altura, n_vagas, angulos)
+    layout_path = destino / "estacionamentoPos"
+    with open(layout_path, "wb") as f:
+        pickle.dump([(x, y) for x, y, *_ in vagas], f)
+    with open(destino / "estacionamentoPos_full", "wb") as f:
+        pickle.dump(vagas, f)
+    salvar_resolucao_referencia(layout_path, largura, altura)
+
+    fundo = _fundo(largura, altura, vagas, rng)
+    cores = rng.integers(0, 256, (n_vagas, 3))
+    ocupadas = rng.random(n_vagas) < ocupacao
+    gabarito = np.zeros((quadros, n_vagas), dtype=bool)
+
+    video_path = destino / "video.avi"
+    escritor = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (largura, altura))
+    if not escritor.isOpened():
+        raise IOError(f"não foi possível criar o vídeo: {video_path}")
+
+    for quadro in range(quadros):
+        if quadro:
+            trocar = rng.random(n_vagas) < troca
+            ocupadas ^= trocar
+            # carro novo, cor nova
+            cores[trocar] = rng.integers(0, 256, (int(trocar.sum()), 3))
+
+        imagem = fundo.copy()
+        for index in np.flatnonzero(ocupadas):
+            _desenhar_carro(imagem, vagas[index], tuple(int(c) for c in cores[index]))
+        if ruido:
+            imagem = cv2.add(imagem, rng.normal(0, ruido, imagem.shape).astype(np.int8), dtype=cv2.CV_8U)
+
+        escritor.write(imagem)
+        gabarito[quadro] = ~ocupadas
+
+    escritor.release()
+    np.save(destino / "gabarito.npy", gabarito)
+
+    descricao = dict(largura=largura, altura=altura, n_vagas=n_vagas, angulos=list(angulos), quadros=quadros,
+                     fps=fps, ocupacao=ocupacao, troca=troca, ruido=ruido, semente=semente)
+    with open(destino / "sintetico.json", "w", encoding="utf-8") as f:
+        json.dump(descricao, f, indent=2)
+
+    return {"video": video_path, "layout": layout_path, "gabarito": destino / "gabarito.npy", **descricao}
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Gera um vídeo sintético de estacionamento com layout e gabarito")
+    parser.add_argument("destino", help="pasta de saída")
+    parser.add_argument("--largura", type=int, default=1280)
+    parser.add_argument("--altura", type=int, default=720)
+    parser.add_argument("--vagas", type=int, default=60)
+    parser.add_argument("--angulos", default="0", help="ângulos por fileira, separados por vírgula (ex.: 0,15,-30)")
+    parser.add_argument("--quadros", type=int, default=120)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--ocupacao", type=float, default=0.5, help="fração inicial de vagas ocupadas")
+    parser.add_argument("--troca", type=float, default=0.02, help="probabilidade de troca por vaga e quadro")
+    parser.add_argument("--semente", type=int, default=0)
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = criar_parser().parse_args(argv)
+    angulos = [float(a) for a in args.angulos.split(",")]
+    gerado = gerar_video(args.destino, args.largura, args.altura, args.vagas, angulos, args.quadros,
+                         args.fps, args.ocupacao, args.troca, semente=args.semente)
+    print(f"vídeo: {gerado['video']}\nlayout: {gerado['layout']}\ngabarito: {gerado['gabarito']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+import argparse
+import json
+import sys
+import time
+from typing import List
+import numpy as np
+from benchmarks.varredura import CAMPOS_GRUPO, _classificador, extrair_features
+from src.pontuacao import COLUNAS, salvar_pontuador, treinar_arvores, treinar_logistico
+
+
+def _carregar(cache_path: str, gabarito_path: str) -> tuple:
+    with np.load(cache_path) as dados:
+        features = dados["features"]
+        quadros = dados["quadros"]
+    gabarito = np.load(gabarito_path)
+    if gabarito.ndim != 2 or gabarito.shape[1] != features.shape[1]:
+        raise ValueError(f"gabarito {gabarito.shape} não corresponde a {features.shape[1]} vagas")
+    if quadros[-1] >= len(gabarito):
+        raise ValueError(f"gabarito tem {len(gabarito)} quadros, o vídeo chega ao quadro {quadros[-1]}")
+    return features, quadros, gabarito
+
+
+def montar_exemplos(features: np.ndarray, quadros: np.ndarray, gabarito: np.ndarray, layout_path: str,
+                    config: dict, ate: int) -> tuple:
+    """Matriz de decisão e rótulo de cada vaga avaliada nos primeiros `ate` quadros
+
+    O limiar dinâmico depende do estado adaptativo, então os quadros são
+    refeitos em ordem com as regras históricas, como o classificador faria.
+    """
+    classifier = _classificador(layout_path, config)
+    matrizes, rotulos = [], []
+    for frame_idx, matriz in zip(quadros[:ate], features[:ate]):
+        indices, count, decisao = classifier.matriz_decisao(matriz)
+        classifier.aplicar_decisao(indices, count, decisao, matriz)
+        matrizes.append(decisao)
+        rotulos.append(gabarito[frame_idx, indices])
+    return np.concatenate(matrizes), np.concatenate(rotulos)
+
+
+def avaliar_pontuador(features: np.ndarray, quadros: np.ndarray, gabarito: np.ndarray, layout_path: str,
+                      config: dict, pontuador, desde: int) -> dict:
+    """Precisão/recall (vaga livre = positivo) a partir do quadro `desde`, com o estado evoluindo pelo próprio pontuador"""
+    classifier = _classificador(layout_path, config)
+    classifier.pontuador = pontuador
+    vp = fp = fn = vn = 0
+    tempos = []
+    for posicao, (frame_idx, matriz) in enumerate(zip(quadros, features)):
+        indices, count, decisao = classifier.matriz_decisao(matriz)
+        inicio = time.perf_counter()
+        resultado = classifier.aplicar_decisao(indices, count, decisao, matriz)
+        tempos.append(time.perf_counter() - inicio)
+        if posicao < desde:
+            continue
+
+        esperado = gabarito[frame_idx, resultado.ids]
+        vp += int(np.count_nonzero(resultado.is_empty & esperado))
+        fp += int(np.count_nonzero(resultado.is_empty & ~esperado))
+        fn += int(np.count_nonzero(~resultado.is_empty & esperado))
+        vn += int(np.count_nonzero(~resultado.is_empty & ~esperado))
+
+    precisao = vp / (vp + fp) if vp + fp else 0.0
+    recall = vp / (vp + fn) if vp + fn else 0.0
+    return {
+        "pontuador": pontuador.tipo,
+        "precisao": round(precisao, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precisao * recall / (precisao + recall), 4) if precisao + recall else 0.0,
+        "acuracia": round((vp + vn) / max(vp + fp + fn + vn, 1), 4),
+        "ms_pontuacao": round(1000 * float(np.median(tempos)), 4),
+    }
+
+
+def _linha(resultado: dict) -> str:
+    return (f"{resultado['pontuador']:>10}  precisão {resultado['precisao']:.3f}  recall {resultado['recall']:.3f}  "
+            f"f1 {resultado['f1']:.3f}  acurácia {resultado['acuracia']:.3f}  {resultado['ms_pontuacao']:.3f} ms/quadro")
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Treina um pontuador (logístico ou árvores) a partir de quadros rotulados")
+    parser.add_argument("video")
+    parser.add_argument("--layout", default="src/estacionamentoPos", help="arquivo de posições das vagas")
+    parser.add_argument("--gabarito", required=True,
+                        help="rótulos por quadro (.npy, quadros x vagas, True = livre; ver benchmarks.sintetico)")
+    parser.add_argument("--modelo", choices=["logistico", "arvores"], default="logistico")
+    parser.add_argument("-o", "--saida", required=True, help="arquivo .npz do modelo (use com --modelo do lote)")
+    parser.add_argument("--validacao", type=float, default=0.25,
+                        help="fração final dos quadros reservada para validação")
+    parser.add_argument("--l2", type=float, help="regularização (padrão: 1e-3 no logístico, 1.0 nas árvores)")
+    parser.add_argument("--arvores", type=int, default=50)
+    parser.add_argument("--profundidade", type=int, default=3)
+    parser.add_argument("--taxa", type=float, default=0.1, help="taxa de aprendizado das árvores")
+    parser.add_argument("--limite", type=float, default=0.5, help="score mínimo para vaga livre")
+    parser.add_argument("-c", "--config", default="{}",
+                        help="JSON com opções do classificador (escala, roi, feature_mode, pré-processamento)")
+    parser.add_argument("--cache", default=".varredura_cache", help="pasta das features pré-processadas")
+    parser.add_argument("--every-n", type=int, default=1)
+    parser.add_argument("--max-quadros", type=int)
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = criar_parser().parse_args(argv)
+    if not 0 <= args.validacao < 1:
+        print("Erro: --validacao deve estar em [0, 1)", file=sys.stderr)
+        return 2
+
+    config = json.loads(args.config)
+    grupo = {nome: config[nome] for nome in CAMPOS_GRUPO if nome in config}
+    try:
+        cache_path = extrair_features(args.video, args.layout, grupo, args.every_n, args.max_quadros, args.cache)
+        features, quadros, gabarito = _carregar(cache_path, args.gabarito)
+    except (IOError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+
+    ate = max(1, int(round(len(quadros) * (1 - args.validacao))))
+    matriz, rotulos = montar_exemplos(features, quadros, gabarito, args.layout, config, ate)
+    print(f"{len(matriz)} exemplos de {ate} quadros ({np.mean(rotulos):.1%} livres), "
+          f"colunas {', '.join(COLUNAS)}", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    if args.modelo == "logistico":
+        pontuador = treinar_logistico(matriz, rotulos, l2=1e-3 if args.l2 is None else args.l2, limite=args.limite)
+    else:
+        pontuador = treinar_arvores(matriz, rotulos, arvores=args.arvores, profundidade=args.profundidade,
+                                    taxa=args.taxa, l2=1.0 if args.l2 is None else args.l2, limite=args.limite)
+    print(f"Treino em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    salvar_pontuador(pontuador, args.saida)
+
+    # validação nos quadros finais; sem reserva, no próprio treino
+    desde = ate if ate < len(quadros) else 0
+    regras = _classificador(args.layout, config).pontuador
+    for candidato in (regras, pontuador):
+        print(_linha(avaliar_pontuador(features, quadros, gabarito, args.layout, config, candidato, desde)),
+              file=sys.stderr)
+    print(f"Modelo salvo em {args.saida}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
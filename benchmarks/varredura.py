@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+import cv2
+import numpy as np
+from src.amostragem import AmostradorQuadros
+from src.layout import caminho_resolucao
+from src.parametros import ParametrosClassificacao
+from src.utils import EstacionaClassifier
+
+
+# opções do classificador que também podem entrar na grade; mudam as features, como o pré-processamento
+OPCOES_CLASSIFICADOR = ("escala", "roi", "feature_mode")
+CAMPOS_GRUPO = OPCOES_CLASSIFICADOR + ParametrosClassificacao.PRE_PROCESSAMENTO
+
+
+def expandir_grade(grade: Dict[str, list]) -> List[dict]:
+    """Produto cartesiano da grade: uma configuração (dict) por combinação"""
+    validos = set(ParametrosClassificacao.nomes()) | set(OPCOES_CLASSIFICADOR)
+    invalidos = sorted(set(grade) - validos)
+    if invalidos:
+        raise ValueError(f"parâmetros desconhecidos: {', '.join(invalidos)} (válidos: {', '.join(sorted(validos))})")
+
+    nomes = list(grade)
+    return [dict(zip(nomes, valores)) for valores in itertools.product(*(grade[nome] for nome in nomes))]
+
+
+def _classificador(layout_path: str, config: dict) -> EstacionaClassifier:
+    opcoes = {nome: config[nome] for nome in OPCOES_CLASSIFICADOR if nome in config}
+    parametros = ParametrosClassificacao().com(**{k: v for k, v in config.items() if k not in OPCOES_CLASSIFICADOR})
+    return EstacionaClassifier(layout_path, parametros=parametros, **opcoes)
+
+
+def _grupo(config: dict) -> dict:
+    """Parte da configuração que muda as features (e portanto o cache)"""
+    return {nome: config[nome] for nome in CAMPOS_GRUPO if nome in config}
+
+
+def chave_cache(video_path: str, layout_path: str, grupo: dict, every_n: int, max_quadros: int | None) -> str:
+    """Hash do vídeo (caminho, tamanho, mtime), do conteúdo do layout e do grupo de pré-processamento"""
+    h = hashlib.sha256()
+    estatistica = os.stat(video_path)
+    h.update(repr((os.path.abspath(video_path), estatistica.st_size, estatistica.st_mtime_ns)).encode())
+
+    layout_path = Path(layout_path)
+    for caminho in (layout_path, layout_path.with_name(layout_path.name + "_full"),
+                    layout_path.with_name(layout_path.name + "_4points"), caminho_resolucao(layout_path)):
+        h.update(caminho.read_bytes() if caminho.exists() else b"-")
+
+    # valores padrão explícitos ou omitidos dão a mesma chave
+    padrao = {"escala": None, "roi": False, "feature_mode": "spot",
+              **{nome: getattr(ParametrosClassificacao(), nome) for nome in ParametrosClassificacao.PRE_PROCESSAMENTO}}
+    h.update(json.dumps({**padrao, **grupo, "every_n": every_n, "max_quadros": max_quadros}, sort_keys=True).encode())
+    return h.hexdigest()[:20]
+
+
+def extrair_features(video_path: str, layout_path: str, grupo: dict, every_n: int, max_quadros: int | None,
+                     cache_dir: str) -> str:
+    """Decodifica, pré-processa e extrai as features de todos os quadros amostrados de um grupo
+
+    O resultado (features F x N x 5, índices dos quadros e tempos por etapa) fica
+    em `cache_dir`; se a chave já existe nada é recalculado. Tudo o que a decisão
+    lê do quadro pré-processado está nessas features.
+    """
+    caminho = Path(cache_dir) / f"{chave_cache(video_path, layout_path, grupo, every_n, max_quadros)}.npz"
+    if caminho.exists():
+        return str(caminho)
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise IOError(f"não foi possível abrir o vídeo: {video_path}")
+
+    classifier = _classificador(layout_path, grupo)
+    amostrador = AmostradorQuadros(cap, passo=every_n)
+    quadros, features = [], []
+    tempos = {"decode": [], "implement_process": [], "features": []}
+
+    while max_quadros is None or len(quadros) < max_quadros:
+        inicio = time.perf_counter()
+        item = amostrador.ler()
+        decode = time.perf_counter()
+        if item is None:
+            break
+
+        frame_idx, _, frame = item
+        frame = classifier.preparar_quadro(frame)
+        processed_frame = classifier.implement_process(frame)
+        pre = time.perf_counter()
+        features.append(classifier.extrair_features(frame, processed_frame))
+        fim = time.perf_counter()
+
+        quadros.append(frame_idx)
+        tempos["decode"].append(decode - inicio)
+        tempos["implement_process"].append(pre - decode)
+        tempos["features"].append(fim - pre)
+    cap.release()
+
+    if not quadros:
+        raise IOError(f"nenhum quadro lido de {video_path}")
+
+    buffer = io.BytesIO()
+    np.savez(buffer, features=np.stack(features), quadros=np.array(quadros),
+             **{f"ms_{etapa}": 1000 * np.array(t) for etapa, t in tempos.items()})
+
+    # escrita atômica: workers concorrentes nunca leem um cache pela metade
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(prefix=caminho.name, suffix=".tmp", dir=caminho.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+    return str(caminho)
+
+
+def avaliar(cache_path: str, layout_path: str, config: dict, gabarito_path: str) -> dict:
+    """Refaz a decisão quadro a quadro sobre as features em cache e compara com o gabarito
+
+    Positivo = vaga livre (gabarito True). Só entram as vagas avaliadas pelo
+    classificador em cada quadro.
+    """
+    with np.load(cache_path) as dados:
+        features = dados["features"]
+        quadros = dados["quadros"]
+        etapas = {nome[3:]: float(np.median(dados[nome])) for nome in dados.files if nome.startswith("ms_")}
+    gabarito = np.load(gabarito_path)
+
+    if gabarito.ndim != 2 or gabarito.shape[1] != features.shape[1]:
+        raise ValueError(f"gabarito {gabarito.shape} não corresponde a {features.shape[1]} vagas")
+    if quadros[-1] >= len(gabarito):
+        raise ValueError(f"gabarito tem {len(gabarito)} quadros, o vídeo chega ao quadro {quadros[-1]}")
+
+    classifier = _classificador(layout_path, config)
+    vp = fp = fn = vn = 0
+    tempos = []
+    for frame_idx, matriz in zip(quadros, features):
+        inicio = time.perf_counter()
+        resultado = classifier.decidir(matriz)
+        tempos.append(time.perf_counter() - inicio)
+
+        esperado = gabarito[frame_idx, resultado.ids]
+        vp += int(np.count_nonzero(resultado.is_empty & esperado))
+        fp += int(np.count_nonzero(resultado.is_empty & ~esperado))
+        fn += int(np.count_nonzero(~resultado.is_empty & esperado))
+        vn += int(np.count_nonzero(~resultado.is_empty & ~esperado))
+
+    etapas["decidir"] = 1000 * float(np.median(tempos))
+    ms_por_quadro = sum(etapas.values())
+    precisao = vp / (vp + fp) if vp + fp else 0.0
+    recall = vp / (vp + fn) if vp + fn else 0.0
+    return {
+        "config": config,
+        "quadros": len(quadros),
+        "precisao": round(precisao, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precisao * recall / (precisao + recall), 4) if precisao + recall else 0.0,
+        "acuracia": round((vp + vn) / max(vp + fp + fn + vn, 1), 4),
+        "etapas_ms": {nome: round(ms, 3) for nome, ms in etapas.items()},
+        "ms_por_quadro": round(ms_por_quadro, 3),
+        "fps": round(1000 / ms_por_quadro, 2) if ms_por_quadro else 0.0,
+    }
+
+
+def _executar_extracao(tarefa: dict) -> str:
+    return extrair_features(**tarefa)
+
+
+def _executar_avaliacao(tarefa: dict) -> dict:
+    return avaliar(**tarefa)
+
+
+def varrer(video_path: str, layout_path: str, gabarito_path: str, configs: List[dict], workers: int | None = None,
+           cache_dir: str = ".varredura_cache", every_n: int = 1, max_quadros: int | None = None) -> List[dict]:
+    """Avalia cada configuração; features são calculadas uma vez por grupo de pré-processamento
+
+    As duas fases rodam num pool de processos. Os tempos por etapa vêm de
+    processos concorrentes: compare fps entre configurações da mesma varredura,
+    ou use workers=1 para números absolutos.
+    """
+    grupos = {}
+    for config in configs:
+        grupo = _grupo(config)
+        grupos.setdefault(json.dumps(grupo, sort_keys=True), grupo)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tarefas = [dict(video_path=str(video_path), layout_path=str(layout_path), grupo=grupo, every_n=every_n,
+                        max_quadros=max_quadros, cache_dir=str(cache_dir)) for grupo in grupos.values()]
+        caches = dict(zip(grupos, executor.map(_executar_extracao, tarefas)))
+
+        tarefas = [dict(cache_path=caches[json.dumps(_grupo(config), sort_keys=True)], layout_path=str(layout_path),
+                        config=config, gabarito_path=str(gabarito_path)) for config in configs]
+        return list(executor.map(_executar_avaliacao, tarefas))
+
+
+def escolher(resultados: List[dict], precisao_min: float | None = None, recall_min: float | None = None) -> dict | None:
+    """Configuração escolhida; None se nenhuma serve
+
+    Com metas, a mais rápida que atinge precisão e recall mínimos; sem metas,
+    a de melhor f1 (desempate pela velocidade). Configurações que nunca
+    acertam uma vaga livre (recall 0) não são escolhidas.
+    """
+    aceitas = [r for r in resultados if r["recall"] > 0
+               and r["precisao"] >= (precisao_min or 0.0) and r["recall"] >= (recall_min or 0.0)]
+    if not aceitas:
+        return None
+    if precisao_min is None and recall_min is None:
+        return max(aceitas, key=lambda r: (r["f1"], r["fps"]))
+    # empate em velocidade (mesmo pré-processamento): a de melhor f1
+    return max(aceitas, key=lambda r: (r["fps"], r["f1"]))
+
+
+def _valor(texto: str):
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError:
+        return texto
+
+
+def ler_grade(arquivo: str | None, parametros: List[str]) -> Dict[str, list]:
+    """Grade de um JSON ({"nome": [valores]}) mais os -p nome=v1,v2 da linha de comando"""
+    grade = {}
+    if arquivo:
+        with open(arquivo, encoding="utf-8") as f:
+            grade.update(json.load(f))
+    for parametro in parametros:
+        nome, _, valores = parametro.partition("=")
+        if not valores:
+            raise ValueError(f"use nome=v1,v2,...: {parametro}")
+        grade[nome.strip()] = [_valor(v.strip()) for v in valores.split(",")]
+    return grade
+
+
+def _linha(resultado: dict) -> str:
+    config = " ".join(f"{k}={v}" for k, v in resultado["config"].items()) or "(padrão)"
+    return (f"{resultado['fps']:8.1f} q/s  precisão {resultado['precisao']:.3f}  recall {resultado['recall']:.3f}  "
+            f"f1 {resultado['f1']:.3f}  {config}")
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros com precisão/recall e quadros por segundo")
+    parser.add_argument("video")
+    parser.add_argument("--layout", default="src/estacionamentoPos", help="arquivo de posições das vagas")
+    parser.add_argument("--gabarito", required=True,
+                        help="rótulos por quadro (.npy, quadros x vagas, True = livre; ver benchmarks.sintetico)")
+    parser.add_argument("-p", "--parametro", action="append", default=[], metavar="NOME=V1,V2",
+                        help="valores de um parâmetro (repetível), ex.: -p limite_bordas=0.1,0.15 -p escala=0.5,1")
+    parser.add_argument("--grade", help="JSON com {\"parametro\": [valores]}")
+    parser.add_argument("--workers", type=int, help="processos (padrão: número de CPUs)")
+    parser.add_argument("--cache", default=".varredura_cache", help="pasta das features pré-processadas")
+    parser.add_argument("--every-n", type=int, default=1)
+    parser.add_argument("--max-quadros", type=int)
+    parser.add_argument("--precisao-min", type=float,
+                        help="precisão mínima; com metas escolhe a configuração mais rápida que as atinge")
+    parser.add_argument("--recall-min", type=float, help="recall mínimo (sem nenhuma meta: a de melhor f1)")
+    parser.add_argument("-o", "--saida", help="arquivo JSON com todos os resultados")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = criar_parser().parse_args(argv)
+    try:
+        configs = expandir_grade(ler_grade(args.grade, args.parametro))
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+
+    inicio = time.perf_counter()
+    resultados = varrer(args.video, args.layout, args.gabarito, configs, args.workers, args.cache,
+                        args.every_n, args.max_quadros)
+    print(f"{len(configs)} configurações em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    for resultado in sorted(resultados, key=lambda r: (-r["fps"], -r["f1"])):
+        print(_linha(resultado), file=sys.stderr)
+
+    escolhida = escolher(resultados, args.precisao_min, args.recall_min)
+    if escolhida is None:
+        print("Nenhuma configuração atinge as metas de precisão/recall (ou todas têm recall 0)", file=sys.stderr)
+    else:
+        print(f"Escolhida: {_linha(escolhida)}", file=sys.stderr)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"resultados": resultados, "escolhida": escolhida}, f, indent=2, ensure_ascii=False)
+    return 0 if escolhida is not None else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
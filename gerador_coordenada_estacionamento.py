@@ -1,5 +1,6 @@
 import cv2
 from src.utils import Coordinate_denoter
+from src.layout import salvar_resolucao_referencia
 
 def demostration():
     
@@ -11,9 +12,15 @@ def demostration():
     image_path = "src/exemplo.png"
     rect_width, rect_height = coordinate_generator.rect_width, coordinate_generator.rect_height
     
+    # imagem base lida uma única vez; cada quadro desenha numa cópia
+    base_image = cv2.imread(image_path)
+    
+    cv2.namedWindow("Image")
+    cv2.setMouseCallback("Image",coordinate_generator.mouseClick)
+    
     while True:
         
-        image =cv2.imread(image_path)
+        image = base_image.copy()
 
         for pos in coordinate_generator.posicao_carro_vaga: 
             
@@ -24,13 +31,15 @@ def demostration():
         
         cv2.imshow("Image",image)
 
-        cv2.setMouseCallback("Image",coordinate_generator.mouseClick)
-
+        coordinate_generator.salvar_pendentes()
         
         if cv2.waitKey(1) == ord("q"):
             break
 
+    coordinate_generator.salvar_pendentes(forcar=True)
+    altura, largura = base_image.shape[:2]
+    salvar_resolucao_referencia(coordinate_generator.posicao_carro_vaga_path, largura, altura)
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    demostration()
\ No newline at end of file
+    demostration()
@@ -1,11 +1,14 @@
+import argparse
+from typing import List
 import cv2
 import numpy as np
 import pickle
 from src.utils import EstacionaClassifier
+from src.amostragem import AmostradorQuadros, formatar_relatorio
 
 
 
-def parking():
+def parking(passo: int = 1, taxa_alvo: float | None = None):
    
 
     rect_width, rect_height = 107, 48
@@ -15,13 +18,16 @@ def parking():
     classifier = EstacionaClassifier(carro_estaciona_posicao, rect_width, rect_height)
 
     cap = cv2.VideoCapture(video_path)
+    # quadros fora da amostragem são pulados com grab(), sem decodificar
+    amostrador = AmostradorQuadros(cap, passo=passo, taxa_alvo=taxa_alvo)
     while True:
 
-        ret, frame = cap.read()
+        item = amostrador.ler()
 
-        if not ret:
+        if item is None:
             break
         
+        _, _, frame = item
         prosessed_frame = classifier.implement_process(frame)
         
         denoted_image = classifier.classificar(image=frame, imagem_proce=prosessed_frame)
@@ -37,8 +43,30 @@ def parking():
 
     cap.release()
     cv2.destroyAllWindows()
+    
+    if passo > 1 or taxa_alvo:
+        print(formatar_relatorio(amostrador.relatorio()))
         
 
 
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Versão CLI: mostra as vagas livres quadro a quadro")
+    parser.add_argument("--every-n", type=int, default=1, help="classifica um a cada N quadros")
+    parser.add_argument("--max-fps", type=float, help="no máximo F quadros classificados por segundo de vídeo")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if args.every_n < 1:
+        parser.error("--every-n deve ser >= 1")
+    if args.max_fps is not None and args.max_fps <= 0:
+        parser.error("--max-fps deve ser > 0")
+
+    parking(passo=args.every_n, taxa_alvo=args.max_fps)
+    return 0
+
+
 if __name__ == "__main__":
-    parking()
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+import time
+from typing import Callable, Iterator
+import cv2
+
+
+class AmostradorQuadros:
+    """Percorre um vídeo com cap.grab() e só chama retrieve() nos quadros amostrados
+
+    A amostragem é por passo fixo (`passo`), por taxa alvo em quadros por
+    segundo de vídeo (`taxa_alvo`) ou ambos. O timestamp de cada quadro vem de
+    CAP_PROP_POS_MSEC, então a saída mantém o tempo real do vídeo.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, passo: int = 1, taxa_alvo: float | None = None,
+                 primeiro_indice: int = 0):
+        if passo < 1:
+            raise ValueError("passo deve ser >= 1")
+        if taxa_alvo is not None and taxa_alvo <= 0:
+            raise ValueError("taxa_alvo deve ser > 0")
+
+        self.cap = cap
+        self.passo = passo
+        # meio milissegundo de tolerância para timestamps arredondados
+        self.intervalo_ms = 1000.0 / taxa_alvo - 0.5 if taxa_alvo else 0.0
+
+        self.avancados = 0
+        self.decodificados = 0
+        self.segundos_grab = 0.0
+        self.segundos_retrieve = 0.0
+        self.cpu_inicio = time.process_time()
+
+        self.reiniciar(primeiro_indice)
+
+    def reiniciar(self, primeiro_indice: int = 0):
+        """Recomeça a contagem (ex.: depois de voltar o vídeo ao início)"""
+        self.frame_idx = primeiro_indice - 1
+        self._ultimo_ms = None
+
+    def _amostrar(self, t_ms: float) -> bool:
+        if self.frame_idx % self.passo:
+            return False
+        if self._ultimo_ms is not None and t_ms - self._ultimo_ms < self.intervalo_ms:
+            return False
+        return True
+
+    def ler(self, precisa_quadro: Callable[[int], bool] | None = None) -> tuple | None:
+        """Próximo quadro amostrado como (frame_idx, t_ms, frame); None no fim do vídeo
+
+        Se `precisa_quadro(frame_idx)` for falso o retrieve() é pulado e frame vem None
+        (ex.: o resultado daquele quadro já está em cache).
+        """
+        while True:
+            inicio = time.perf_counter()
+            ok = self.cap.grab()
+            self.segundos_grab += time.perf_counter() - inicio
+            if not ok:
+                return None
+
+            self.avancados += 1
+            self.frame_idx += 1
+            t_ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+
+            if not self._amostrar(t_ms):
+                continue
+
+            if precisa_quadro is not None and not precisa_quadro(self.frame_idx):
+                self._ultimo_ms = t_ms
+                return self.frame_idx, t_ms, None
+
+            inicio = time.perf_counter()
+            ok, frame = self.cap.retrieve()
+            self.segundos_retrieve += time.perf_counter() - inicio
+            if not ok:
+                return None
+
+            self.decodificados += 1
+            self._ultimo_ms = t_ms
+            return self.frame_idx, t_ms, frame
+
+    def __iter__(self) -> Iterator[tuple]:
+        while True:
+            item = self.ler()
+            if item is None:
+                return
+            yield item
+
+    def relatorio(self, ms_por_quadro_processado: float | None = None) -> dict:
+        """Quanto a amostragem economizou
+
+        `retrieve_economizado_s` estima a conversão de quadros que não foi feita;
+        com o custo médio do processamento por quadro (`ms_por_quadro_processado`)
+        também estima o tempo de classificação economizado.
+        """
+        pulados = self.avancados - self.decodificados
+        ms_retrieve = 1000 * self.segundos_retrieve / self.decodificados if self.decodificados else 0.0
+
+        relatorio = {
+            "avancados": self.avancados,
+            "decodificados": self.decodificados,
+            "pulados": pulados,
+            "fracao_decodificada": round(self.decodificados / self.avancados, 4) if self.avancados else 0.0,
+            "ms_grab_medio": round(1000 * self.segundos_grab / self.avancados, 3) if self.avancados else 0.0,
+            "ms_retrieve_medio": round(ms_retrieve, 3),
+            "retrieve_economizado_s": round(pulados * ms_retrieve / 1000, 3),
+            "cpu_s": round(time.process_time() - self.cpu_inicio, 3),
+        }
+        if ms_por_quadro_processado is not None:
+            relatorio["processamento_economizado_s"] = round(pulados * ms_por_quadro_processado / 1000, 3)
+        return relatorio
+
+
+def formatar_relatorio(relatorio: dict) -> str:
+    texto = (f"amostragem: {relatorio['decodificados']}/{relatorio['avancados']} quadros decodificados "
+             f"({100 * relatorio['fracao_decodificada']:.1f}%), ~{relatorio['retrieve_economizado_s']:.2f}s de retrieve "
+             f"economizados")
+    if "processamento_economizado_s" in relatorio:
+        texto += f", ~{relatorio['processamento_economizado_s']:.2f}s de processamento economizados"
+    return texto + f", CPU {relatorio['cpu_s']:.2f}s"
@@ -0,0 +1,146 @@
+from typing import List, Sequence, Tuple
+import math
+import cv2
+import numpy as np
+
+
+def ordenar_cantos(pontos: Sequence) -> np.ndarray:
+    """Ordena os 4 cantos em sentido horário começando pelo superior esquerdo"""
+    pts = np.asarray(pontos, dtype=np.float64).reshape(4, 2)
+    centro = pts.mean(axis=0)
+    angulos = np.arctan2(pts[:, 1] - centro[1], pts[:, 0] - centro[0])
+    pts = pts[np.argsort(angulos)]
+
+    inicio = int(np.argmin(pts[:, 0] + pts[:, 1]))
+    return np.roll(pts, -inicio, axis=0)
+
+
+def geometria_retangulo(x: int, y: int, w: int, h: int, angle: float) -> Tuple[np.ndarray, int, int]:
+    """Matriz recorte -> imagem equivalente a EstacionaClassifier._get_rotated_crop"""
+    if angle == 0:
+        M = np.array([[1, 0, x], [0, 1, y], [0, 0, 1]], dtype=np.float64)
+        return M, w, h
+
+    cx, cy = x + w // 2, y + h // 2
+    R = cv2.getRotationMatrix2D((cx, cy), angle, 1.0)
+
+    cos = np.abs(R[0, 0])
+    sin = np.abs(R[0, 1])
+    new_w = int((h * sin) + (w * cos))
+    new_h = int((h * cos) + (w * sin))
+
+    R[0, 2] += (new_w / 2) - cx
+    R[1, 2] += (new_h / 2) - cy
+
+    start_x = (new_w - w) // 2
+    start_y = (new_h - h) // 2
+
+    # recorte -> imagem rotacionada -> imagem original
+    inv = cv2.invertAffineTransform(R)
+    M = np.vstack([inv, [0, 0, 1]])
+    deslocamento = np.array([[1, 0, start_x], [0, 1, start_y], [0, 0, 1]], dtype=np.float64)
+    return M @ deslocamento, w, h
+
+
+def geometria_poligono(pontos: Sequence) -> Tuple[np.ndarray, int, int]:
+    """Homografia recorte -> imagem a partir dos 4 cantos marcados (trata perspectiva)"""
+    pts = ordenar_cantos(pontos)
+
+    lados = np.linalg.norm(pts - np.roll(pts, -1, axis=0), axis=1)
+    w = max(int(round((lados[0] + lados[2]) / 2)), 1)
+    h = max(int(round((lados[1] + lados[3]) / 2)), 1)
+
+    destino = np.array([[0, 0], [w, 0], [w, h], [0, h]], dtype=np.float32)
+    H = cv2.getPerspectiveTransform(destino, pts.astype(np.float32))
+    return H.astype(np.float64), w, h
+
+
+def _refletir(coordenadas: np.ndarray, n: int) -> np.ndarray:
+    """Índices fora de [0, n) refletidos como cv2.BORDER_REFLECT_101"""
+    if n == 1:
+        return np.zeros_like(coordenadas)
+    periodo = 2 * (n - 1)
+    c = np.abs(coordenadas) % periodo
+    return np.where(c >= n, periodo - c, c)
+
+
+class AtlasVagas:
+    """Empacota todas as vagas num único array contíguo com um só cv2.remap por imagem
+
+    Com `margem` > 0 cada recorte ganha uma moldura com os próprios pixels
+    refletidos (BORDER_REFLECT_101): filtros de raio até `margem` aplicados
+    no atlas inteiro dão, dentro de cada recorte, o mesmo que aplicados
+    recorte a recorte.
+    """
+
+    def __init__(self, geometrias: List[Tuple[np.ndarray, int, int] | None], largura_max: int = 2048,
+                 margem: int = 0):
+        self.tamanhos = []
+        self.offsets = []
+        self.margem = margem
+
+        tamanhos = [(g[1], g[2]) if g is not None else (0, 0) for g in geometrias]
+        caixas = [(w + 2 * margem, h + 2 * margem) if w and h else (0, 0) for w, h in tamanhos]
+        area = sum(w * h for w, h in caixas)
+        maior_w = max([w for w, _ in caixas] + [1])
+        largura = min(max(maior_w, int(math.ceil(math.sqrt(max(area, 1))))), max(largura_max, maior_w))
+
+        # empacotamento em prateleiras, mantendo a ordem das vagas
+        ox, oy, altura_prateleira = 0, 0, 0
+        for (w, h), (caixa_w, caixa_h) in zip(tamanhos, caixas):
+            if ox + caixa_w > largura:
+                ox, oy = 0, oy + altura_prateleira
+                altura_prateleira = 0
+            self.offsets.append((ox + margem, oy + margem) if caixa_w else (ox, oy))
+            self.tamanhos.append((w, h))
+            ox += caixa_w
+            altura_prateleira = max(altura_prateleira, caixa_h)
+
+        self.largura = largura
+        self.altura = max(oy + altura_prateleira, 1)
+
+        map_x = np.full((self.altura, self.largura), -1, dtype=np.float32)
+        map_y = np.full((self.altura, self.largura), -1, dtype=np.float32)
+
+        for geometria, (ox, oy), (w, h) in zip(geometrias, self.offsets, self.tamanhos):
+            if geometria is None or w == 0 or h == 0:
+                continue
+            M = geometria[0]
+            u, v = np.meshgrid(_refletir(np.arange(-margem, w + margem), w).astype(np.float64),
+                               _refletir(np.arange(-margem, h + margem), h).astype(np.float64))
+            den = M[2, 0] * u + M[2, 1] * v + M[2, 2]
+            caixa = (slice(oy - margem, oy + h + margem), slice(ox - margem, ox + w + margem))
+            map_x[caixa] = (M[0, 0] * u + M[0, 1] * v + M[0, 2]) / den
+            map_y[caixa] = (M[1, 0] * u + M[1, 1] * v + M[1, 2]) / den
+
+        # mapas em ponto fixo: remap mais rápido
+        self.map1, self.map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def __len__(self) -> int:
+        return len(self.tamanhos)
+
+    def empacotar(self, image: np.ndarray) -> np.ndarray:
+        """Extrai todas as vagas da imagem para o atlas"""
+        return cv2.remap(image, self.map1, self.map2, cv2.INTER_LINEAR,
+                         borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+    def recorte(self, atlas: np.ndarray, index: int) -> np.ndarray:
+        """View da vaga dentro do atlas (sem cópia)"""
+        ox, oy = self.offsets[index]
+        w, h = self.tamanhos[index]
+        return atlas[oy:oy+h, ox:ox+w]
+
+    def rotulos(self, fator: int = 1) -> np.ndarray:
+        """Rótulos do atlas (0 = fora das vagas, i + 1 = vaga i), um por bloco fator x fator"""
+        rotulos = np.zeros((self.altura, self.largura), dtype=np.int32)
+        for index, ((ox, oy), (w, h)) in enumerate(zip(self.offsets, self.tamanhos)):
+            rotulos[oy:oy+h, ox:ox+w] = index + 1
+
+        altura, largura = self.altura // fator, self.largura // fator
+        return rotulos[:altura * fator:fator, :largura * fator:fator]
+
+    def reduzir(self, atlas: np.ndarray, fator: int) -> np.ndarray:
+        """Média por blocos fator x fator, alinhada com rotulos(fator)"""
+        altura, largura = self.altura // fator, self.largura // fator
+        recorte = atlas[:altura * fator, :largura * fator]
+        return cv2.resize(recorte, (largura, altura), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,359 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, TextIO
+import cv2
+from src.amostragem import AmostradorQuadros, formatar_relatorio
+from src.metricas import ExportadorPeriodico, Metricas
+from src.resultado import ResultadoVagas
+from src.utils import EstacionaClassifier
+
+
+CAMPOS_QUADRO = ["video", "frame", "t_ms", "livres", "total", "estado"]
+CAMPOS_INTERVALO = ["video", "inicio_ms", "fim_ms", "quadros", "livres_media",
+                    "livres_min", "livres_max", "total", "estado"]
+
+
+def estado_vagas(resultados: ResultadoVagas | List[tuple], total: int) -> str:
+    """Uma letra por vaga: 'L' livre, 'O' ocupada, '-' não avaliada"""
+    if isinstance(resultados, ResultadoVagas):
+        return resultados.estado()
+
+    estado = ["-"] * total
+    for index, is_empty, _ in resultados:
+        estado[index] = "L" if is_empty else "O"
+    return "".join(estado)
+
+
+def registro_ocupacao(video_path: str | Path, frame_idx: int, t_ms: float,
+                      resultados: ResultadoVagas | List[tuple], total: int) -> dict:
+    """Registro de ocupação de um quadro classificado"""
+    if isinstance(resultados, ResultadoVagas):
+        livres = resultados.livres
+    else:
+        livres = sum(1 for _, is_empty, _ in resultados if is_empty)
+
+    return {
+        "video": str(video_path),
+        "frame": frame_idx,
+        "t_ms": round(t_ms, 1),
+        "livres": livres,
+        "total": total,
+        "estado": estado_vagas(resultados, total),
+    }
+
+
+class EscritorOcupacao:
+    """Escreve registros de ocupação em CSV ou JSON Lines"""
+
+    def __init__(self, saida: TextIO, formato: str, campos: List[str]):
+        self.saida = saida
+        self.formato = formato
+        self.campos = campos
+        self._csv = None
+
+        if formato == "csv":
+            self._csv = csv.DictWriter(saida, fieldnames=campos)
+            self._csv.writeheader()
+
+    def escrever(self, registro: dict):
+        if self._csv is not None:
+            self._csv.writerow(registro)
+        else:
+            self.saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self.saida.flush()
+
+
+class AgregadorIntervalo:
+    """Agrupa os registros por quadro em janelas de tempo fixas"""
+
+    def __init__(self, intervalo_ms: float):
+        self.intervalo_ms = intervalo_ms
+        self._janela = None
+
+    def adicionar(self, registro: dict) -> dict | None:
+        """Acumula o registro; devolve a janela anterior quando ela se fecha"""
+        inicio = (registro["t_ms"] // self.intervalo_ms) * self.intervalo_ms
+        fechada = None
+
+        if self._janela is not None and (self._janela["video"] != registro["video"] or self._janela["inicio"] != inicio):
+            fechada = self.fechar()
+
+        if self._janela is None:
+            self._janela = {"video": registro["video"], "inicio": inicio, "livres": [],
+                            "total": registro["total"], "votos_livre": [0] * registro["total"],
+                            "votos": [0] * registro["total"]}
+
+        janela = self._janela
+        janela["livres"].append(registro["livres"])
+        for index, letra in enumerate(registro["estado"]):
+            if letra != "-":
+                janela["votos"][index] += 1
+                janela["votos_livre"][index] += letra == "L"
+
+        return fechada
+
+    def fechar(self) -> dict | None:
+        janela, self._janela = self._janela, None
+        if janela is None:
+            return None
+
+        # estado majoritário de cada vaga dentro da janela
+        estado = "".join(
+            "-" if votos == 0 else ("L" if 2 * livre > votos else "O")
+            for livre, votos in zip(janela["votos_livre"], janela["votos"])
+        )
+        livres = janela["livres"]
+        return {
+            "video": janela["video"],
+            "inicio_ms": round(janela["inicio"], 1),
+            "fim_ms": round(janela["inicio"] + self.intervalo_ms, 1),
+            "quadros": len(livres),
+            "livres_media": round(sum(livres) / len(livres), 2),
+            "livres_min": min(livres),
+            "livres_max": max(livres),
+            "total": janela["total"],
+            "estado": estado,
+        }
+
+
+def processar_video(video_path: str | Path, layout_path: str | Path, emitir: Callable[[dict], None],
+                    every_n: int = 1, max_fps: float | None = None, **classifier_kwargs) -> dict:
+    """Classifica um vídeo sem desenhar nada, emitindo um registro por quadro classificado"""
+    estatisticas = {"video": str(video_path), "lidos": 0, "classificados": 0, "segundos": 0.0, "erro": None}
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        estatisticas["erro"] = "não foi possível abrir o vídeo"
+        return estatisticas
+
+    classifier = EstacionaClassifier(layout_path, **classifier_kwargs)
+    total = len(classifier.posicao_carro_vaga_full)
+
+    # quadros fora da amostragem só avançam com grab(), sem retrieve()
+    amostrador = AmostradorQuadros(cap, passo=every_n, taxa_alvo=max_fps)
+    segundos_classificando = 0.0
+    inicio = time.perf_counter()
+
+    metricas = classifier.metricas
+    while True:
+        with metricas.medir("decode"):
+            item = amostrador.ler()
+        if item is None:
+            break
+
+        frame_idx, t_ms, frame = item
+        inicio_quadro = time.perf_counter()
+        resultados = classifier.classificar_quadro(frame)
+        segundos_classificando += time.perf_counter() - inicio_quadro
+
+        emitir(registro_ocupacao(video_path, frame_idx, t_ms, resultados, total))
+        estatisticas["classificados"] += 1
+
+    cap.release()
+    classifier.salvar_calibracao()
+    estatisticas["lidos"] = amostrador.avancados
+    estatisticas["segundos"] = time.perf_counter() - inicio
+
+    classificados = estatisticas["classificados"]
+    estatisticas["amostragem"] = amostrador.relatorio(
+        1000 * segundos_classificando / classificados if classificados else None)
+    return estatisticas
+
+
+def _processar_video_em_shards(video_path: str, args: argparse.Namespace, emitir: Callable[[dict], None],
+                               **classifier_kwargs) -> dict:
+    from src.shards import processar_em_shards
+
+    estatisticas = {"video": str(video_path), "lidos": 0, "classificados": 0, "segundos": 0.0, "erro": None}
+
+    every_n = args.every_n
+    if args.max_fps:
+        # faixas independentes precisam de um passo fixo em quadros
+        cap = cv2.VideoCapture(str(video_path))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+        every_n = max(every_n, int(round(fps / args.max_fps)))
+
+    try:
+        for registro in processar_em_shards(video_path, args.layout, workers=args.workers, n_shards=args.shards,
+                                            warmup=args.warmup, every_n=every_n, estatisticas=estatisticas,
+                                            **classifier_kwargs):
+            emitir(registro)
+    except IOError as e:
+        estatisticas["erro"] = str(e)
+
+    return estatisticas
+
+
+def _resumo(estatisticas: dict) -> str:
+    segundos = max(estatisticas["segundos"], 1e-9)
+    return (f"{estatisticas['video']}: {estatisticas['lidos']} quadros lidos, "
+            f"{estatisticas['classificados']} classificados em {estatisticas['segundos']:.2f}s "
+            f"({estatisticas['lidos'] / segundos:.1f} lidos/s, "
+            f"{estatisticas['classificados'] / segundos:.1f} classificados/s)")
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Análise de ocupação de vagas sem interface gráfica")
+    parser.add_argument("videos", nargs="+", help="um ou mais vídeos para analisar")
+    parser.add_argument("--layout", default="src/estacionamentoPos", help="arquivo de posições das vagas")
+    parser.add_argument("--rect-width", type=int, default=107)
+    parser.add_argument("--rect-height", type=int, default=48)
+    parser.add_argument("--feature-mode", choices=EstacionaClassifier.FEATURE_MODES, default="spot")
+    parser.add_argument("--gate-threshold", type=float,
+                        help="só reclassifica vagas cuja diferença média de cinza passar deste valor")
+    parser.add_argument("--refresh-every", type=int, default=30,
+                        help="com --gate-threshold, reclassifica todas as vagas a cada N quadros")
+    parser.add_argument("--escala", type=float,
+                        help="analisa em escala reduzida (ex.: 0.5); layout, kernels e limiares acompanham")
+    parser.add_argument("--tamanho-vaga", type=float,
+                        help="alternativa a --escala: menor lado médio das vagas, em pixels, na análise")
+    parser.add_argument("--roi", action="store_true",
+                        help="pré-processa só a região das vagas (equalização pelo histograma dessa região)")
+    parser.add_argument("--modelo", metavar="ARQUIVO",
+                        help="pontuador treinado (.npz de benchmarks.treinar) no lugar das regras históricas")
+    parser.add_argument("-o", "--saida", default="-", help="arquivo de saída ('-' para stdout)")
+    parser.add_argument("--formato", choices=["csv", "jsonl"],
+                        help="formato de saída (padrão: pela extensão do arquivo, senão csv)")
+    parser.add_argument("--every-n", type=int, default=1, help="classifica um a cada N quadros")
+    parser.add_argument("--max-fps", type=float, help="no máximo F quadros classificados por segundo de vídeo")
+    parser.add_argument("--intervalo", type=float, help="agrega a ocupação em janelas de N segundos")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos em paralelo; > 1 divide cada vídeo em faixas de quadros")
+    parser.add_argument("--shards", type=int,
+                        help="número de faixas por vídeo (padrão: uma a cada 9000 quadros classificados, "
+                             "ao menos --workers)")
+    parser.add_argument("--warmup", type=int, default=300,
+                        help="quadros classificados antes de cada faixa para aquecer o estado adaptativo")
+    parser.add_argument("--metricas", metavar="PASTA",
+                        help="mede cada etapa e exporta metricas.prom (Prometheus) e metricas.json em PASTA")
+    parser.add_argument("--metricas-intervalo", type=float, default=10.0,
+                        help="segundos entre exportações de --metricas")
+    parser.add_argument("--historico", metavar="ARQUIVO",
+                        help="grava só as transições de estado das vagas num histórico compacto (src/historico.py)")
+    parser.add_argument("--confirmacoes", type=int, default=3,
+                        help="com --historico, quadros seguidos para confirmar uma mudança de estado")
+    parser.add_argument("--camera",
+                        help="carrega e salva a calibração desta câmera ao lado do layout "
+                             "(com calibração o --warmup pode ser 0)")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+
+    if args.every_n < 1:
+        parser.error("--every-n deve ser >= 1")
+    if args.max_fps is not None and args.max_fps <= 0:
+        parser.error("--max-fps deve ser > 0")
+    if args.intervalo is not None and args.intervalo <= 0:
+        parser.error("--intervalo deve ser > 0")
+    if args.workers < 1:
+        parser.error("--workers deve ser >= 1")
+    if args.confirmacoes < 1:
+        parser.error("--confirmacoes deve ser >= 1")
+    if not Path(args.layout).exists():
+        parser.error(f"layout não encontrado: {args.layout}")
+    if args.modelo and not Path(args.modelo).exists():
+        parser.error(f"modelo não encontrado: {args.modelo}")
+
+    formato = args.formato
+    if formato is None:
+        formato = "jsonl" if args.saida.endswith((".jsonl", ".json")) else "csv"
+
+    saida = sys.stdout if args.saida == "-" else open(args.saida, "w", newline="", encoding="utf-8")
+    campos = CAMPOS_INTERVALO if args.intervalo else CAMPOS_QUADRO
+    escritor = EscritorOcupacao(saida, formato, campos)
+
+    if args.intervalo:
+        agregador = AgregadorIntervalo(args.intervalo * 1000)
+
+        def emitir(registro: dict):
+            fechada = agregador.adicionar(registro)
+            if fechada is not None:
+                escritor.escrever(fechada)
+    else:
+        agregador = None
+        emitir = escritor.escrever
+
+    historico = None
+    if args.historico:
+        from src.historico import GravadorHistorico
+
+        gravador, video_atual, base_ms = None, None, 0
+        emitir_saida = emitir
+
+        def historico(registro: dict):
+            nonlocal gravador, video_atual, base_ms
+            if gravador is None:
+                gravador = GravadorHistorico(args.historico, registro["total"], confirmacoes=args.confirmacoes)
+            if registro["video"] != video_atual:
+                # vídeos seguidos viram um só histórico, um depois do outro
+                video_atual = registro["video"]
+                base_ms = gravador.ultimo_t or 0
+            gravador.registrar(base_ms + registro["t_ms"], registro["estado"])
+
+        def emitir(registro: dict):
+            historico(registro)
+            emitir_saida(registro)
+
+    metricas, exportador = None, None
+    if args.metricas:
+        metricas = Metricas(ativo=True)
+        exportador = ExportadorPeriodico(metricas, args.metricas, args.metricas_intervalo)
+        exportador.start()
+        if args.workers > 1:
+            # os shards rodam em outros processos, fora do alcance deste registro
+            print("Aviso: --metricas não mede os shards de --workers > 1", file=sys.stderr)
+
+    falhas = 0
+    todas = []
+    try:
+        for video in args.videos:
+            classifier_kwargs = dict(rect_width=args.rect_width, rect_height=args.rect_height,
+                                     feature_mode=args.feature_mode, gate_threshold=args.gate_threshold,
+                                     refresh_every=args.refresh_every, camera=args.camera,
+                                     roi=args.roi, escala=args.escala, tamanho_vaga=args.tamanho_vaga,
+                                     pontuador=args.modelo)
+            if args.workers > 1:
+                estatisticas = _processar_video_em_shards(video, args, emitir, **classifier_kwargs)
+            else:
+                estatisticas = processar_video(video, args.layout, emitir, every_n=args.every_n,
+                                               max_fps=args.max_fps, metricas=metricas, **classifier_kwargs)
+            if agregador is not None:
+                fechada = agregador.fechar()
+                if fechada is not None:
+                    escritor.escrever(fechada)
+
+            if estatisticas["erro"]:
+                falhas += 1
+                print(f"Erro: {video}: {estatisticas['erro']}", file=sys.stderr)
+            else:
+                print(_resumo(estatisticas), file=sys.stderr)
+                if estatisticas.get("amostragem") and estatisticas["amostragem"]["pulados"]:
+                    print(f"  {formatar_relatorio(estatisticas['amostragem'])}", file=sys.stderr)
+            todas.append(estatisticas)
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+        if exportador is not None:
+            exportador.parar()
+        if historico is not None and gravador is not None:
+            gravador.fechar()
+            print(f"Histórico: {gravador.transicoes_gravadas} transições de {gravador.observacoes} quadros "
+                  f"em {args.historico}", file=sys.stderr)
+
+    if len(todas) > 1:
+        print(_resumo({
+            "video": "total",
+            "lidos": sum(e["lidos"] for e in todas),
+            "classificados": sum(e["classificados"] for e in todas),
+            "segundos": sum(e["segundos"] for e in todas),
+        }), file=sys.stderr)
+
+    return 1 if falhas else 0
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.calibracao import hash_layout
+from src.resultado import ResultadoVagas
+
+
+# custo fixo aproximado de cada entrada (tupla, chave, arrays vazios)
+_SOBRECARGA_BYTES = 256
+
+
+def identidade_video(video_path: str) -> tuple:
+    """Caminho absoluto, tamanho e mtime: muda se o arquivo for trocado"""
+    estatistica = os.stat(video_path)
+    return os.path.abspath(video_path), estatistica.st_size, estatistica.st_mtime_ns
+
+
+def assinatura_classificador(classifier) -> str:
+    """Hash do layout e de tudo que muda a decisão (parâmetros, pontuador, escala, modo, gate)"""
+    opcoes = {
+        "layout": hash_layout(classifier),
+        "parametros": classifier.parametros.como_dict(),
+        "escala": classifier.escala,
+        "roi": classifier.roi,
+        "feature_mode": classifier.feature_mode,
+        "gate": [classifier.gate_threshold, classifier.refresh_every],
+        "pontuador": classifier.pontuador.assinatura(),
+    }
+    return hashlib.sha256(json.dumps(opcoes, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CacheResultados:
+    """Resultados por quadro com despejo LRU por orçamento de bytes
+
+    A chave é (identidade do vídeo, índice do quadro, assinatura do
+    classificador). Cada entrada guarda a decisão compacta (ids, is_empty,
+    score, sem as features) e, se houver espaço, o quadro já desenhado e
+    reduzido para exibição. Para caber no orçamento saem primeiro os quadros
+    desenhados mais antigos; decisões só saem quando não resta nenhum quadro.
+    Num vídeo em loop maior que o orçamento o LRU descarta justamente o que
+    volta primeiro, então o orçamento deve cobrir ao menos as decisões do vídeo.
+    """
+
+    def __init__(self, orcamento_bytes: int = 256 * 2 ** 20):
+        self.orcamento_bytes = orcamento_bytes
+        self._resultados = OrderedDict()
+        self._quadros = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.acertos_quadro = 0
+        self.despejos = 0
+
+    def obter(self, chave: tuple) -> ResultadoVagas | None:
+        with self._lock:
+            entrada = self._resultados.get(chave)
+            if entrada is None:
+                self.faltas += 1
+                return None
+            self._resultados.move_to_end(chave)
+            self.acertos += 1
+
+        ids, is_empty, score, total = entrada[0]
+        return ResultadoVagas(ids.astype(np.int64), is_empty, score, np.empty((len(ids), 0)), total)
+
+    def guardar(self, chave: tuple, resultado: ResultadoVagas):
+        entrada = (resultado.ids.astype(np.int32), resultado.is_empty.copy(), resultado.score.copy(), resultado.total)
+        tamanho = entrada[0].nbytes + entrada[1].nbytes + entrada[2].nbytes + _SOBRECARGA_BYTES
+        with self._lock:
+            self._inserir(self._resultados, chave, entrada, tamanho)
+
+    def tem_quadro(self, chave: tuple, tamanho_exibicao: tuple | None) -> bool:
+        """Consulta sem contar acerto nem mexer na ordem do LRU"""
+        with self._lock:
+            entrada = self._quadros.get(chave)
+            return entrada is not None and entrada[0][0] == tamanho_exibicao
+
+    def obter_quadro(self, chave: tuple, tamanho_exibicao: tuple | None) -> tuple | None:
+        """(quadro desenhado, largura, altura originais) para o mesmo tamanho de exibição"""
+        with self._lock:
+            entrada = self._quadros.get(chave)
+            if entrada is None or entrada[0][0] != tamanho_exibicao:
+                return None
+            self._quadros.move_to_end(chave)
+            self.acertos_quadro += 1
+            return entrada[0][1]
+
+    def guardar_quadro(self, chave: tuple, tamanho_exibicao: tuple | None, quadro: np.ndarray,
+                       largura: int, altura: int):
+        tamanho = quadro.nbytes + _SOBRECARGA_BYTES
+        if tamanho > self.orcamento_bytes:
+            return
+        with self._lock:
+            self._inserir(self._quadros, chave, (tamanho_exibicao, (quadro, largura, altura)), tamanho)
+
+    def _inserir(self, tabela: OrderedDict, chave: tuple, entrada, tamanho: int):
+        anterior = tabela.pop(chave, None)
+        if anterior is not None:
+            self.bytes -= anterior[1]
+        tabela[chave] = (entrada, tamanho)
+        self.bytes += tamanho
+        self._despejar()
+
+    def _despejar(self):
+        while self.bytes > self.orcamento_bytes and (self._quadros or self._resultados):
+            tabela = self._quadros if self._quadros else self._resultados
+            _, (_, tamanho) = tabela.popitem(last=False)
+            self.bytes -= tamanho
+            self.despejos += 1
+
+    def limpar(self):
+        with self._lock:
+            self._resultados.clear()
+            self._quadros.clear()
+            self.bytes = 0
+
+    def estado(self) -> dict:
+        with self._lock:
+            # quadro desenhado reaproveitado também é acerto (nem chega a consultar a decisão)
+            acertos = self.acertos + self.acertos_quadro
+            consultas = acertos + self.faltas
+            return {
+                "resultados": len(self._resultados),
+                "quadros": len(self._quadros),
+                "mb": round(self.bytes / 2 ** 20, 2),
+                "orcamento_mb": round(self.orcamento_bytes / 2 ** 20, 2),
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": round(acertos / consultas, 4) if consultas else 0.0,
+                "quadros_reaproveitados": self.acertos_quadro,
+                "despejos": self.despejos,
+            }
@@ -0,0 +1,85 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+import numpy as np
+
+
+def hash_layout(classifier) -> str:
+    """Impressão digital da geometria que o classificador realmente usa
+
+    Cobre as transformações de todas as vagas (retângulos, ângulos e polígonos de
+    4 pontos), o tamanho padrão das vagas e o que muda os counts aprendidos
+    (pré-processamento, escala, roi); qualquer edição no layout muda o hash.
+    """
+    h = hashlib.sha256()
+    h.update(repr((classifier.rect_width, classifier.rect_height, classifier.estado.janela)).encode())
+    # referências de count dependem do pré-processamento
+    h.update(repr(classifier.parametros.pre_processamento()).encode())
+    # escala e roi mudam a contagem de pixels de cada vaga (referências ~4x menores em escala 0.5)
+    h.update(repr(("escala", float(classifier.escala), "roi", classifier.roi, classifier.ROI_MARGEM)).encode())
+    for geometria in classifier._geometrias:
+        if geometria is None:
+            h.update(b"-")
+            continue
+        matriz, largura, altura = geometria
+        h.update(np.ascontiguousarray(matriz, dtype=np.float64).tobytes())
+        h.update(repr((largura, altura)).encode())
+    return h.hexdigest()[:16]
+
+
+def caminho_calibracao(layout_path: str | Path, camera: str) -> Path:
+    """Arquivo de calibração ao lado do layout: <layout>.calib.<camera>.npz"""
+    nome = re.sub(r"[^\w.-]", "_", camera) or "camera"
+    layout_path = Path(layout_path)
+    return layout_path.with_name(f"{layout_path.name}.calib.{nome}.npz")
+
+
+def salvar_calibracao(classifier, camera: str) -> Path:
+    """Grava referências de vaga vazia e janelas de counts (escrita atômica)"""
+    caminho = caminho_calibracao(classifier.posicao_carro_vaga_path, camera)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, layout_hash=np.array(hash_layout(classifier)), camera=np.array(camera),
+                        **classifier.estado.snapshot())
+
+    fd, temporario = tempfile.mkstemp(prefix=caminho.name, suffix=".tmp", dir=caminho.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+    return caminho
+
+
+def carregar_calibracao(classifier, camera: str) -> bool:
+    """Restaura a calibração da câmera se ela foi gerada com o mesmo layout
+
+    Calibrações de outro layout (hash diferente) são ignoradas e serão
+    sobrescritas no próximo salvamento.
+    """
+    caminho = caminho_calibracao(classifier.posicao_carro_vaga_path, camera)
+    if not caminho.exists():
+        return False
+
+    try:
+        with np.load(caminho) as arquivo:
+            dados = {nome: arquivo[nome] for nome in arquivo.files}
+    except Exception as e:
+        print(f"Erro: {e}\nCalibração ilegível ignorada: {caminho}")
+        return False
+
+    if str(dados.pop("layout_hash")) != hash_layout(classifier) or str(dados.pop("camera")) != camera:
+        print(f"Calibração de outro layout ou configuração (escala, roi) ignorada: {caminho}")
+        return False
+
+    try:
+        classifier.estado.restaurar(dados)
+    except (KeyError, ValueError) as e:
+        print(f"Erro: {e}\nCalibração incompatível ignorada: {caminho}")
+        return False
+    return True
@@ -0,0 +1,111 @@
+import io
+from pathlib import Path
+import numpy as np
+
+
+class EstadoVagas:
+    """Estado adaptativo de todas as vagas em arrays NumPy pré-alocados
+
+    - contagens: buffer circular vagas x janela com os últimos counts de cada vaga
+    - referencia: EMA do count quando a vaga foi vista vazia (empty_reference)
+    - ultimo_score / ultima_decisao: resultado da última classificação
+
+    Todas as atualizações recebem um vetor de índices de vagas e são feitas em lote.
+    """
+
+    VERSAO = 1
+
+    def __init__(self, n_vagas: int, janela: int = 30):
+        self.n_vagas = n_vagas
+        self.janela = janela
+
+        self.contagens = np.zeros((n_vagas, janela), dtype=np.int32)
+        self.cursor = np.zeros(n_vagas, dtype=np.int32)
+        self.preenchidas = np.zeros(n_vagas, dtype=np.int32)
+
+        self.referencia = np.zeros(n_vagas, dtype=np.int64)
+        self.tem_referencia = np.zeros(n_vagas, dtype=bool)
+
+        self.ultimo_score = np.zeros(n_vagas, dtype=np.float64)
+        self.ultima_decisao = np.zeros(n_vagas, dtype=bool)
+        self.avaliada = np.zeros(n_vagas, dtype=bool)
+
+    def registrar_contagens(self, indices: np.ndarray, contagens: np.ndarray):
+        """Acrescenta um count por vaga ao buffer circular (O(1) por vaga)"""
+        self.contagens[indices, self.cursor[indices]] = contagens
+        self.cursor[indices] = (self.cursor[indices] + 1) % self.janela
+        self.preenchidas[indices] = np.minimum(self.preenchidas[indices] + 1, self.janela)
+
+    def threshold_dinamico(self, indices: np.ndarray, std: np.ndarray,
+                           threshold_base: float, threshold_margin: float) -> np.ndarray:
+        """Referência de vaga vazia com margem, ou o limiar base ajustado pelo desvio padrão"""
+        com_referencia = self.referencia[indices] * (1 + threshold_margin)
+        sem_referencia = threshold_base * (1 + std / 100)
+        limiar = np.where(self.tem_referencia[indices], com_referencia, sem_referencia)
+        return np.trunc(limiar).astype(np.int64)
+
+    def atualizar_referencia(self, indices: np.ndarray, contagens: np.ndarray):
+        """EMA 0.9/0.1 do count das vagas vistas vazias; a primeira observação inicializa"""
+        anterior = self.referencia[indices]
+        ema = np.trunc(0.9 * anterior + 0.1 * contagens).astype(np.int64)
+        self.referencia[indices] = np.where(self.tem_referencia[indices], ema, contagens)
+        self.tem_referencia[indices] = True
+
+    def registrar_resultado(self, indices: np.ndarray, scores: np.ndarray, decisoes: np.ndarray):
+        self.ultimo_score[indices] = scores
+        self.ultima_decisao[indices] = decisoes
+        self.avaliada[indices] = True
+
+    def historico(self, index: int) -> list:
+        """Counts da janela de uma vaga em ordem cronológica"""
+        n = int(self.preenchidas[index])
+        inicio = (int(self.cursor[index]) - n) % self.janela
+        ordem = (inicio + np.arange(n)) % self.janela
+        return self.contagens[index, ordem].tolist()
+
+    def _arrays(self) -> dict:
+        return {
+            "versao": np.array([self.VERSAO, self.n_vagas, self.janela], dtype=np.int64),
+            "contagens": self.contagens,
+            "cursor": self.cursor,
+            "preenchidas": self.preenchidas,
+            "referencia": self.referencia,
+            "tem_referencia": self.tem_referencia,
+            "ultimo_score": self.ultimo_score,
+            "ultima_decisao": self.ultima_decisao,
+            "avaliada": self.avaliada,
+        }
+
+    def snapshot(self) -> dict:
+        """Cópia de todos os arrays (para restaurar depois)"""
+        return {nome: array.copy() for nome, array in self._arrays().items()}
+
+    def restaurar(self, snapshot: dict):
+        versao, n_vagas, janela = (int(v) for v in snapshot["versao"])
+        if versao != self.VERSAO:
+            raise ValueError(f"versão de estado não suportada: {versao}")
+        if (n_vagas, janela) != (self.n_vagas, self.janela):
+            raise ValueError(f"estado de {n_vagas} vagas / janela {janela} incompatível com "
+                             f"{self.n_vagas} vagas / janela {self.janela}")
+
+        for nome, array in self._arrays().items():
+            if nome != "versao":
+                array[...] = snapshot[nome]
+
+    def para_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **self._arrays())
+        return buffer.getvalue()
+
+    def de_bytes(self, dados: bytes):
+        with np.load(io.BytesIO(dados)) as arquivo:
+            self.restaurar({nome: arquivo[nome] for nome in arquivo.files})
+
+    def salvar(self, caminho: str | Path):
+        """Grava o estado num arquivo binário compacto (.npz)"""
+        with open(caminho, "wb") as f:
+            f.write(self.para_bytes())
+
+    def carregar(self, caminho: str | Path):
+        with open(caminho, "rb") as f:
+            self.de_bytes(f.read())
@@ -0,0 +1,183 @@
+import asyncio
+import queue
+import threading
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+import cv2
+from src.amostragem import AmostradorQuadros
+from src.batch import registro_ocupacao
+from src.utils import EstacionaClassifier
+
+
+# marca o fim do fluxo na fila
+_FIM = object()
+
+
+class FluxoOcupacao:
+    """Registros de ocupação de uma fonte de vídeo, produzidos sob demanda
+
+    A leitura e a classificação rodam numa thread que só começa na primeira
+    consulta e escreve numa fila de `buffer` registros: se o consumidor atrasar,
+    a produção espera (o vídeo nunca é carregado inteiro). Serve tanto como
+    iterador comum quanto assíncrono; cancelar() (ou sair do `with`) para a
+    thread e libera a captura. Um erro na produção é relançado no consumidor.
+
+    Os registros são os mesmos do modo headless (video, frame, t_ms, livres,
+    total, estado); com `incluir_resultado` vem também o ResultadoVagas.
+    """
+
+    def __init__(self, fonte: str | Path | int, layout_path: str | Path, every_n: int = 1,
+                 max_fps: float | None = None, loop: bool = False, buffer: int = 8,
+                 incluir_resultado: bool = False, **classifier_kwargs):
+        if buffer < 1:
+            raise ValueError("buffer deve ser >= 1")
+
+        # índice de câmera (int) ou caminho/URL
+        self.fonte = fonte if isinstance(fonte, int) else str(fonte)
+        self.layout_path = layout_path
+        self.every_n = every_n
+        self.max_fps = max_fps
+        self.loop = loop
+        self.incluir_resultado = incluir_resultado
+        self.classifier_kwargs = classifier_kwargs
+
+        self._fila = queue.Queue(maxsize=buffer)
+        self._parar = threading.Event()
+        self._thread = None
+        self._terminado = False
+        self.produzidos = 0
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._produzir, name="fluxo-ocupacao", daemon=True)
+            self._thread.start()
+
+    def _produzir(self):
+        cap = None
+        try:
+            cap = cv2.VideoCapture(self.fonte)
+            if not cap.isOpened():
+                raise IOError(f"não foi possível abrir a fonte: {self.fonte}")
+
+            classifier = EstacionaClassifier(self.layout_path, **self.classifier_kwargs)
+            total = len(classifier.posicao_carro_vaga_full)
+            amostrador = AmostradorQuadros(cap, passo=self.every_n, taxa_alvo=self.max_fps)
+            lidos_na_volta = 0
+
+            while not self._parar.is_set():
+                item = amostrador.ler()
+                if item is None:
+                    # fim do arquivo: recomeça só se a volta leu alguma coisa
+                    if not self.loop or not lidos_na_volta:
+                        break
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    amostrador.reiniciar()
+                    lidos_na_volta = 0
+                    continue
+                lidos_na_volta += 1
+
+                frame_idx, t_ms, frame = item
+                resultado = classifier.classificar_quadro(frame)
+
+                registro = registro_ocupacao(self.fonte, frame_idx, t_ms, resultado, total)
+                if self.incluir_resultado:
+                    registro["resultado"] = resultado
+                if not self._colocar(registro):
+                    break
+                self.produzidos += 1
+        except Exception as e:
+            self._colocar(e)
+        finally:
+            if cap is not None:
+                cap.release()
+            self._colocar(_FIM)
+
+    def _colocar(self, item) -> bool:
+        """Espera espaço na fila; False se o fluxo foi cancelado antes"""
+        while not self._parar.is_set():
+            try:
+                self._fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _proximo(self):
+        """Próximo registro (bloqueia); _FIM no fim ou depois de cancelar"""
+        if self._terminado:
+            return _FIM
+        self.iniciar()
+
+        while not self._parar.is_set():
+            try:
+                item = self._fila.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _FIM or isinstance(item, Exception):
+                self._terminado = True
+            if isinstance(item, Exception):
+                raise item
+            return item
+        return _FIM
+
+    def cancelar(self, esperar: bool = True):
+        """Para a produção; com `esperar` aguarda a thread soltar a captura"""
+        self._parar.set()
+        self._terminado = True
+        if esperar and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __iter__(self) -> Iterator[dict]:
+        return self
+
+    def __next__(self) -> dict:
+        item = self._proximo()
+        if item is _FIM:
+            raise StopIteration
+        return item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cancelar()
+        return False
+
+    def __aiter__(self) -> AsyncIterator[dict]:
+        return self
+
+    async def __anext__(self) -> dict:
+        # a espera pela fila acontece numa thread: o event loop continua livre
+        try:
+            item = await asyncio.to_thread(self._proximo)
+        except asyncio.CancelledError:
+            self.cancelar(esperar=False)
+            raise
+        if item is _FIM:
+            raise StopAsyncIteration
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.cancelar(esperar=False)
+        await asyncio.to_thread(self.cancelar)
+        return False
+
+
+def ocupacao(fonte: str | Path | int, layout_path: str | Path, **opcoes) -> Iterator[dict]:
+    """Gerador de registros de ocupação por quadro; fechar o gerador cancela a análise
+
+    `opcoes` são as de FluxoOcupacao (every_n, max_fps, loop, buffer, ...) e do
+    EstacionaClassifier (feature_mode, roi, escala, ...).
+    """
+    with FluxoOcupacao(fonte, layout_path, **opcoes) as fluxo:
+        yield from fluxo
+
+
+async def ocupacao_async(fonte: str | Path | int, layout_path: str | Path, **opcoes) -> AsyncIterator[dict]:
+    """Versão assíncrona de ocupacao(); cancelar a task ou fechar o gerador para a análise"""
+    async with FluxoOcupacao(fonte, layout_path, **opcoes) as fluxo:
+        async for registro in fluxo:
+            yield registro
@@ -0,0 +1,445 @@
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, List
+import numpy as np
+from src.resultado import ResultadoVagas
+
+
+LIVRE = 1
+OCUPADA = 0
+DESCONHECIDA = -1
+
+_CABECALHO = struct.Struct("<4sHHI")
+_MAGICO = b"HOCP"
+_VERSAO = 1
+_BLOCO = struct.Struct("<4sIqq")
+_MAGICO_BLOCO = b"BLOC"
+# bytes por transição: t (int64), score (float32), vaga (int32), estado (int8)
+_BYTES_TRANSICAO = 8 + 4 + 4 + 1
+
+_DTYPE_INDICE = np.dtype([("offset", "<i8"), ("n", "<i4"), ("t_inicio", "<i8"), ("t_fim", "<i8")])
+
+
+def caminho_indice(caminho: str | Path) -> Path:
+    caminho = Path(caminho)
+    return caminho.with_name(f"{caminho.name}.idx")
+
+
+def letras(estados: np.ndarray) -> str:
+    """Uma letra por vaga, como em ResultadoVagas.estado(): 'L', 'O' ou '-'"""
+    codigos = np.where(estados == LIVRE, ord("L"), np.where(estados == OCUPADA, ord("O"), ord("-")))
+    return codigos.astype(np.uint8).tobytes().decode("ascii")
+
+
+def _observacao(resultado: ResultadoVagas | str, total: int) -> tuple:
+    """(estados int8, scores float32) de um quadro; vaga não avaliada fica DESCONHECIDA"""
+    estados = np.full(total, DESCONHECIDA, dtype=np.int8)
+    scores = np.full(total, np.nan, dtype=np.float32)
+    if isinstance(resultado, ResultadoVagas):
+        estados[resultado.ids] = resultado.is_empty
+        scores[resultado.ids] = resultado.score
+    else:
+        codigos = np.frombuffer(resultado.encode("ascii"), dtype=np.uint8)
+        if len(codigos) != total:
+            raise ValueError(f"estado com {len(codigos)} vagas, histórico com {total}")
+        estados[codigos == ord("L")] = LIVRE
+        estados[codigos == ord("O")] = OCUPADA
+    return estados, scores
+
+
+def _ultimas(vagas: np.ndarray, valores: np.ndarray) -> tuple:
+    """Último valor de cada vaga numa sequência em ordem de tempo"""
+    unicas, posicao = np.unique(vagas[::-1], return_index=True)
+    return unicas, valores[::-1][posicao]
+
+
+class FiltroTransicoes:
+    """Debounce por vaga: um estado novo só vale depois de `confirmacoes` quadros seguidos
+
+    Quadros em que a vaga não foi avaliada (gate, '-') não contam nem zeram a
+    sequência. A transição confirmada leva o tempo e o score do quadro que a
+    confirmou, então as transições saem em ordem de tempo.
+    """
+
+    def __init__(self, total: int, confirmacoes: int = 3):
+        if confirmacoes < 1:
+            raise ValueError("confirmacoes deve ser >= 1")
+        self.total = total
+        self.confirmacoes = confirmacoes
+        self.confirmado = np.full(total, DESCONHECIDA, dtype=np.int8)
+        self.candidato = np.full(total, DESCONHECIDA, dtype=np.int8)
+        self.seguidos = np.zeros(total, dtype=np.int32)
+
+    def observar(self, estados: np.ndarray) -> np.ndarray:
+        """Atualiza com as decisões de um quadro; devolve as vagas cujo estado mudou"""
+        vistas = estados != DESCONHECIDA
+        igual_confirmado = vistas & (estados == self.confirmado)
+        self.seguidos[igual_confirmado] = 0
+        self.candidato[igual_confirmado] = DESCONHECIDA
+
+        diferente = vistas & ~igual_confirmado
+        mesmo_candidato = diferente & (estados == self.candidato)
+        novo_candidato = diferente & ~mesmo_candidato
+        self.seguidos[mesmo_candidato] += 1
+        self.seguidos[novo_candidato] = 1
+        self.candidato[novo_candidato] = estados[novo_candidato]
+
+        confirmadas = np.flatnonzero(diferente & (self.seguidos >= self.confirmacoes))
+        self.confirmado[confirmadas] = self.candidato[confirmadas]
+        self.candidato[confirmadas] = DESCONHECIDA
+        self.seguidos[confirmadas] = 0
+        return confirmadas
+
+
+def _ler_cabecalho(f) -> int:
+    dados = f.read(_CABECALHO.size)
+    if len(dados) < _CABECALHO.size:
+        raise ValueError("arquivo de histórico vazio ou truncado")
+    magico, versao, _, total = _CABECALHO.unpack(dados)
+    if magico != _MAGICO:
+        raise ValueError("não é um arquivo de histórico de ocupação")
+    if versao != _VERSAO:
+        raise ValueError(f"versão de histórico não suportada: {versao}")
+    return total
+
+
+def _tamanho_bloco(n: int, total: int) -> int:
+    return _BLOCO.size + total + n * _BYTES_TRANSICAO
+
+
+def _varrer_blocos(f, total: int) -> np.ndarray:
+    """Reconstrói o índice lendo só os cabeçalhos; para no primeiro bloco incompleto"""
+    tamanho_arquivo = os.fstat(f.fileno()).st_size
+    entradas = []
+    offset = _CABECALHO.size
+    while offset + _BLOCO.size <= tamanho_arquivo:
+        f.seek(offset)
+        magico, n, t_inicio, t_fim = _BLOCO.unpack(f.read(_BLOCO.size))
+        if magico != _MAGICO_BLOCO or offset + _tamanho_bloco(n, total) > tamanho_arquivo:
+            break
+        entradas.append((offset, n, t_inicio, t_fim))
+        offset += _tamanho_bloco(n, total)
+    return np.array(entradas, dtype=_DTYPE_INDICE)
+
+
+def _carregar_indice(caminho: Path, f, total: int) -> np.ndarray:
+    """Índice do arquivo .idx se bater com o histórico; senão varre os cabeçalhos"""
+    tamanho_arquivo = os.fstat(f.fileno()).st_size
+    arquivo_indice = caminho_indice(caminho)
+    if arquivo_indice.exists():
+        indice = np.fromfile(arquivo_indice, dtype=_DTYPE_INDICE)
+        fim = _CABECALHO.size
+        if len(indice):
+            fim = int(indice["offset"][-1]) + _tamanho_bloco(int(indice["n"][-1]), total)
+        if fim == tamanho_arquivo:
+            return indice
+
+    # só o gravador regrava o .idx: ele pode estar no meio de um bloco agora
+    return _varrer_blocos(f, total)
+
+
+def _ler_bloco(f, entrada, total: int) -> tuple:
+    """(estado no início do bloco, t, score, vaga, estado) de um bloco"""
+    n = int(entrada["n"])
+    f.seek(int(entrada["offset"]) + _BLOCO.size)
+    dados = f.read(total + n * _BYTES_TRANSICAO)
+    inicio = np.frombuffer(dados, dtype=np.int8, count=total)
+    posicao = total
+    colunas = []
+    for dtype in ("<i8", "<f4", "<i4", "i1"):
+        colunas.append(np.frombuffer(dados, dtype=dtype, count=n, offset=posicao))
+        posicao += n * np.dtype(dtype).itemsize
+    return (inicio, *colunas)
+
+
+class GravadorHistorico:
+    """Grava só as transições de estado das vagas, em blocos colunares só-de-acréscimo
+
+    Cada quadro passa pelo FiltroTransicoes; as transições confirmadas
+    (t_ms, vaga, estado, score) se acumulam em memória e viram um bloco no
+    arquivo a cada `tamanho_bloco` transições, em descarregar() ou em fechar().
+    Cada bloco começa com o estado de todas as vagas naquele ponto, então uma
+    consulta lê um único bloco para saber o estado num instante. O índice por
+    bloco (offset, n, primeiro e último tempo) vai para <arquivo>.idx.
+
+    Reabrir um histórico existente continua do ponto em que ele parou; um bloco
+    incompleto no fim (queda no meio da gravação) é descartado. Os tempos devem
+    ser crescentes.
+    """
+
+    def __init__(self, caminho: str | Path, total: int, confirmacoes: int = 3, tamanho_bloco: int = 4096):
+        if tamanho_bloco < 1:
+            raise ValueError("tamanho_bloco deve ser >= 1")
+        self.caminho = Path(caminho)
+        self.total = total
+        self.tamanho_bloco = tamanho_bloco
+        self.filtro = FiltroTransicoes(total, confirmacoes)
+
+        self.estado_bloco = np.full(total, DESCONHECIDA, dtype=np.int8)
+        self.ultimo_t = None
+        self.observacoes = 0
+        self.transicoes_gravadas = 0
+        self._pendentes = []
+
+        existe = self.caminho.exists() and self.caminho.stat().st_size > 0
+        self._arquivo = open(self.caminho, "r+b" if existe else "w+b")
+        if existe:
+            self._retomar()
+        else:
+            self._arquivo.write(_CABECALHO.pack(_MAGICO, _VERSAO, 0, total))
+            self._arquivo.flush()
+            np.array([], dtype=_DTYPE_INDICE).tofile(caminho_indice(self.caminho))
+
+    def _retomar(self):
+        total = _ler_cabecalho(self._arquivo)
+        if total != self.total:
+            raise ValueError(f"histórico com {total} vagas, layout com {self.total}")
+
+        indice = _varrer_blocos(self._arquivo, total)
+        fim = _CABECALHO.size
+        if len(indice):
+            ultimo = indice[-1]
+            inicio, t, _, vaga, estado = _ler_bloco(self._arquivo, ultimo, total)
+            self.estado_bloco = inicio.copy()
+            if len(vaga):
+                vagas, estados = _ultimas(vaga, estado)
+                self.estado_bloco[vagas] = estados
+            self.ultimo_t = int(ultimo["t_fim"])
+            fim = int(ultimo["offset"]) + _tamanho_bloco(int(ultimo["n"]), total)
+
+        self._arquivo.truncate(fim)
+        indice.tofile(caminho_indice(self.caminho))
+        # o debounce recomeça a partir do último estado gravado
+        self.filtro.confirmado[:] = self.estado_bloco
+
+    def registrar(self, t_ms: float, resultado: ResultadoVagas | str) -> int:
+        """Um quadro classificado (resultado ou letras 'L'/'O'/'-'); devolve as transições confirmadas"""
+        t_ms = int(round(t_ms))
+        if self.ultimo_t is not None and t_ms < self.ultimo_t:
+            raise ValueError(f"tempo fora de ordem: {t_ms} < {self.ultimo_t}")
+
+        estados, scores = _observacao(resultado, self.total)
+        mudaram = self.filtro.observar(estados)
+        self.observacoes += 1
+        self.ultimo_t = t_ms
+        if len(mudaram):
+            self._pendentes.append((t_ms, mudaram.astype(np.int32), self.filtro.confirmado[mudaram], scores[mudaram]))
+            self.transicoes_gravadas += len(mudaram)
+            if sum(len(p[1]) for p in self._pendentes) >= self.tamanho_bloco:
+                self.descarregar()
+        return len(mudaram)
+
+    def descarregar(self):
+        """Grava as transições pendentes como um bloco novo"""
+        if not self._pendentes:
+            return
+
+        t = np.concatenate([np.full(len(p[1]), p[0], dtype="<i8") for p in self._pendentes])
+        vaga = np.concatenate([p[1] for p in self._pendentes]).astype("<i4")
+        estado = np.concatenate([p[2] for p in self._pendentes]).astype("i1")
+        score = np.concatenate([p[3] for p in self._pendentes]).astype("<f4")
+        self._pendentes = []
+
+        self._arquivo.seek(0, os.SEEK_END)
+        offset = self._arquivo.tell()
+        self._arquivo.write(_BLOCO.pack(_MAGICO_BLOCO, len(t), int(t[0]), int(t[-1])))
+        for coluna in (self.estado_bloco, t, score, vaga, estado):
+            self._arquivo.write(coluna.tobytes())
+        self._arquivo.flush()
+
+        # o índice só ganha a entrada depois que o bloco está inteiro no arquivo
+        with open(caminho_indice(self.caminho), "ab") as f:
+            np.array([(offset, len(t), t[0], t[-1])], dtype=_DTYPE_INDICE).tofile(f)
+
+        self.estado_bloco[vaga] = estado
+
+    def fechar(self):
+        if self._arquivo.closed:
+            return
+        self.descarregar()
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+
+class HistoricoOcupacao:
+    """Consultas sobre um histórico gravado pelo GravadorHistorico
+
+    Os estados são int8 por vaga: LIVRE (1), OCUPADA (0) ou DESCONHECIDA (-1,
+    antes da primeira transição). `vagas` restringe a consulta a uma zona
+    (ex.: IndiceVagas.vagas_na_regiao); sem ela valem todas. Só os blocos que
+    cobrem o intervalo pedido são lidos, localizados pelo índice de tempo.
+    """
+
+    def __init__(self, caminho: str | Path):
+        self.caminho = Path(caminho)
+        self._arquivo = open(self.caminho, "rb")
+        self.total = _ler_cabecalho(self._arquivo)
+        self.recarregar()
+
+    def recarregar(self):
+        """Relê o índice (para enxergar blocos novos de um gravador ainda aberto)"""
+        self.indice = _carregar_indice(self.caminho, self._arquivo, self.total)
+
+    @property
+    def blocos(self) -> int:
+        return len(self.indice)
+
+    @property
+    def transicoes_total(self) -> int:
+        return int(self.indice["n"].sum())
+
+    @property
+    def t_inicio(self) -> int | None:
+        return int(self.indice["t_inicio"][0]) if len(self.indice) else None
+
+    @property
+    def t_fim(self) -> int | None:
+        return int(self.indice["t_fim"][-1]) if len(self.indice) else None
+
+    def _vagas(self, vagas: Iterable[int] | None) -> np.ndarray:
+        if vagas is None:
+            return np.arange(self.total)
+        vagas = np.asarray(list(vagas), dtype=np.int64)
+        if len(vagas) and (vagas.min() < 0 or vagas.max() >= self.total):
+            raise IndexError(f"vaga fora do histórico (0..{self.total - 1})")
+        return vagas
+
+    def estado_em(self, t_ms: float, vagas: Iterable[int] | None = None) -> np.ndarray:
+        """Estado de cada vaga no instante t (transições em t já contam)"""
+        vagas = self._vagas(vagas)
+        i = int(np.searchsorted(self.indice["t_inicio"], t_ms, side="right")) - 1
+        if i < 0:
+            return np.full(len(vagas), DESCONHECIDA, dtype=np.int8)
+
+        inicio, t, _, vaga, estado = _ler_bloco(self._arquivo, self.indice[i], self.total)
+        estados = inicio.copy()
+        ate = int(np.searchsorted(t, t_ms, side="right"))
+        if ate:
+            mudaram, novos = _ultimas(vaga[:ate], estado[:ate])
+            estados[mudaram] = novos
+        return estados[vagas]
+
+    def ocupacao_em(self, t_ms: float, vagas: Iterable[int] | None = None) -> dict:
+        estados = self.estado_em(t_ms, vagas)
+        return {
+            "t_ms": float(t_ms),
+            "livres": int(np.count_nonzero(estados == LIVRE)),
+            "ocupadas": int(np.count_nonzero(estados == OCUPADA)),
+            "desconhecidas": int(np.count_nonzero(estados == DESCONHECIDA)),
+            "estado": letras(estados),
+        }
+
+    def transicoes(self, t1: float, t2: float, vagas: Iterable[int] | None = None) -> dict:
+        """Transições com t1 < t <= t2, em ordem de tempo: arrays t_ms, vaga, estado, score"""
+        primeiro = int(np.searchsorted(self.indice["t_fim"], t1, side="right"))
+        ultimo = int(np.searchsorted(self.indice["t_inicio"], t2, side="right"))
+
+        partes = []
+        for entrada in self.indice[primeiro:ultimo]:
+            _, t, score, vaga, estado = _ler_bloco(self._arquivo, entrada, self.total)
+            dentro = (t > t1) & (t <= t2)
+            partes.append((t[dentro], vaga[dentro], estado[dentro], score[dentro]))
+
+        if partes:
+            t, vaga, estado, score = (np.concatenate(coluna) for coluna in zip(*partes))
+        else:
+            t, vaga, estado, score = (np.empty(0, dtype=d) for d in ("<i8", "<i4", "i1", "<f4"))
+
+        if vagas is not None:
+            manter = np.isin(vaga, self._vagas(vagas))
+            t, vaga, estado, score = t[manter], vaga[manter], estado[manter], score[manter]
+        return {"t_ms": t, "vaga": vaga, "estado": estado, "score": score}
+
+    def intervalo(self, t1: float, t2: float, vagas: Iterable[int] | None = None) -> dict:
+        """Ocupação ao longo de [t1, t2]: tempo livre por vaga e livres ao longo do tempo na zona"""
+        if t2 < t1:
+            raise ValueError("t2 deve ser >= t1")
+        vagas = self._vagas(vagas)
+        coluna = np.full(self.total, -1, dtype=np.int64)
+        coluna[vagas] = np.arange(len(vagas))
+
+        iniciais = self.estado_em(t1, vagas)
+        eventos = self.transicoes(t1, t2, vagas)
+        n = len(vagas)
+
+        # segmentos de estado constante por vaga: o estado inicial e um por transição
+        seg_coluna = np.concatenate([np.arange(n), coluna[eventos["vaga"]]])
+        seg_inicio = np.concatenate([np.full(n, t1, dtype=np.float64), eventos["t_ms"].astype(np.float64)])
+        seg_estado = np.concatenate([iniciais, eventos["estado"]])
+        ordem = np.lexsort((seg_inicio, seg_coluna))
+        seg_coluna, seg_inicio, seg_estado = seg_coluna[ordem], seg_inicio[ordem], seg_estado[ordem]
+
+        mesma_vaga = np.append(seg_coluna[1:] == seg_coluna[:-1], False)
+        seg_fim = np.where(mesma_vaga, np.append(seg_inicio[1:], t2), t2)
+        duracao = seg_fim - seg_inicio
+
+        tempo = np.zeros((n, 3), dtype=np.float64)
+        np.add.at(tempo, (seg_coluna, seg_estado + 1), duracao)
+
+        # livres na zona ao longo do tempo: cada transição soma ou tira uma vaga livre
+        anterior = np.append(-2, seg_estado[:-1])
+        eh_transicao = np.append(False, mesma_vaga[:-1])
+        delta = (seg_estado[eh_transicao] == LIVRE).astype(np.int64) - (anterior[eh_transicao] == LIVRE)
+        quando = seg_inicio[eh_transicao]
+        ordem = np.argsort(quando, kind="stable")
+        livres = np.concatenate([[np.count_nonzero(iniciais == LIVRE)],
+                                 np.count_nonzero(iniciais == LIVRE) + np.cumsum(delta[ordem])])
+        marcos = np.concatenate([[t1], quando[ordem], [t2]])
+        pesos = np.diff(marcos)
+
+        duracao_total = t2 - t1
+        return {
+            "inicio_ms": t1,
+            "fim_ms": t2,
+            "vagas": vagas.tolist(),
+            "livre_ms": tempo[:, LIVRE + 1],
+            "ocupada_ms": tempo[:, OCUPADA + 1],
+            "desconhecida_ms": tempo[:, DESCONHECIDA + 1],
+            "fracao_livre": tempo[:, LIVRE + 1] / duracao_total if duracao_total else (iniciais == LIVRE).astype(np.float64),
+            "transicoes": np.bincount(coluna[eventos["vaga"]], minlength=n),
+            "livres_media": float(np.dot(livres, pesos) / duracao_total) if duracao_total else float(livres[-1]),
+            "livres_min": int(livres.min()),
+            "livres_max": int(livres.max()),
+        }
+
+    def linha_do_tempo(self, tempos: Iterable[float], vagas: Iterable[int] | None = None) -> np.ndarray:
+        """Estado de cada vaga em cada instante pedido (ex.: os tempos dos quadros): matriz tempos x vagas"""
+        tempos = np.asarray(list(tempos), dtype=np.float64)
+        vagas = self._vagas(vagas)
+        if not len(tempos):
+            return np.empty((0, len(vagas)), dtype=np.int8)
+        if np.any(np.diff(tempos) < 0):
+            raise ValueError("os tempos devem ser crescentes")
+
+        matriz = np.repeat(self.estado_em(tempos[0], vagas)[None, :], len(tempos), axis=0)
+        eventos = self.transicoes(tempos[0], tempos[-1], vagas)
+        coluna = {int(v): i for i, v in enumerate(vagas)}
+        for vaga in np.unique(eventos["vaga"]):
+            desta = eventos["vaga"] == vaga
+            t, estado = eventos["t_ms"][desta], eventos["estado"][desta]
+            # última transição da vaga até cada instante
+            ultima = np.searchsorted(t, tempos, side="right") - 1
+            i = coluna[int(vaga)]
+            matriz[:, i] = np.where(ultima >= 0, estado[np.maximum(ultima, 0)], matriz[:, i])
+        return matriz
+
+    def linha_do_tempo_letras(self, tempos: Iterable[float], vagas: Iterable[int] | None = None) -> List[str]:
+        """linha_do_tempo() como uma string 'L'/'O'/'-' por instante, igual à coluna estado do lote"""
+        return [letras(linha) for linha in self.linha_do_tempo(tempos, vagas)]
+
+    def fechar(self):
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
@@ -12,6 +12,12 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QPoint, QRect
 from PyQt5.QtGui import QFont, QPixmap, QImage, QPainter, QPen, QColor
 from src.utils import EstacionaClassifier, Coordinate_denoter
+from src.layout import IndiceVagas, salvar_resolucao_referencia
+from src.pipeline import FIM, Pipeline, UltimoItem
+from src.amostragem import AmostradorQuadros, formatar_relatorio
+from src.resultado import RenderizadorOverlay
+from src.metricas import Metricas
+from src.cache import CacheResultados, assinatura_classificador, identidade_video
 import pickle
 
 if getattr(sys, 'frozen', False):
@@ -37,44 +43,182 @@ class ClickableLabel(QLabel):
             self.right_clicked.emit(event.pos())
 
 
+def tamanho_ajustado(largura: int, altura: int, largura_max: int, altura_max: int) -> tuple:
+    """Maior tamanho com a proporção da imagem que cabe em largura_max x altura_max"""
+    if largura / altura > largura_max / altura_max:
+        return largura_max, max(1, int(largura_max / (largura / altura)))
+    return max(1, int(altura_max * (largura / altura))), altura_max
+
+
 class VideoProcessor(QThread):
-    """Thread para processar o vídeo sem travar a interface"""
-    frame_ready = pyqtSignal(object)
+    """Thread para processar o vídeo sem travar a interface
+    
+    Estágios decodificar -> pre-processar -> classificar -> desenhar, cada um
+    na sua thread e ligados por filas limitadas: a decodificação do próximo
+    quadro acontece enquanto o atual é classificado.
+    
+    O estágio de desenho já reduz o quadro ao tamanho de exibição e o deixa em
+    `ultimo_quadro`; frame_ready só avisa que há quadro novo. Se a interface
+    atrasar, quadros antigos são substituídos (e contados) em vez de enfileirados.
+    """
+    frame_ready = pyqtSignal()
     progress_update = pyqtSignal(int)
+    stats_update = pyqtSignal(dict)
     finished = pyqtSignal()
     
-    def __init__(self, video_path: str, classifier: EstacionaClassifier):
+    def __init__(self, video_path: str, classifier: EstacionaClassifier,
+                 fps_alvo: float | None = None, profundidade_fila: int = 2,
+                 passo: int = 1, taxa_alvo: float | None = None, fps_desenho: float | None = None,
+                 cache: CacheResultados | None = None):
+        """fps_alvo: cadência de exibição (None = fps do vídeo, 0 = sem limite)
+        passo / taxa_alvo: classifica só um quadro a cada `passo` ou `taxa_alvo` por segundo
+        fps_desenho: limita quantos quadros por segundo são desenhados e exibidos
+        cache: resultados (e quadros desenhados) reaproveitados nas voltas seguintes do loop;
+        pode ser compartilhado entre execuções, a chave inclui vídeo, quadro e classificador
+        
+        As etapas decode e render entram nas métricas do classificador (classifier.metricas).
+        """
         super().__init__()
         self.video_path = video_path
         self.classifier = classifier
+        self.fps_alvo = fps_alvo
+        self.profundidade_fila = profundidade_fila
+        self.passo = passo
+        self.taxa_alvo = taxa_alvo
+        self.renderizador = RenderizadorOverlay(classifier, fps=fps_desenho, copiar=False)
+        self.metricas = classifier.metricas
+        self.cache = cache if cache is not None else CacheResultados()
         self.is_running = True
+        self.pipeline = None
+        self.amostrador = None
+        self.ultimo_quadro = UltimoItem()
+        self.tamanho_exibicao = None
+    
+    def definir_tamanho_exibicao(self, largura: int, altura: int):
+        """Tamanho atual da área de vídeo (chamado pela interface)"""
+        self.tamanho_exibicao = (largura, altura) if largura > 0 and altura > 0 else None
         
     def run(self):
         cap = cv2.VideoCapture(self.video_path)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        frame_count = 0
+        total_frames = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 1)
         
-        while self.is_running and cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                frame_count = 0
-                continue
+        fps = self.fps_alvo
+        if fps is None:
+            # mantém a velocidade de reprodução mesmo amostrando
+            fps = cap.get(cv2.CAP_PROP_FPS) / self.passo
+            if self.taxa_alvo:
+                fps = min(fps, self.taxa_alvo) if fps else self.taxa_alvo
+        
+        self.pipeline = Pipeline(self.profundidade_fila)
+        self.amostrador = AmostradorQuadros(cap, passo=self.passo, taxa_alvo=self.taxa_alvo)
+        
+        # voltas seguintes do loop saem do cache sem passar pelo classificador
+        video = identidade_video(self.video_path)
+        assinatura = assinatura_classificador(self.classifier)
+        
+        def chave(index):
+            return video, index, assinatura
+        
+        def precisa_quadro(index):
+            return not self.cache.tem_quadro(chave(index), self.tamanho_exibicao)
+        
+        def decodificar():
+            if not cap.isOpened():
+                return FIM
             
-            processed_frame = self.classifier.implement_process(frame)
-            result_frame = self.classifier.classificar(frame, processed_frame)
+            with self.metricas.medir("decode"):
+                item = self.amostrador.ler(precisa_quadro)
+            if item is None:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self.amostrador.reiniciar()
+                item = self.amostrador.ler(precisa_quadro)
+                if item is None:
+                    return FIM
             
-            self.frame_ready.emit(result_frame)
+            index, t_ms, frame = item
+            pronto = None
+            if frame is None:
+                pronto = self.cache.obter_quadro(chave(index), self.tamanho_exibicao)
+                if pronto is None:
+                    # o quadro desenhado saiu do cache entre o grab e a consulta
+                    return None
+            return index, frame, pronto
+        
+        def pre_processar(item):
+            index, frame, pronto = item
+            if pronto is not None:
+                return index, None, None, pronto
+            frame = self.classifier.preparar_quadro(frame)
+            resultado = self.cache.obter(chave(index))
+            if resultado is None:
+                return index, frame, self.classifier.implement_process(frame), None
+            return index, frame, None, resultado
+        
+        def classificar(item):
+            index, frame, processed_frame, resultado = item
+            if processed_frame is not None:
+                resultado = self.classifier.analisar(frame, processed_frame)
+                self.cache.guardar(chave(index), resultado)
+            return index, frame, resultado
+        
+        def desenhar(item):
+            index, frame, resultado = item
+            self.progress_update.emit(int(((index + 1) / total_frames) * 100))
             
-            frame_count += 1
-            progress = int((frame_count / total_frames) * 100)
-            self.progress_update.emit(progress)
+            if frame is None:
+                # quadro já desenhado, vindo do cache
+                quadro, largura, altura = resultado
+            else:
+                with self.metricas.medir("render"):
+                    quadro = self.renderizador.desenhar(frame, resultado)
+                if quadro is None:
+                    return
+                altura, largura = quadro.shape[:2]
+                
+                # reduz aqui, fora da thread da interface, direto para o tamanho exibido
+                tamanho = self.tamanho_exibicao
+                if tamanho is not None:
+                    w, h = tamanho_ajustado(largura, altura, *tamanho)
+                    if w < largura:
+                        quadro = cv2.resize(quadro, (w, h), interpolation=cv2.INTER_AREA)
+                
+                # o QImage usa o buffer do array sem cópia; o array vai junto para mantê-lo vivo
+                quadro = np.ascontiguousarray(quadro)
+                self.cache.guardar_quadro(chave(index), tamanho, quadro, largura, altura)
             
-            cv2.waitKey(10)
+            imagem = QImage(quadro.data, quadro.shape[1], quadro.shape[0], quadro.strides[0], QImage.Format_BGR888)
+            if self.ultimo_quadro.colocar((imagem, quadro, largura, altura)):
+                self.frame_ready.emit()
+        
+        self.pipeline.adicionar("decodificar", decodificar, fps=fps)
+        self.pipeline.adicionar("pre_processar", pre_processar)
+        self.pipeline.adicionar("classificar", classificar)
+        self.pipeline.adicionar("desenhar", desenhar)
+        self.pipeline.iniciar()
+        
+        while self.is_running and self.pipeline.ativo():
+            self.msleep(500)
+            self.stats_update.emit(self.estatisticas())
+        
+        self.pipeline.encerrar()
+        for erro in self.pipeline.erros():
+            print(f"Erro no processamento: {erro}")
         
         cap.release()
         self.finished.emit()
     
+    def estatisticas(self) -> dict:
+        """Fila e latência de cada estágio, para ver onde o pipeline trava"""
+        if self.pipeline is None:
+            return {}
+        
+        stats = self.pipeline.estatisticas()
+        if self.amostrador is not None and (self.passo > 1 or self.taxa_alvo):
+            stats["amostragem"] = self.amostrador.relatorio()
+        stats["exibicao"] = self.ultimo_quadro.estado()
+        stats["cache"] = self.cache.estado()
+        return stats
+    
     def stop(self):
         self.is_running = False
 
@@ -97,6 +241,13 @@ class ParkingAnalyzerUI(QMainWindow):
         # Modo de 4 pontos
         self.current_points = []  # Lista de pontos clicados (máximo 4)
         self.parking_spots = []   # Lista de vagas salvas (cada uma com 4 pontos)
+        self.indice_vagas = IndiceVagas()  # índice espacial de parking_spots
+        
+        # instrumentação por etapa, ligada pelo botão de métricas
+        self.metricas = Metricas(ativo=False)
+        
+        # resultados por quadro, reaproveitados no loop e ao reiniciar a análise do mesmo vídeo
+        self.cache_resultados = CacheResultados()
         
         self.init_ui()
         
@@ -148,6 +299,14 @@ class ParkingAnalyzerUI(QMainWindow):
         self.video_label.mouse_clicked.connect(self.on_mouse_click)
         self.video_label.right_clicked.connect(self.on_right_click)
         
+        # overlay de métricas sobre o vídeo
+        self.metrics_overlay = QLabel(self.video_label)
+        self.metrics_overlay.setFont(QFont("Monospace", 9))
+        self.metrics_overlay.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: #2ecc71; padding: 6px; border: none;")
+        self.metrics_overlay.move(12, 12)
+        self.metrics_overlay.setVisible(False)
+        
         scroll_area.setWidget(self.video_label)
         main_layout.addWidget(scroll_area)
         
@@ -213,6 +372,15 @@ class ParkingAnalyzerUI(QMainWindow):
         self.stop_btn.clicked.connect(self.stop_analysis)
         button_layout.addWidget(self.stop_btn)
         
+        # botão de métricas
+        self.metrics_btn = QPushButton("📊 Métricas")
+        self.metrics_btn.setFont(QFont("Arial", 12, QFont.Bold))
+        self.metrics_btn.setMinimumHeight(50)
+        self.metrics_btn.setCheckable(True)
+        self.metrics_btn.setStyleSheet(self._get_button_style("#8e44ad", "#7d3c98", "#6c3483"))
+        self.metrics_btn.toggled.connect(self.toggle_metrics)
+        button_layout.addWidget(self.metrics_btn)
+        
         main_layout.addLayout(button_layout)
         
         # layout de botões de marcação
@@ -298,6 +466,7 @@ class ParkingAnalyzerUI(QMainWindow):
         else:
             # 4 pontos completos - criar vaga
             self.parking_spots.append(self.current_points.copy())
+            self.indice_vagas.adicionar(self.parking_spots[-1])
             self.info_label.setText(f"✅ Vaga {len(self.parking_spots)} adicionada!")
             self.current_points.clear()
         
@@ -327,28 +496,17 @@ class ParkingAnalyzerUI(QMainWindow):
         y = int(click_y / self.scale_factor)
         point = (x, y)
         
-        # verificar qual vaga contém o ponto clicado
-        removed = False
-        for index, spot_points in enumerate(self.parking_spots):
-            if self._point_in_polygon(point, spot_points):
-                self.parking_spots.pop(index)
-                removed = True
-                break
-        
-        if removed:
+        # verificar qual vaga contém o ponto clicado (só candidatos do índice espacial)
+        index = self.indice_vagas.vaga_em(*point)
+        if index is not None:
+            self.parking_spots.pop(index)
+            self.indice_vagas.remover(index)
             self.info_label.setText(f"❌ Vaga removida! Total: {len(self.parking_spots)}")
         else:
             self.info_label.setText("⚠️ Nenhuma vaga aqui")
         
         self.display_frame_with_marks(self.original_frame)
     
-    def _point_in_polygon(self, point, polygon):
-        """Verifica se ponto está dentro do poligono"""
-        x, y = point
-        points = np.array(polygon, dtype=np.int32)
-        result = cv2.pointPolygonTest(points, (float(x), float(y)), False)
-        return result >= 0
-    
     def _calculate_rect_from_points(self, points):
         """Calcula retangulo rotacionado a partir de 4 pontos"""
         # convertre para numpy array
@@ -408,6 +566,7 @@ class ParkingAnalyzerUI(QMainWindow):
             except Exception as e:
                 self.parking_spots = []
                 print(f"⚠️ Erro ao carregar vagas: {e}")
+            self.indice_vagas.reconstruir(self.parking_spots)
             
             # carregar primeiro frame
             cap = cv2.VideoCapture(file_path)
@@ -458,6 +617,7 @@ class ParkingAnalyzerUI(QMainWindow):
         
         if reply == QMessageBox.Yes:
             self.parking_spots.clear()
+            self.indice_vagas.reconstruir(self.parking_spots)
             self.current_points.clear()
             self.display_frame_with_marks(self.original_frame)
             self.info_label.setText("🗑️ Todas as marcações limpas")
@@ -484,6 +644,11 @@ class ParkingAnalyzerUI(QMainWindow):
             with open(os.path.join(BASE_PATH, "src", "estacionamentoPos"), 'wb') as f:
                 pickle.dump(positions, f)
             
+            # resolução em que as vagas foram marcadas, para analisar vídeos em outras resoluções
+            if self.original_frame is not None:
+                altura, largura = self.original_frame.shape[:2]
+                salvar_resolucao_referencia(os.path.join(BASE_PATH, "src", "estacionamentoPos"), largura, altura)
+            
             QMessageBox.information(self, "Sucesso", f"✅ {len(self.parking_spots)} vagas salvas!")
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao salvar:\n{str(e)}")
@@ -500,11 +665,15 @@ class ParkingAnalyzerUI(QMainWindow):
         posicoes_path = os.path.join(BASE_PATH, "src", "estacionamentoPos")
         
         try:
-            self.classifier = EstacionaClassifier(posicoes_path)
+            # calibração por vídeo/câmera, invalidada se as vagas forem remarcadas
+            camera = os.path.splitext(os.path.basename(self.video_path))[0]
+            self.classifier = EstacionaClassifier(posicoes_path, camera=camera, metricas=self.metricas)
             
-            self.video_thread = VideoProcessor(self.video_path, self.classifier)
-            self.video_thread.frame_ready.connect(self.display_frame)
+            self.video_thread = VideoProcessor(self.video_path, self.classifier, cache=self.cache_resultados)
+            self.video_thread.definir_tamanho_exibicao(self.video_label.width(), self.video_label.height())
+            self.video_thread.frame_ready.connect(self.display_latest_frame)
             self.video_thread.progress_update.connect(self.update_progress)
+            self.video_thread.stats_update.connect(self.update_stats)
             self.video_thread.finished.connect(self.analysis_finished)
             self.video_thread.start()
             
@@ -525,43 +694,86 @@ class ParkingAnalyzerUI(QMainWindow):
             self.analysis_finished()
     
     def display_frame(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_frame.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qt_image)
+        h, w = frame.shape[:2]
+        frame = np.ascontiguousarray(frame)
+        qt_image = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+        self._show_pixmap(QPixmap.fromImage(qt_image), w, h)
+    
+    def display_latest_frame(self):
+        """Exibe o quadro mais recente do processamento (já reduzido pelo worker)"""
+        if self.video_thread is None:
+            return
+        
+        item = self.video_thread.ultimo_quadro.pegar()
+        if item is None:
+            return
         
+        qt_image, buffer, w, h = item
+        with self.metricas.medir("display"):
+            self._show_pixmap(QPixmap.fromImage(qt_image), w, h)
+        # acompanha redimensionamentos da janela
+        self.video_thread.definir_tamanho_exibicao(self.video_label.width(), self.video_label.height())
+    
+    def _show_pixmap(self, pixmap: QPixmap, w: int, h: int):
+        """Centraliza o pixmap na área de vídeo; w, h são as dimensões do quadro original"""
         available_width = self.video_label.width()
         available_height = self.video_label.height()
         
-        img_ratio = w / h
-        label_ratio = available_width / available_height
-        
-        if img_ratio > label_ratio:
-            self.scaled_width = available_width
-            self.scaled_height = int(available_width / img_ratio)
-        else:
-            self.scaled_height = available_height
-            self.scaled_width = int(available_height * img_ratio)
+        self.scaled_width, self.scaled_height = tamanho_ajustado(w, h, available_width, available_height)
         
         self.x_offset = (available_width - self.scaled_width) // 2
         self.y_offset = (available_height - self.scaled_height) // 2
         
         self.scale_factor = self.scaled_width / w
         
-        scaled_pixmap = pixmap.scaled(
-            self.scaled_width,
-            self.scaled_height,
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        )
+        if (pixmap.width(), pixmap.height()) != (self.scaled_width, self.scaled_height):
+            pixmap = pixmap.scaled(
+                self.scaled_width,
+                self.scaled_height,
+                Qt.KeepAspectRatio,
+                Qt.SmoothTransformation
+            )
         
-        self.video_label.setPixmap(scaled_pixmap)
+        self.video_label.setPixmap(pixmap)
     
     def update_progress(self, value):
         self.progress_bar.setValue(value)
     
+    def update_stats(self, stats: dict):
+        """Fila e latência de cada estágio no tooltip da barra de progresso"""
+        linhas = []
+        for nome, e in stats.items():
+            if nome == "amostragem":
+                linhas.append(formatar_relatorio(e))
+            elif nome == "exibicao":
+                linhas.append(f"exibição: {e['entregues']} quadros exibidos | {e['descartados']} descartados")
+            elif nome == "cache":
+                linhas.append(f"cache: {100 * e['taxa_acerto']:.0f}% de acertos | {e['resultados']} resultados, "
+                              f"{e['quadros']} quadros | {e['mb']:.1f}/{e['orcamento_mb']:.0f} MB")
+            else:
+                linhas.append(f"{nome}: fila {e['fila']} | {e['latencia_ms']:.1f} ms")
+        self.progress_bar.setToolTip("\n".join(linhas))
+        
+        if self.metricas.ativo:
+            self.metrics_overlay.setText(self.metricas.formatar() or "coletando...")
+            self.metrics_overlay.adjustSize()
+    
+    def toggle_metrics(self, ligado: bool):
+        """Liga/desliga a instrumentação e o overlay (desligada não custa quase nada)"""
+        self.metricas.ativo = ligado
+        self.metrics_overlay.setVisible(ligado)
+        if ligado:
+            self.metrics_overlay.setText("coletando...")
+            self.metrics_overlay.adjustSize()
+            self.metrics_overlay.raise_()
+    
     def analysis_finished(self):
+        if self.classifier is not None:
+            try:
+                self.classifier.salvar_calibracao()
+            except OSError as e:
+                print(f"Erro ao salvar calibração: {e}")
+        
         self.upload_btn.setEnabled(True)
         self.mark_btn.setEnabled(True)
         self.analyze_btn.setEnabled(True)
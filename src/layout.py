@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List
+import cv2
+import numpy as np
+
+
+class JournalLayout:
+    """Lista de vagas com diário de edições só-de-acréscimo e compactação atômica
+
+    Cada edição real vira uma linha no diário (<layout>.journal), gravada na hora.
+    O pickle do layout só é reescrito depois de `atraso` segundos sem edições,
+    num arquivo temporário renomeado por cima do original. A primeira linha do
+    diário guarda o hash do pickle sobre o qual ele se aplica: se o programa
+    cair antes da compactação o diário é reaplicado na próxima abertura; se cair
+    depois da troca do pickle, o hash não confere e o diário é descartado.
+    """
+
+    def __init__(self, posicoes_path: str | Path, atraso: float = 1.0):
+        self.caminho = Path(posicoes_path)
+        self.caminho_journal = self.caminho.with_name(self.caminho.name + ".journal")
+        self.atraso = atraso
+
+        self.posicoes: List[tuple] = []
+        self.pendente = False
+        self._ultima_edicao = 0.0
+
+    def carregar(self) -> List[tuple]:
+        """Lê o pickle e reaplica edições de um diário não compactado"""
+        base = self.caminho.read_bytes() if self.caminho.exists() else b""
+        self.posicoes = [tuple(p) for p in pickle.loads(base)] if base else []
+
+        recuperadas = self._reaplicar_journal(base)
+        if recuperadas:
+            print(f"Recuperadas {recuperadas} edições não salvas de {self.caminho_journal}")
+            self.compactar()
+        return self.posicoes
+
+    def _reaplicar_journal(self, base: bytes) -> int:
+        if not self.caminho_journal.exists():
+            return 0
+
+        with open(self.caminho_journal, encoding="utf-8") as f:
+            linhas = f.read().splitlines()
+
+        try:
+            cabecalho = json.loads(linhas[0]) if linhas else {}
+        except json.JSONDecodeError:
+            cabecalho = {}
+        if cabecalho.get("base") != hashlib.sha256(base).hexdigest():
+            # já compactado (ou de outro layout)
+            self.caminho_journal.unlink()
+            return 0
+
+        aplicadas = 0
+        for linha in linhas[1:]:
+            try:
+                edicao = json.loads(linha)
+            except json.JSONDecodeError:
+                # última linha truncada por uma queda no meio da escrita
+                break
+            self._aplicar(edicao)
+            aplicadas += 1
+        return aplicadas
+
+    def _aplicar(self, edicao: dict):
+        if edicao["op"] == "adicionar":
+            self.posicoes.append(tuple(edicao["pos"]))
+        elif edicao["op"] == "remover":
+            self.posicoes.pop(edicao["index"])
+        elif edicao["op"] == "limpar":
+            self.posicoes.clear()
+
+    def _registrar(self, edicao: dict):
+        novo = not self.caminho_journal.exists()
+        with open(self.caminho_journal, "a", encoding="utf-8") as f:
+            if novo:
+                base = self.caminho.read_bytes() if self.caminho.exists() else b""
+                f.write(json.dumps({"base": hashlib.sha256(base).hexdigest()}) + "\n")
+            f.write(json.dumps(edicao) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._aplicar(edicao)
+        self.pendente = True
+        self._ultima_edicao = time.monotonic()
+
+    def adicionar(self, pos: tuple):
+        self._registrar({"op": "adicionar", "pos": list(pos)})
+
+    def remover(self, index: int):
+        self._registrar({"op": "remover", "index": index})
+
+    def limpar(self):
+        self._registrar({"op": "limpar"})
+
+    def compactar_se_ocioso(self) -> bool:
+        """Compacta se há edições pendentes e `atraso` segundos se passaram desde a última"""
+        if self.pendente and time.monotonic() - self._ultima_edicao >= self.atraso:
+            self.compactar()
+            return True
+        return False
+
+    def compactar(self):
+        """Reescreve o pickle (temporário + rename) e descarta o diário"""
+        fd, temporario = tempfile.mkstemp(prefix=self.caminho.name, suffix=".tmp", dir=self.caminho.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(self.posicoes, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+
+        if self.caminho_journal.exists():
+            self.caminho_journal.unlink()
+        self.pendente = False
+
+
+def retangulo(x: int, y: int, w: int, h: int) -> List[tuple]:
+    """Os 4 cantos de um retângulo alinhado aos eixos"""
+    return [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+
+
+class IndiceVagas:
+    """Índice espacial (grade uniforme) sobre as caixas envolventes das vagas
+
+    Cada vaga é registrada nas células da grade que sua caixa toca. Consultas
+    olham só as células envolvidas e fazem o teste exato de polígono apenas
+    nos candidatos, então "qual vaga está em (x, y)" não depende do total de
+    vagas. Os ids são as posições na lista de polígonos, como nas listas de
+    vagas do resto do projeto.
+    """
+
+    def __init__(self, poligonos=(), tamanho_celula: int = 64):
+        self.tamanho_celula = tamanho_celula
+        self.reconstruir(poligonos)
+
+    def reconstruir(self, poligonos):
+        """Reindexa do zero (ex.: depois de carregar ou limpar o layout)"""
+        self.poligonos: List[np.ndarray] = []
+        self.caixas: List[tuple] = []
+        self._grade: Dict[tuple, List[int]] = defaultdict(list)
+        for poligono in poligonos:
+            self.adicionar(poligono)
+
+    def __len__(self) -> int:
+        return len(self.poligonos)
+
+    def _celulas(self, x0: float, y0: float, x1: float, y1: float) -> Iterator[tuple]:
+        c = self.tamanho_celula
+        for cy in range(int(y0 // c), int(y1 // c) + 1):
+            for cx in range(int(x0 // c), int(x1 // c) + 1):
+                yield cx, cy
+
+    def adicionar(self, poligono) -> int:
+        pontos = np.asarray(poligono, dtype=np.float32).reshape(-1, 2)
+        x0, y0 = pontos.min(axis=0)
+        x1, y1 = pontos.max(axis=0)
+
+        index = len(self.poligonos)
+        self.poligonos.append(pontos)
+        self.caixas.append((float(x0), float(y0), float(x1), float(y1)))
+        for celula in self._celulas(x0, y0, x1, y1):
+            self._grade[celula].append(index)
+        return index
+
+    def remover(self, index: int):
+        """Remove a vaga; os ids seguintes andam uma posição, como num list.pop"""
+        if index < 0:
+            index += len(self.poligonos)
+        x0, y0, x1, y1 = self.caixas[index]
+        for celula in self._celulas(x0, y0, x1, y1):
+            ids = self._grade[celula]
+            ids.remove(index)
+            if not ids:
+                del self._grade[celula]
+        self.poligonos.pop(index)
+        self.caixas.pop(index)
+
+        # sem refazer caixas nem células: só os ids maiores descem uma posição
+        if index < len(self.poligonos):
+            for ids in self._grade.values():
+                if ids[-1] > index:
+                    ids[:] = [i - 1 if i > index else i for i in ids]
+
+    def _candidatos(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        candidatos = set()
+        for celula in self._celulas(x0, y0, x1, y1):
+            candidatos.update(self._grade.get(celula, ()))
+
+        # filtro pelas caixas envolventes antes de qualquer teste exato
+        return sorted(
+            i for i in candidatos
+            if self.caixas[i][0] <= x1 and self.caixas[i][2] >= x0
+            and self.caixas[i][1] <= y1 and self.caixas[i][3] >= y0
+        )
+
+    def vaga_em(self, x: float, y: float) -> int | None:
+        """Primeira vaga (menor id) que contém o ponto, bordas incluídas"""
+        for index in self._candidatos(x, y, x, y):
+            if cv2.pointPolygonTest(self.poligonos[index], (float(x), float(y)), False) >= 0:
+                return index
+        return None
+
+    def vagas_no_retangulo(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """Vagas cuja caixa envolvente intersecta o retângulo"""
+        return self._candidatos(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+    def vagas_na_regiao(self, regiao) -> List[int]:
+        """Vagas com o centro dentro de um polígono (ex.: uma zona ou andar)"""
+        regiao = np.asarray(regiao, dtype=np.float32).reshape(-1, 2)
+        x0, y0 = regiao.min(axis=0)
+        x1, y1 = regiao.max(axis=0)
+
+        vagas = []
+        for index in self._candidatos(x0, y0, x1, y1):
+            cx, cy = self.poligonos[index].mean(axis=0)
+            if cv2.pointPolygonTest(regiao, (float(cx), float(cy)), False) >= 0:
+                vagas.append(index)
+        return vagas
+
+
+def caminho_resolucao(layout_path: str | Path) -> Path:
+    layout_path = Path(layout_path)
+    return layout_path.with_name(f"{layout_path.name}.resolucao.json")
+
+
+def salvar_resolucao_referencia(layout_path: str | Path, largura: int, altura: int):
+    """Registra a resolução da imagem em que as vagas foram marcadas"""
+    with open(caminho_resolucao(layout_path), "w", encoding="utf-8") as f:
+        json.dump({"largura": int(largura), "altura": int(altura)}, f)
+
+
+def ler_resolucao_referencia(layout_path: str | Path) -> tuple | None:
+    """(largura, altura) da marcação do layout, ou None se não registrada"""
+    try:
+        with open(caminho_resolucao(layout_path), encoding="utf-8") as f:
+            dados = json.load(f)
+        return int(dados["largura"]), int(dados["altura"])
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,351 @@
+import heapq
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Iterator
+import cv2
+import numpy as np
+from src.amostragem import AmostradorQuadros
+from src.batch import registro_ocupacao
+from src.utils import EstacionaClassifier
+
+
+# cabeçalho: altura, largura, canais, slots, consumidores, último publicado, escrita encerrada
+_META = 7
+_VAZIO = -1
+_ESCREVENDO = -2
+# marca o fim de um processo na fila de resultados
+_FIM = "fim"
+# segundos entre verificações dos processos enquanto não chega resultado
+_ESPERA = 0.5
+
+
+class AnelQuadros:
+    """Anel de quadros BGR de tamanho fixo em multiprocessing.shared_memory
+
+    Um processo escreve; consumidores em outros processos mapeiam os slots
+    como arrays NumPy sem cópia. Cada quadro publicado recebe um número de
+    sequência crescente e vai para o slot `seq % slots`; o consumidor `k` de
+    `n` fica com as sequências `seq % n == k`. O número de sequência gravado
+    em cada slot é a passagem de bastão: o leitor confere, depois de usar o
+    quadro, se o slot ainda tem a sequência que ele leu (valido()).
+
+    Com `sobrescrever` (câmeras ao vivo) o escritor nunca espera: o slot mais
+    antigo é reescrito e um consumidor atrasado pula para a sequência mais
+    antiga ainda disponível, contando as perdidas; como o slot pode ser
+    reescrito a qualquer momento, o consumidor copia o quadro e o libera antes
+    de analisar. Sem ele o escritor espera o consumidor dono da sequência
+    anterior do slot terminar (nenhum quadro se perde) e a análise lê o slot sem cópia.
+    """
+
+    def __init__(self, memoria: shared_memory.SharedMemory, criador: bool):
+        self.memoria = memoria
+        self.criador = criador
+
+        meta = np.ndarray((_META,), dtype=np.int64, buffer=memoria.buf)
+        altura, largura, canais, slots, consumidores = (int(v) for v in meta[:5])
+        self.forma = (altura, largura, canais)
+        self.slots = slots
+        self.consumidores = consumidores
+        self.nome = memoria.name
+
+        # layout: meta | seq por slot | frame_idx por slot | t_ms por slot | concluído por consumidor | quadros
+        inteiros = _META + 2 * slots + consumidores
+        self._meta = meta
+        self._seq = np.ndarray((slots,), dtype=np.int64, buffer=memoria.buf, offset=8 * _META)
+        self._frame_idx = np.ndarray((slots,), dtype=np.int64, buffer=memoria.buf, offset=8 * (_META + slots))
+        self._t_ms = np.ndarray((slots,), dtype=np.float64, buffer=memoria.buf, offset=8 * (_META + 2 * slots))
+        self._concluido = np.ndarray((consumidores,), dtype=np.int64, buffer=memoria.buf,
+                                     offset=8 * (_META + 3 * slots))
+        inicio_quadros = 8 * (inteiros + slots)
+        self.quadros = np.ndarray((slots, *self.forma), dtype=np.uint8, buffer=memoria.buf, offset=inicio_quadros)
+
+        # lado do escritor / do leitor
+        self.perdidos = 0
+        self.sobrescritos = 0
+        self._ultimo = None
+        self._consumidor = None
+
+    @staticmethod
+    def _tamanho(forma: tuple, slots: int, consumidores: int) -> int:
+        return 8 * (_META + 3 * slots + consumidores) + slots * int(np.prod(forma))
+
+    @classmethod
+    def criar(cls, forma: tuple, slots: int = 8, consumidores: int = 1) -> "AnelQuadros":
+        if slots < 2 or consumidores < 1:
+            raise ValueError("use slots >= 2 e consumidores >= 1")
+        forma = tuple(int(v) for v in forma) + ((3,) if len(forma) == 2 else ())
+        memoria = shared_memory.SharedMemory(create=True, size=cls._tamanho(forma, slots, consumidores))
+
+        meta = np.ndarray((_META,), dtype=np.int64, buffer=memoria.buf)
+        meta[:5] = (*forma, slots, consumidores)
+        meta[5] = -1
+        meta[6] = 0
+        anel = cls(memoria, criador=True)
+        anel._seq[:] = _VAZIO
+        anel._concluido[:] = -1
+        return anel
+
+    @classmethod
+    def abrir(cls, nome: str) -> "AnelQuadros":
+        """Mapeia um anel criado por outro processo"""
+        return cls(shared_memory.SharedMemory(name=nome), criador=False)
+
+    # ---- escritor -------------------------------------------------------
+
+    def reservar(self, sobrescrever: bool = True, parar=None) -> tuple | None:
+        """(seq, slot como array) para o próximo quadro; None se `parar` for acionado esperando"""
+        seq = int(self._meta[5]) + 1
+        slot = seq % self.slots
+        anterior = seq - self.slots
+
+        if anterior >= 0:
+            dono = anterior % self.consumidores
+            if sobrescrever:
+                if self._concluido[dono] < anterior:
+                    self.sobrescritos += 1
+            else:
+                # contrapressão: espera o dono da sequência anterior do slot terminar
+                while self._concluido[dono] < anterior:
+                    if parar is not None and parar.is_set():
+                        return None
+                    time.sleep(0.0005)
+
+        self._seq[slot] = _ESCREVENDO
+        return seq, self.quadros[slot]
+
+    def publicar(self, seq: int, frame_idx: int, t_ms: float):
+        slot = seq % self.slots
+        self._frame_idx[slot] = frame_idx
+        self._t_ms[slot] = t_ms
+        self._seq[slot] = seq
+        self._meta[5] = seq
+
+    def escrever(self, frame: np.ndarray, frame_idx: int, t_ms: float, sobrescrever: bool = True) -> int:
+        """Copia um quadro já decodificado para o próximo slot"""
+        seq, destino = self.reservar(sobrescrever)
+        np.copyto(destino, frame)
+        self.publicar(seq, frame_idx, t_ms)
+        return seq
+
+    def encerrar_escrita(self):
+        self._meta[6] = 1
+
+    # ---- leitor ---------------------------------------------------------
+
+    def como_consumidor(self, consumidor: int) -> "AnelQuadros":
+        if not 0 <= consumidor < self.consumidores:
+            raise ValueError(f"consumidor fora de 0..{self.consumidores - 1}")
+        self._consumidor = consumidor
+        self._ultimo = consumidor - self.consumidores
+        return self
+
+    def proximo(self, timeout: float | None = None, parar=None) -> tuple | None:
+        """(seq, frame_idx, t_ms, quadro sem cópia) do próximo quadro deste consumidor
+
+        None quando a escrita acabou e não há mais quadros, no timeout ou com `parar` acionado.
+        O array aponta para o slot: use-o antes de chamar concluir().
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        k, n = self._consumidor, self.consumidores
+        while True:
+            escrito = int(self._meta[5])
+            candidato = self._ultimo + n
+            # slots já reescritos: pula para a sequência nossa mais antiga ainda no anel
+            mais_antiga = escrito - self.slots + 1
+            if candidato < mais_antiga:
+                novo = mais_antiga + (k - mais_antiga) % n
+                self.perdidos += (novo - candidato) // n
+                self._ultimo = novo - n
+                candidato = novo
+
+            if candidato <= escrito:
+                slot = candidato % self.slots
+                if self._seq[slot] == candidato:
+                    self._ultimo = candidato
+                    return candidato, int(self._frame_idx[slot]), float(self._t_ms[slot]), self.quadros[slot]
+                # o escritor está trocando este slot: espera a publicação e recalcula
+                time.sleep(0.0001)
+                continue
+
+            if self._meta[6] or (parar is not None and parar.is_set()):
+                return None
+            if limite is not None and time.monotonic() > limite:
+                return None
+            time.sleep(0.0005)
+
+    def valido(self, seq: int) -> bool:
+        """O slot ainda guarda `seq` (o quadro não foi reescrito enquanto era usado)"""
+        return bool(self._seq[seq % self.slots] == seq)
+
+    def concluir(self, seq: int):
+        self._concluido[self._consumidor] = seq
+
+    def estado(self) -> dict:
+        return {"publicados": int(self._meta[5]) + 1, "slots": self.slots, "consumidores": self.consumidores,
+                "perdidos": self.perdidos, "sobrescritos": self.sobrescritos}
+
+    def fechar(self):
+        """Desfaz o mapeamento; o criador também apaga o bloco"""
+        self.quadros = self._seq = self._frame_idx = self._t_ms = self._concluido = self._meta = None
+        self.memoria.close()
+        if self.criador:
+            self.memoria.unlink()
+
+
+def _decodificar(nome: str, video_path: str, every_n: int, sobrescrever: bool, parar, resultados):
+    """Processo decodificador: retrieve() direto no slot do anel"""
+    anel, cap, amostrador, erro = None, None, None, None
+    try:
+        anel = AnelQuadros.abrir(nome)
+        cap = cv2.VideoCapture(video_path)
+        amostrador = AmostradorQuadros(cap, passo=every_n)
+        while not parar.is_set():
+            # só o grab() e a amostragem; o retrieve() vai para o slot reservado
+            item = amostrador.ler(precisa_quadro=lambda _: False)
+            if item is None:
+                break
+            frame_idx, t_ms, _ = item
+
+            reserva = anel.reservar(sobrescrever, parar)
+            if reserva is None:
+                break
+            seq, slot = reserva
+            ok, frame = cap.retrieve(slot)
+            if not ok:
+                break
+            if frame is not slot and not np.shares_memory(frame, slot):
+                # resolução diferente da do anel (ex.: troca de stream): ajusta e copia
+                np.copyto(slot, cv2.resize(frame, (anel.forma[1], anel.forma[0])))
+            anel.publicar(seq, frame_idx, t_ms)
+    except Exception as e:
+        erro = e
+    finally:
+        estatisticas = {"lidos": amostrador.avancados if amostrador is not None else 0,
+                        "sobrescritos": anel.sobrescritos if anel is not None else 0}
+        resultados.put((_FIM, "decodificador", estatisticas, erro))
+        if anel is not None:
+            anel.encerrar_escrita()
+            anel.fechar()
+        if cap is not None:
+            cap.release()
+
+
+def _consumir(nome: str, consumidor: int, video_path: str, layout_path: str, sobrescrever: bool, parar,
+              resultados, classifier_kwargs: dict):
+    """Processo classificador: lê os slots (sem cópia, se não houver sobrescrita) e devolve só os registros"""
+    anel, descartados, erro = None, 0, None
+    try:
+        anel = AnelQuadros.abrir(nome).como_consumidor(consumidor)
+        classifier = EstacionaClassifier(layout_path, **classifier_kwargs)
+        total = len(classifier.posicao_carro_vaga_full)
+        copia = np.empty(anel.forma, dtype=np.uint8) if sobrescrever else None
+        while True:
+            item = anel.proximo(parar=parar)
+            if item is None:
+                break
+            seq, frame_idx, t_ms, frame = item
+
+            if copia is not None:
+                # o escritor não espera: copia, confere que a cópia é inteira e já libera o slot
+                np.copyto(copia, frame)
+                if not anel.valido(seq):
+                    descartados += 1
+                    continue
+                anel.concluir(seq)
+                frame = copia
+
+            resultado = classifier.classificar_quadro(frame)
+            if copia is None:
+                anel.concluir(seq)
+            resultados.put((seq, registro_ocupacao(video_path, frame_idx, t_ms, resultado, total)))
+    except Exception as e:
+        erro = e
+    finally:
+        estatisticas = {"perdidos": anel.perdidos if anel is not None else 0, "descartados": descartados}
+        resultados.put((_FIM, f"classificador-{consumidor}", estatisticas, erro))
+        if anel is not None:
+            anel.fechar()
+
+
+def processar_em_memoria(video_path: str | Path, layout_path: str | Path, consumidores: int = 2, slots: int = 8,
+                         every_n: int = 1, sobrescrever: bool = False, estatisticas: dict | None = None,
+                         **classifier_kwargs) -> Iterator[dict]:
+    """Decodificador e classificadores em processos separados ligados pelo anel
+
+    Entre processos só passam os registros; os quadros ficam na memória
+    compartilhada. Cada classificador tem o próprio estado adaptativo e vê um
+    quadro a cada `consumidores`. Sem `sobrescrever` os registros saem na
+    ordem do vídeo; com ele (fontes ao vivo) saem na ordem em que ficam prontos.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise IOError(f"não foi possível abrir o vídeo: {video_path}")
+    forma = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    cap.release()
+
+    anel = AnelQuadros.criar(forma, max(slots, consumidores + 1), consumidores)
+    parar = mp.Event()
+    resultados = mp.Queue()
+
+    processos = [mp.Process(target=_decodificar, name="decodificador", daemon=True,
+                            args=(anel.nome, str(video_path), every_n, sobrescrever, parar, resultados))]
+    processos += [mp.Process(target=_consumir, name=f"classificador-{k}", daemon=True,
+                             args=(anel.nome, k, str(video_path), str(layout_path), sobrescrever, parar,
+                                   resultados, classifier_kwargs))
+                  for k in range(consumidores)]
+
+    inicio = time.perf_counter()
+    for processo in processos:
+        processo.start()
+
+    parcial = {"lidos": 0, "sobrescritos": 0, "perdidos": 0, "descartados": 0}
+    classificados = 0
+    try:
+        pendentes, proximo = [], 0
+        ativos = {processo.name: processo for processo in processos}
+        sem_aviso = set()
+        while ativos:
+            try:
+                mensagem = resultados.get(timeout=_ESPERA)
+            except queue.Empty:
+                # processo morto sem mandar o fim (ex.: morto pelo sistema): a fila nunca mais recebe nada
+                mortos = {nome for nome, processo in ativos.items() if not processo.is_alive()}
+                # o fim pode ter sido enviado logo antes de morrer: só conta na segunda verificação
+                for nome in mortos & sem_aviso:
+                    raise RuntimeError(f"{nome} terminou sem resultado (código {ativos[nome].exitcode})")
+                sem_aviso = mortos
+                continue
+
+            if mensagem[0] == _FIM:
+                _, nome, contagens, erro = mensagem
+                if erro is not None:
+                    raise RuntimeError(f"{nome} falhou: {erro!r}") from erro
+                del ativos[nome]
+                for chave, valor in contagens.items():
+                    parcial[chave] += valor
+                continue
+
+            seq, registro = mensagem
+            classificados += 1
+            if sobrescrever:
+                yield registro
+                continue
+            # reordena: cada consumidor entrega em ordem, mas intercalados entre si
+            heapq.heappush(pendentes, (seq, registro))
+            while pendentes and pendentes[0][0] == proximo:
+                yield heapq.heappop(pendentes)[1]
+                proximo += 1
+        for _, registro in sorted(pendentes, key=lambda p: p[0]):
+            yield registro
+    finally:
+        parar.set()
+        for processo in processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        if estatisticas is not None:
+            estatisticas.update(parcial, classificados=classificados, segundos=time.perf_counter() - inicio)
+        anel.fechar()
@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+
+# limites (ms) dos buckets exportados no formato Prometheus
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histograma:
+    """Latências de uma etapa: janela móvel para percentis/FPS e contadores acumulados por bucket"""
+
+    def __init__(self, janela: int = 300, buckets: tuple = BUCKETS_MS):
+        self.amostras = deque(maxlen=janela)
+        self.instantes = deque(maxlen=janela)
+        self.buckets = buckets
+        self.contagem_buckets = [0] * len(buckets)
+        self.total = 0
+        self.soma_ms = 0.0
+
+    def adicionar(self, ms: float, instante: float):
+        self.amostras.append(ms)
+        self.instantes.append(instante)
+        self.total += 1
+        self.soma_ms += ms
+        for i, limite in enumerate(self.buckets):
+            if ms <= limite:
+                self.contagem_buckets[i] += 1
+                break
+
+    def fps(self) -> float:
+        """Eventos por segundo dentro da janela"""
+        if len(self.instantes) < 2:
+            return 0.0
+        duracao = self.instantes[-1] - self.instantes[0]
+        return (len(self.instantes) - 1) / duracao if duracao > 0 else 0.0
+
+    def resumo(self) -> dict:
+        amostras = np.fromiter(self.amostras, dtype=np.float64, count=len(self.amostras))
+        if len(amostras) == 0:
+            return {"total": self.total, "janela": 0}
+        p50, p90, p99 = np.percentile(amostras, (50, 90, 99))
+        return {
+            "total": self.total,
+            "janela": len(amostras),
+            "media_ms": round(float(amostras.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p90_ms": round(float(p90), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(amostras.max()), 3),
+            "fps": round(self.fps(), 2),
+        }
+
+
+class _Medicao:
+    __slots__ = ("metricas", "nome", "inicio")
+
+    def __init__(self, metricas: "Metricas", nome: str):
+        self.metricas = metricas
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        fim = time.perf_counter()
+        self.metricas.registrar(self.nome, (fim - self.inicio) * 1000, fim)
+        return False
+
+
+class Cronometro:
+    """Soma o tempo de várias etapas intercaladas (ex.: features vaga a vaga) e registra uma amostra por etapa"""
+
+    def __init__(self, metricas: "Metricas"):
+        self.metricas = metricas
+        self.somas: Dict[str, float] = {}
+        self._ultimo = time.perf_counter()
+
+    def iniciar(self):
+        self._ultimo = time.perf_counter()
+
+    def marcar(self, nome: str):
+        agora = time.perf_counter()
+        self.somas[nome] = self.somas.get(nome, 0.0) + agora - self._ultimo
+        self._ultimo = agora
+
+    def fechar(self):
+        agora = time.perf_counter()
+        for nome, segundos in self.somas.items():
+            self.metricas.registrar(nome, segundos * 1000, agora)
+        self.somas.clear()
+
+
+class _Nulo:
+    """Medição desligada: todas as operações são no-op"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iniciar(self):
+        pass
+
+    def marcar(self, nome: str):
+        pass
+
+    def fechar(self):
+        pass
+
+
+_NULO = _Nulo()
+
+
+class Metricas:
+    """Registro de latências por etapa
+
+    Desligado (`ativo=False`), medir() e cronometro() devolvem um objeto no-op
+    compartilhado: o custo é uma chamada de método por ponto instrumentado.
+    """
+
+    def __init__(self, ativo: bool = False, janela: int = 300, buckets: tuple = BUCKETS_MS):
+        self.ativo = ativo
+        self.janela = janela
+        self.buckets = buckets
+        self.histogramas: Dict[str, Histograma] = {}
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+
+    def medir(self, nome: str):
+        """Context manager que registra a duração do bloco em `nome`"""
+        if not self.ativo:
+            return _NULO
+        return _Medicao(self, nome)
+
+    def cronometro(self):
+        if not self.ativo:
+            return _NULO
+        return Cronometro(self)
+
+    def registrar(self, nome: str, ms: float, instante: float | None = None):
+        if not self.ativo:
+            return
+        with self._lock:
+            histograma = self.histogramas.get(nome)
+            if histograma is None:
+                histograma = self.histogramas[nome] = Histograma(self.janela, self.buckets)
+            histograma.adicionar(ms, time.perf_counter() if instante is None else instante)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            etapas = {nome: h.resumo() for nome, h in sorted(self.histogramas.items())}
+        return {"timestamp": round(time.time(), 3), "uptime_s": round(time.time() - self.inicio, 1), "etapas": etapas}
+
+    def prometheus(self, prefixo: str = "vagas") -> str:
+        """Texto no formato de exposição do Prometheus (histogramas + FPS da janela)"""
+        linhas = [f"# HELP {prefixo}_etapa_ms Latência por etapa do processamento em milissegundos",
+                  f"# TYPE {prefixo}_etapa_ms histogram"]
+        fps = [f"# HELP {prefixo}_etapa_fps Execuções por segundo na janela recente",
+               f"# TYPE {prefixo}_etapa_fps gauge"]
+
+        with self._lock:
+            for nome, h in sorted(self.histogramas.items()):
+                etapa = re.sub(r"[^a-zA-Z0-9_.:-]", "_", nome)
+                acumulado = 0
+                for limite, contagem in zip(h.buckets, h.contagem_buckets):
+                    acumulado += contagem
+                    linhas.append(f'{prefixo}_etapa_ms_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+                linhas.append(f'{prefixo}_etapa_ms_bucket{{etapa="{etapa}",le="+Inf"}} {h.total}')
+                linhas.append(f'{prefixo}_etapa_ms_sum{{etapa="{etapa}"}} {h.soma_ms:.3f}')
+                linhas.append(f'{prefixo}_etapa_ms_count{{etapa="{etapa}"}} {h.total}')
+                fps.append(f'{prefixo}_etapa_fps{{etapa="{etapa}"}} {h.fps():.3f}')
+
+        return "\n".join(linhas + fps) + "\n"
+
+    def formatar(self, etapas: List[str] | None = None) -> str:
+        """Resumo curto, uma linha por etapa (para o overlay da interface)"""
+        linhas = []
+        for nome, r in self.snapshot()["etapas"].items():
+            if (etapas is None or nome in etapas) and r.get("janela"):
+                linhas.append(f"{nome}: {r['p50_ms']:.1f} ms (p90 {r['p90_ms']:.1f}) {r['fps']:.1f}/s")
+        return "\n".join(linhas)
+
+    def exportar(self, pasta: str | Path):
+        """Grava metricas.prom e metricas.json em `pasta` (escrita atômica)"""
+        pasta = Path(pasta)
+        pasta.mkdir(parents=True, exist_ok=True)
+        _gravar_atomico(pasta / "metricas.prom", self.prometheus())
+        _gravar_atomico(pasta / "metricas.json", json.dumps(self.snapshot(), indent=2, ensure_ascii=False))
+
+
+def _gravar_atomico(caminho: Path, texto: str):
+    fd, temporario = tempfile.mkstemp(prefix=caminho.name, suffix=".tmp", dir=caminho.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+
+class ExportadorPeriodico(threading.Thread):
+    """Exporta as métricas para uma pasta a cada `intervalo` segundos (e uma última vez ao parar)"""
+
+    def __init__(self, metricas: Metricas, pasta: str | Path, intervalo: float = 10.0):
+        super().__init__(name="exportador-metricas", daemon=True)
+        self.metricas = metricas
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            self.metricas.exportar(self.pasta)
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        self.metricas.exportar(self.pasta)
+
+
+# instância compartilhada e desligada: padrão de quem não pede instrumentação
+DESLIGADAS = Metricas(ativo=False)
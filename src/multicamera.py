@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict
+import cv2
+from src.batch import registro_ocupacao
+from src.utils import EstacionaClassifier
+
+
+class FonteCamera:
+    """Uma câmera do motor: captura, classificador próprio e fila limitada de quadros"""
+
+    def __init__(self, nome: str, video_path: str | Path, classifier: EstacionaClassifier,
+                 profundidade: int = 2, descartar_antigos: bool = True, loop: bool = False,
+                 tempo_real: bool = False):
+        self.nome = nome
+        self.video_path = str(video_path)
+        self.classifier = classifier
+        self.total = len(classifier.posicao_carro_vaga_full)
+        self.descartar_antigos = descartar_antigos
+        self.loop = loop
+        self.tempo_real = tempo_real
+
+        self.fila = deque(maxlen=profundidade)
+        self.profundidade = profundidade
+        self.em_andamento = False
+        self.terminou = False
+        self.ultimo = None
+
+        self.decodificados = 0
+        self.classificados = 0
+        self.descartados = 0
+        self.segundos_classificando = 0.0
+        self.erro = None
+
+
+class MotorMultiCamera:
+    """Executa várias câmeras num só processo
+
+    Cada câmera decodifica na sua própria thread e entrega quadros numa fila
+    limitada. Um despachante distribui a classificação num pool de threads
+    compartilhado (o OpenCV libera o GIL), em rodízio e com no máximo um
+    quadro em processamento por câmera: nenhuma câmera monopoliza o pool e o
+    estado adaptativo de cada classificador nunca é acessado em paralelo.
+    """
+
+    def __init__(self, workers: int | None = None, ao_registrar: Callable[[dict], None] | None = None):
+        """ao_registrar: chamado (numa thread do pool) com cada registro novo de qualquer câmera"""
+        self.workers = workers or os.cpu_count() or 1
+        self.ao_registrar = ao_registrar
+        self.fontes: Dict[str, FonteCamera] = {}
+
+        self._cond = threading.Condition()
+        self._parar = threading.Event()
+        self._threads = []
+        self._executor = None
+        self._em_voo = 0
+        self._rodizio = 0
+
+    def adicionar_camera(self, nome: str, video_path: str | Path, layout_path: str | Path,
+                         profundidade: int = 2, descartar_antigos: bool = True, loop: bool = False,
+                         tempo_real: bool = False, **classifier_kwargs) -> FonteCamera:
+        """Registra uma câmera; com descartar_antigos=False o decodificador espera a fila esvaziar"""
+        if nome in self.fontes:
+            raise ValueError(f"câmera já cadastrada: {nome}")
+        if self._threads:
+            raise RuntimeError("adicione as câmeras antes de iniciar o motor")
+
+        classifier = EstacionaClassifier(layout_path, **classifier_kwargs)
+        fonte = FonteCamera(nome, video_path, classifier, profundidade, descartar_antigos, loop, tempo_real)
+        self.fontes[nome] = fonte
+        return fonte
+
+    def iniciar(self):
+        self._parar.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="classificador")
+
+        for fonte in self.fontes.values():
+            thread = threading.Thread(target=self._decodificar, args=(fonte,), name=f"decoder-{fonte.nome}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        despachante = threading.Thread(target=self._despachar, name="despachante", daemon=True)
+        despachante.start()
+        self._threads.append(despachante)
+
+    def parar(self):
+        self._parar.set()
+        with self._cond:
+            self._cond.notify_all()
+
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def aguardar(self, timeout: float | None = None) -> bool:
+        """Espera todas as câmeras sem loop terminarem; devolve False no timeout"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._parar.is_set():
+                if all(f.terminou and not f.fila and not f.em_andamento for f in self.fontes.values()):
+                    return True
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._cond.wait(restante)
+        return False
+
+    def ocupacao(self) -> Dict[str, dict | None]:
+        """Último registro de ocupação de cada câmera"""
+        with self._cond:
+            return {nome: fonte.ultimo for nome, fonte in self.fontes.items()}
+
+    def estatisticas(self) -> Dict[str, dict]:
+        with self._cond:
+            return {
+                nome: {
+                    "decodificados": f.decodificados,
+                    "classificados": f.classificados,
+                    "descartados": f.descartados,
+                    "fila": len(f.fila),
+                    "ms_por_quadro": 1000 * f.segundos_classificando / f.classificados if f.classificados else 0.0,
+                    "terminou": f.terminou,
+                    "erro": f.erro,
+                }
+                for nome, f in self.fontes.items()
+            }
+
+    def _decodificar(self, fonte: FonteCamera):
+        cap = cv2.VideoCapture(fonte.video_path)
+        if not cap.isOpened():
+            fonte.erro = "não foi possível abrir o vídeo"
+
+        intervalo = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        proximo = time.monotonic()
+        frame_idx = -1
+
+        while not self._parar.is_set() and cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                if fonte.loop and frame_idx >= 0:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    frame_idx = -1
+                    continue
+                break
+
+            frame_idx += 1
+            t_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+
+            if fonte.tempo_real:
+                proximo += intervalo
+                espera = proximo - time.monotonic()
+                if espera > 0:
+                    self._parar.wait(espera)
+
+            with self._cond:
+                # contrapressão: espera espaço ou descarta o quadro mais antigo
+                while not fonte.descartar_antigos and len(fonte.fila) >= fonte.profundidade and not self._parar.is_set():
+                    self._cond.wait()
+                if len(fonte.fila) == fonte.fila.maxlen:
+                    fonte.descartados += 1
+                fonte.fila.append((frame_idx, t_ms, frame))
+                fonte.decodificados += 1
+                self._cond.notify_all()
+
+        cap.release()
+        with self._cond:
+            fonte.terminou = True
+            self._cond.notify_all()
+
+    def _despachar(self):
+        fontes = list(self.fontes.values())
+
+        with self._cond:
+            while not self._parar.is_set():
+                tarefa = self._proxima_tarefa(fontes)
+                if tarefa is None:
+                    self._cond.wait()
+                    continue
+
+                fonte, item = tarefa
+                fonte.em_andamento = True
+                self._em_voo += 1
+                self._executor.submit(self._classificar, fonte, item)
+                # libera decodificadores esperando espaço na fila
+                self._cond.notify_all()
+
+    def _proxima_tarefa(self, fontes: list) -> tuple | None:
+        """Rodízio entre câmeras com quadro pendente e nada em processamento"""
+        if self._em_voo >= self.workers:
+            return None
+
+        for passo in range(len(fontes)):
+            fonte = fontes[(self._rodizio + passo) % len(fontes)]
+            if fonte.fila and not fonte.em_andamento:
+                self._rodizio = (self._rodizio + passo + 1) % len(fontes)
+                return fonte, fonte.fila.popleft()
+        return None
+
+    def _classificar(self, fonte: FonteCamera, item: tuple):
+        frame_idx, t_ms, frame = item
+        inicio = time.perf_counter()
+        registro = None
+
+        try:
+            resultados = fonte.classifier.classificar_quadro(frame)
+            registro = registro_ocupacao(fonte.video_path, frame_idx, t_ms, resultados, fonte.total)
+            registro["camera"] = fonte.nome
+        except Exception as e:
+            fonte.erro = str(e)
+
+        # fora do lock (não trava as outras câmeras) e antes de liberar a câmera,
+        # então os registros de uma câmera chegam ao callback em ordem
+        if registro is not None and self.ao_registrar is not None:
+            try:
+                self.ao_registrar(registro)
+            except Exception as e:
+                fonte.erro = f"ao_registrar: {e}"
+
+        with self._cond:
+            if registro is not None:
+                fonte.ultimo = registro
+                fonte.classificados += 1
+                fonte.segundos_classificando += time.perf_counter() - inicio
+            fonte.em_andamento = False
+            self._em_voo -= 1
+            self._cond.notify_all()
@@ -0,0 +1,49 @@
+from dataclasses import asdict, dataclass, fields, replace
+
+
+@dataclass(frozen=True)
+class ParametrosClassificacao:
+    """Constantes de decisão e de pré-processamento do classificador
+
+    Os padrões são os valores históricos de EstacionaClassifier. Os campos de
+    pré-processamento (bloco_adaptativo, c_adaptativo) mudam a imagem binária;
+    os demais só a decisão, que pode ser refeita sobre as mesmas features.
+    """
+
+    # pesos da cascata de pontuação (vaga livre)
+    peso_count: float = 0.4
+    peso_bordas: float = 0.3
+    peso_textura: float = 0.2
+    peso_cor: float = 0.1
+
+    # limites de cada critério e da decisão final
+    limite_bordas: float = 0.15
+    limite_textura: float = 150
+    limite_cor: float = 30
+    limite_score: float = 0.5
+    threshold_margin: float = 0.15
+
+    # adaptiveThreshold de implement_process (bloco na escala 1, ímpar)
+    bloco_adaptativo: int = 25
+    c_adaptativo: float = 12
+
+    PRE_PROCESSAMENTO = ("bloco_adaptativo", "c_adaptativo")
+
+    def __post_init__(self):
+        if self.bloco_adaptativo < 3:
+            raise ValueError("bloco_adaptativo deve ser >= 3")
+
+    @classmethod
+    def nomes(cls) -> list:
+        return [campo.name for campo in fields(cls)]
+
+    def com(self, **valores) -> "ParametrosClassificacao":
+        """Cópia com alguns campos trocados (nomes inválidos geram TypeError)"""
+        return replace(self, **valores)
+
+    def como_dict(self) -> dict:
+        return asdict(self)
+
+    def pre_processamento(self) -> tuple:
+        """Chave dos campos que afetam implement_process"""
+        return tuple(getattr(self, nome) for nome in self.PRE_PROCESSAMENTO)
@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+# marca o fim do fluxo; atravessa todos os estágios
+FIM = object()
+
+
+class Ritmo:
+    """Cadência explícita: no máximo `fps` itens por segundo (None ou 0 = sem limite)"""
+
+    def __init__(self, fps: float | None, parar: threading.Event | None = None):
+        self.intervalo = 1.0 / fps if fps else 0.0
+        self.parar = parar or threading.Event()
+        self._proximo = None
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+
+        agora = time.monotonic()
+        if self._proximo is None or agora - self._proximo > self.intervalo:
+            # atrasado demais: recomeça a cadência em vez de acelerar para compensar
+            self._proximo = agora
+        espera = self._proximo - agora
+        if espera > 0:
+            self.parar.wait(espera)
+        self._proximo += self.intervalo
+
+
+class UltimoItem:
+    """Caixa de um item só: o mais novo substitui o pendente (o mais recente vence)
+
+    Para consumidores lentos (ex.: a interface): nunca acumula fila, e os
+    itens substituídos antes de serem pegos contam como descartados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item = None
+        self._pendente = False
+        self.entregues = 0
+        self.descartados = 0
+
+    def colocar(self, item) -> bool:
+        """Guarda o item; True se a caixa estava vazia (o consumidor precisa ser avisado)"""
+        with self._lock:
+            if self._pendente:
+                self.descartados += 1
+            avisar = not self._pendente
+            self._item = item
+            self._pendente = True
+            return avisar
+
+    def pegar(self):
+        """Retira o item pendente (None se não houver)"""
+        with self._lock:
+            if not self._pendente:
+                return None
+            item, self._item = self._item, None
+            self._pendente = False
+            self.entregues += 1
+            return item
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {"entregues": self.entregues, "descartados": self.descartados}
+
+
+class Estagio(threading.Thread):
+    """Estágio do pipeline: lê da fila de entrada, aplica `funcao` e escreve na de saída
+
+    Sem fila de entrada o estágio é uma fonte e `funcao()` é chamada sem
+    argumentos. Retornar FIM encerra o fluxo; retornar None descarta o item.
+    A espera do `ritmo` acontece antes de cada chamada e fica fora da latência.
+    """
+
+    def __init__(self, nome: str, funcao: Callable, entrada: queue.Queue | None,
+                 saida: queue.Queue | None, parar: threading.Event, ritmo: Ritmo | None = None):
+        super().__init__(name=f"estagio-{nome}", daemon=True)
+        self.nome = nome
+        self.funcao = funcao
+        self.entrada = entrada
+        self.saida = saida
+        self.parar = parar
+        self.ritmo = ritmo
+
+        self.processados = 0
+        self.latencia_ms = 0.0
+        self.latencia_max_ms = 0.0
+        self.erro = None
+
+    def run(self):
+        try:
+            while not self.parar.is_set():
+                if self.entrada is not None:
+                    try:
+                        item = self.entrada.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if item is FIM:
+                        self._colocar(FIM)
+                        break
+
+                if self.ritmo is not None:
+                    self.ritmo.esperar()
+
+                inicio = time.perf_counter()
+                resultado = self.funcao(item) if self.entrada is not None else self.funcao()
+                self._medir(time.perf_counter() - inicio)
+
+                if resultado is FIM:
+                    self._colocar(FIM)
+                    break
+                if resultado is not None:
+                    self._colocar(resultado)
+        except Exception as e:
+            self.erro = e
+            self.parar.set()
+
+    def _colocar(self, item):
+        if self.saida is None:
+            return
+        while not self.parar.is_set():
+            try:
+                self.saida.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _medir(self, segundos: float):
+        ms = segundos * 1000
+        self.processados += 1
+        # média móvel exponencial: acompanha mudanças sem guardar histórico
+        self.latencia_ms = ms if self.processados == 1 else 0.9 * self.latencia_ms + 0.1 * ms
+        self.latencia_max_ms = max(self.latencia_max_ms, ms)
+
+    def estado(self) -> dict:
+        return {
+            "fila": self.entrada.qsize() if self.entrada is not None else 0,
+            "processados": self.processados,
+            "latencia_ms": round(self.latencia_ms, 2),
+            "latencia_max_ms": round(self.latencia_max_ms, 2),
+        }
+
+
+class Pipeline:
+    """Sequência de estágios ligados por filas limitadas, cada um na sua thread"""
+
+    def __init__(self, profundidade: int = 2):
+        self.profundidade = profundidade
+        self.parar = threading.Event()
+        self.estagios: List[Estagio] = []
+
+    def adicionar(self, nome: str, funcao: Callable, fps: float | None = None) -> Estagio:
+        """Acrescenta um estágio ao fim; `fps` limita a cadência dele"""
+        entrada = None
+        if self.estagios:
+            entrada = queue.Queue(maxsize=self.profundidade)
+            self.estagios[-1].saida = entrada
+
+        ritmo = Ritmo(fps, self.parar) if fps else None
+        estagio = Estagio(nome, funcao, entrada, None, self.parar, ritmo)
+        self.estagios.append(estagio)
+        return estagio
+
+    def iniciar(self):
+        for estagio in self.estagios:
+            estagio.start()
+
+    def ativo(self) -> bool:
+        return any(estagio.is_alive() for estagio in self.estagios)
+
+    def encerrar(self, timeout: float = 2.0):
+        self.parar.set()
+        for estagio in self.estagios:
+            estagio.join(timeout)
+
+    def erros(self) -> List[Exception]:
+        return [estagio.erro for estagio in self.estagios if estagio.erro is not None]
+
+    def estatisticas(self) -> Dict[str, dict]:
+        """Profundidade da fila de entrada e latência de cada estágio"""
+        return {estagio.nome: estagio.estado() for estagio in self.estagios}
@@ -0,0 +1,231 @@
+import hashlib
+from pathlib import Path
+import numpy as np
+from src.parametros import ParametrosClassificacao
+
+
+# colunas da matriz de decisão N x F
+COLUNAS = ("excesso_count", "bordas", "textura", "cor")
+
+
+def montar_matriz(count: np.ndarray, limiar: np.ndarray, edge_density: np.ndarray,
+                  texture_score: np.ndarray, color_std: np.ndarray) -> np.ndarray:
+    """Matriz N x 4 de uma decisão: excesso do count sobre o limiar dinâmico, bordas, textura e cor
+
+    excesso_count = (count - limiar) / max(limiar, 1): negativo exatamente quando
+    count < limiar, e na mesma ordem de grandeza entre vagas e escalas.
+    """
+    count = np.asarray(count, dtype=np.int64)
+    limiar = np.asarray(limiar, dtype=np.int64)
+    excesso = (count - limiar) / np.maximum(limiar, 1)
+    return np.column_stack([excesso, edge_density, texture_score, color_std]).astype(np.float64)
+
+
+def _sigmoide(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -40, 40)))
+
+
+def _assinatura_arrays(tipo: str, arrays: dict) -> str:
+    h = hashlib.sha256(tipo.encode())
+    for nome in sorted(arrays):
+        h.update(nome.encode())
+        h.update(np.ascontiguousarray(arrays[nome]).tobytes())
+    return h.hexdigest()[:16]
+
+
+class PontuadorRegras:
+    """A cascata histórica: soma dos pesos dos critérios de vaga livre atendidos
+
+    Reproduz exatamente a decisão de sempre (mesmas comparações, mesma ordem
+    das somas); pesos e limites vêm de ParametrosClassificacao.
+    """
+
+    tipo = "regras"
+
+    def __init__(self, parametros: ParametrosClassificacao | None = None):
+        self.parametros = parametros or ParametrosClassificacao()
+        self.limite = self.parametros.limite_score
+
+    def pontuar(self, matriz: np.ndarray) -> np.ndarray:
+        p = self.parametros
+        excesso, bordas, textura, cor = matriz.T
+        score = np.zeros(len(matriz))
+        score += np.where(excesso < 0, p.peso_count, 0)
+        score += np.where(bordas < p.limite_bordas, p.peso_bordas, 0)
+        score += np.where(textura < p.limite_textura, p.peso_textura, 0)
+        score += np.where(cor < p.limite_cor, p.peso_cor, 0)
+        return score
+
+    def assinatura(self) -> str:
+        # pesos e limites já entram na assinatura pelos parâmetros do classificador
+        return self.tipo
+
+
+class PontuadorLogistico:
+    """Regressão logística sobre as colunas padronizadas: score = sigmoide(z @ pesos + vies)"""
+
+    tipo = "logistico"
+
+    def __init__(self, pesos: np.ndarray, vies: float, media: np.ndarray, escala: np.ndarray, limite: float = 0.5):
+        self.pesos = np.asarray(pesos, dtype=np.float64)
+        self.vies = float(vies)
+        self.media = np.asarray(media, dtype=np.float64)
+        self.escala = np.asarray(escala, dtype=np.float64)
+        self.limite = float(limite)
+
+    def pontuar(self, matriz: np.ndarray) -> np.ndarray:
+        return _sigmoide(((matriz - self.media) / self.escala) @ self.pesos + self.vies)
+
+    def arrays(self) -> dict:
+        return {"pesos": self.pesos, "vies": np.array(self.vies), "media": self.media,
+                "escala": self.escala, "limite": np.array(self.limite)}
+
+    def assinatura(self) -> str:
+        return _assinatura_arrays(self.tipo, self.arrays())
+
+
+class PontuadorArvores:
+    """Gradient boosting de árvores rasas guardado como arrays
+
+    Cada árvore é um heap (filhos de i em 2i+1 e 2i+2) de `profundidade` níveis:
+    atributo (-1 numa folha), limiar (vai à esquerda se x <= limiar) e valor da
+    folha. Todas as vagas descem todas as árvores juntas, um nível por vez.
+    """
+
+    tipo = "arvores"
+
+    def __init__(self, atributo: np.ndarray, limiar: np.ndarray, valor: np.ndarray, taxa: float,
+                 base: float, limite: float = 0.5):
+        self.atributo = np.asarray(atributo, dtype=np.int32)
+        self.limiar = np.asarray(limiar, dtype=np.float64)
+        self.valor = np.asarray(valor, dtype=np.float64)
+        self.taxa = float(taxa)
+        self.base = float(base)
+        self.limite = float(limite)
+        self.profundidade = int(np.log2(self.atributo.shape[1] + 1)) - 1
+
+    def pontuar(self, matriz: np.ndarray) -> np.ndarray:
+        n, arvores = len(matriz), len(self.atributo)
+        linhas = np.arange(n)[:, None]
+        colunas = np.arange(arvores)[None, :]
+        no = np.zeros((n, arvores), dtype=np.int64)
+        for _ in range(self.profundidade):
+            atributo = self.atributo[colunas, no]
+            x = matriz[linhas, np.maximum(atributo, 0)]
+            filho = np.where(x <= self.limiar[colunas, no], 2 * no + 1, 2 * no + 2)
+            no = np.where(atributo < 0, no, filho)
+        return _sigmoide(self.base + self.taxa * self.valor[colunas, no].sum(axis=1))
+
+    def arrays(self) -> dict:
+        return {"atributo": self.atributo, "limiar": self.limiar, "valor": self.valor,
+                "taxa": np.array(self.taxa), "base": np.array(self.base), "limite": np.array(self.limite)}
+
+    def assinatura(self) -> str:
+        return _assinatura_arrays(self.tipo, self.arrays())
+
+
+_TIPOS = {classe.tipo: classe for classe in (PontuadorLogistico, PontuadorArvores)}
+
+
+def salvar_pontuador(pontuador, caminho: str | Path):
+    """Grava um modelo treinado (.npz só com arrays, sem pickle)"""
+    if pontuador.tipo not in _TIPOS:
+        raise ValueError(f"pontuador {pontuador.tipo} não é um modelo treinado")
+    np.savez(caminho, tipo=np.array(pontuador.tipo), colunas=np.array(COLUNAS), **pontuador.arrays())
+
+
+def carregar_pontuador(caminho: str | Path):
+    with np.load(caminho, allow_pickle=False) as dados:
+        tipo = str(dados["tipo"])
+        if tipo not in _TIPOS:
+            raise ValueError(f"tipo de modelo desconhecido: {tipo}")
+        if tuple(dados["colunas"]) != COLUNAS:
+            raise ValueError(f"modelo treinado com as colunas {tuple(dados['colunas'])}, esperado {COLUNAS}")
+        arrays = {nome: dados[nome] for nome in dados.files if nome not in ("tipo", "colunas")}
+    return _TIPOS[tipo](**arrays)
+
+
+def treinar_logistico(matriz: np.ndarray, rotulos: np.ndarray, l2: float = 1e-3,
+                      iteracoes: int = 50, limite: float = 0.5) -> PontuadorLogistico:
+    """Ajusta a regressão logística por Newton (IRLS) com regularização L2; rótulo True = livre"""
+    media = matriz.mean(axis=0)
+    escala = matriz.std(axis=0)
+    escala[escala == 0] = 1.0
+    z = np.column_stack([(matriz - media) / escala, np.ones(len(matriz))])
+    y = rotulos.astype(np.float64)
+
+    w = np.zeros(z.shape[1])
+    regularizacao = l2 * len(z) * np.eye(z.shape[1])
+    regularizacao[-1, -1] = 0.0
+    for _ in range(iteracoes):
+        p = _sigmoide(z @ w)
+        gradiente = z.T @ (p - y) + regularizacao @ w
+        hessiana = (z * (p * (1 - p))[:, None]).T @ z + regularizacao + 1e-9 * np.eye(z.shape[1])
+        passo = np.linalg.solve(hessiana, gradiente)
+        w -= passo
+        if np.abs(passo).max() < 1e-8:
+            break
+    return PontuadorLogistico(w[:-1], w[-1], media, escala, limite)
+
+
+def treinar_arvores(matriz: np.ndarray, rotulos: np.ndarray, arvores: int = 50, profundidade: int = 3,
+                    taxa: float = 0.1, min_folha: int = 20, faixas: int = 32, l2: float = 1.0,
+                    limite: float = 0.5) -> PontuadorArvores:
+    """Gradient boosting com perda logística; cortes candidatos nos quantis de cada coluna"""
+    n, f = matriz.shape
+    y = rotulos.astype(np.float64)
+    positivos = np.clip(y.mean(), 1e-6, 1 - 1e-6)
+    base = float(np.log(positivos / (1 - positivos)))
+
+    # cada coluna vira faixas (x <= corte[b]) uma vez só
+    cortes = [np.unique(np.quantile(matriz[:, j], np.linspace(0, 1, faixas + 1)[1:-1])) for j in range(f)]
+    faixa = np.column_stack([np.searchsorted(cortes[j], matriz[:, j], side="left") for j in range(f)])
+
+    nos = 2 ** (profundidade + 1) - 1
+    atributo = np.full((arvores, nos), -1, dtype=np.int32)
+    limiar = np.zeros((arvores, nos))
+    valor = np.zeros((arvores, nos))
+    margem = np.full(n, base)
+
+    for t in range(arvores):
+        p = _sigmoide(margem)
+        g = y - p
+        h = np.maximum(p * (1 - p), 1e-12)
+        no = np.zeros(n, dtype=np.int64)
+
+        for nivel in range(profundidade + 1):
+            for i in range(2 ** nivel - 1, 2 ** (nivel + 1) - 1):
+                dentro = no == i
+                if not dentro.any():
+                    continue
+                g_no, h_no = g[dentro].sum(), h[dentro].sum()
+                valor[t, i] = g_no / (h_no + l2)
+                if nivel == profundidade or dentro.sum() < 2 * min_folha:
+                    continue
+
+                melhor = None
+                ganho_no = g_no ** 2 / (h_no + l2)
+                for j in range(f):
+                    if not len(cortes[j]):
+                        continue
+                    b = faixa[dentro, j]
+                    g_esq = np.cumsum(np.bincount(b, weights=g[dentro], minlength=len(cortes[j]) + 1))[:-1]
+                    h_esq = np.cumsum(np.bincount(b, weights=h[dentro], minlength=len(cortes[j]) + 1))[:-1]
+                    n_esq = np.cumsum(np.bincount(b, minlength=len(cortes[j]) + 1))[:-1]
+                    validos = (n_esq >= min_folha) & (dentro.sum() - n_esq >= min_folha)
+                    ganho = g_esq ** 2 / (h_esq + l2) + (g_no - g_esq) ** 2 / (h_no - h_esq + l2) - ganho_no
+                    ganho[~validos] = -np.inf
+                    k = int(np.argmax(ganho))
+                    if ganho[k] > 1e-9 and (melhor is None or ganho[k] > melhor[0]):
+                        melhor = (ganho[k], j, k)
+
+                if melhor is not None:
+                    _, j, k = melhor
+                    atributo[t, i] = j
+                    limiar[t, i] = cortes[j][k]
+                    esquerda = dentro & (faixa[:, j] <= k)
+                    no[esquerda] = 2 * i + 1
+                    no[dentro & ~esquerda] = 2 * i + 2
+
+        margem += taxa * valor[t, no]
+    return PontuadorArvores(atributo, limiar, valor, taxa, base, limite)
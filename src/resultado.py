@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Iterator, List
+import numpy as np
+
+
+class ResultadoVagas:
+    """Resultado estruturado da classificação de um quadro
+
+    - ids: índices das vagas avaliadas (int64)
+    - is_empty: True para vaga livre (bool)
+    - score: pontuação de vaga livre, 0 a 1 (float64)
+    - features: matriz k x 5 usada na decisão (count, std processada, bordas, textura, std de cor)
+    - total: número de vagas do layout
+
+    Iterar devolve tuplas (index, is_empty, score), como a lista de classificar_vagas.
+    """
+
+    def __init__(self, ids: np.ndarray, is_empty: np.ndarray, score: np.ndarray,
+                 features: np.ndarray, total: int):
+        self.ids = ids
+        self.is_empty = is_empty
+        self.score = score
+        self.features = features
+        self.total = total
+
+    @property
+    def livres(self) -> int:
+        return int(np.count_nonzero(self.is_empty))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[tuple]:
+        return zip(self.ids.tolist(), self.is_empty.tolist(), self.score.tolist())
+
+    def como_lista(self) -> List[tuple]:
+        return list(self)
+
+    def estado(self) -> str:
+        """Uma letra por vaga: 'L' livre, 'O' ocupada, '-' não avaliada"""
+        letras = np.full(self.total, ord("-"), dtype=np.uint8)
+        letras[self.ids] = np.where(self.is_empty, ord("L"), ord("O"))
+        return letras.tobytes().decode("ascii")
+
+
+class RenderizadorOverlay:
+    """Desenho do resultado separado da classificação
+
+    Desenha sobre uma cópia do quadro (o original não é alterado), então pode
+    rodar em outra thread enquanto o próximo quadro é classificado. Com `fps`
+    desenha no máximo `fps` quadros por segundo e devolve None nos demais.
+    """
+
+    def __init__(self, classifier, fps: float | None = None, copiar: bool = True):
+        self.classifier = classifier
+        self.intervalo = 1.0 / fps if fps else 0.0
+        self.copiar = copiar
+        self._lock = threading.Lock()
+        self._ultimo = None
+        self.desenhados = 0
+        self.pulados = 0
+
+    def desenhar(self, image: np.ndarray, resultado: ResultadoVagas) -> np.ndarray | None:
+        with self._lock:
+            agora = time.monotonic()
+            if self.intervalo and self._ultimo is not None and agora - self._ultimo < self.intervalo:
+                self.pulados += 1
+                return None
+            self._ultimo = agora
+            self.desenhados += 1
+
+        if self.copiar:
+            image = image.copy()
+        return self.classifier.desenhar_vagas(image, resultado)
@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Set
+from src.multicamera import MotorMultiCamera
+
+
+# RFC 6455: sufixo fixo do aceite do handshake
+_GUID_WEBSOCKET = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_LIMITE_QUADRO_WS = 64 * 1024
+# o serviço só responde GET: um corpo maior que isto é recusado sem ser lido
+_LIMITE_CORPO = 64 * 1024
+_MOTIVOS = {200: "OK", 101: "Switching Protocols", 304: "Not Modified", 400: "Bad Request",
+            404: "Not Found", 405: "Method Not Allowed"}
+
+# marca na fila de um assinante: diffs foram descartados, mandar snapshot
+_RESSINCRONIZAR = object()
+
+
+class EstadoCamera:
+    """Último estado por vaga de uma câmera, versionado
+
+    A versão só avança quando alguma vaga muda; o snapshot JSON (e seu ETag)
+    é montado uma vez por versão e servido igual a todos os clientes.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.versao = 0
+        self.estado = None
+        self.registro = None
+        self.quadros = 0
+        self.mudancas = 0
+        self._snapshot = None
+
+    def atualizar(self, registro: dict) -> dict | None:
+        """Aplica um registro; devolve o diff (ou None se nenhuma vaga mudou)"""
+        self.quadros += 1
+        anterior = self.estado
+        if registro["estado"] == anterior:
+            return None
+
+        self.estado = registro["estado"]
+        self.registro = registro
+        self.versao += 1
+        self.mudancas += 1
+        self._snapshot = None
+
+        if anterior is None or len(anterior) != len(self.estado):
+            mudancas = [[i, letra] for i, letra in enumerate(self.estado)]
+        else:
+            mudancas = [[i, letra] for i, (antes, letra) in enumerate(zip(anterior, self.estado)) if antes != letra]
+        return {"tipo": "diff", "camera": self.nome, "versao": self.versao, "anterior": self.versao - 1,
+                "frame": registro["frame"], "t_ms": registro["t_ms"], "livres": registro["livres"],
+                "mudancas": mudancas}
+
+    def snapshot(self) -> tuple:
+        """(corpo JSON, ETag) da versão atual"""
+        if self._snapshot is None:
+            registro = self.registro or {}
+            dados = {"tipo": "snapshot", "camera": self.nome, "versao": self.versao, "pronto": self.estado is not None,
+                     "frame": registro.get("frame"), "t_ms": registro.get("t_ms"),
+                     "livres": registro.get("livres"), "total": registro.get("total"), "estado": self.estado}
+            corpo = json.dumps(dados, ensure_ascii=False).encode()
+            self._snapshot = (corpo, '"' + hashlib.sha1(corpo).hexdigest()[:20] + '"')
+        return self._snapshot
+
+
+class _Assinante:
+    """Cliente WebSocket: fila limitada de mensagens já codificadas"""
+
+    def __init__(self, cameras: List[str], profundidade: int):
+        self.cameras = cameras
+        self.fila = asyncio.Queue(maxsize=profundidade)
+        self.ressincronizacoes = 0
+
+    def enviar(self, quadro: bytes):
+        try:
+            self.fila.put_nowait(quadro)
+        except asyncio.QueueFull:
+            # cliente lento: joga fora os diffs pendentes e manda o estado inteiro depois
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait(_RESSINCRONIZAR)
+            self.ressincronizacoes += 1
+
+
+def _quadro_ws(opcode: int, dados: bytes) -> bytes:
+    """Quadro WebSocket do servidor (FIN, sem máscara)"""
+    n = len(dados)
+    if n < 126:
+        cabecalho = bytes([0x80 | opcode, n])
+    elif n < 65536:
+        cabecalho = bytes([0x80 | opcode, 126]) + n.to_bytes(2, "big")
+    else:
+        cabecalho = bytes([0x80 | opcode, 127]) + n.to_bytes(8, "big")
+    return cabecalho + dados
+
+
+async def _ler_quadro_ws(reader: asyncio.StreamReader) -> tuple:
+    """(opcode, dados) do próximo quadro do cliente (mascarado, como manda a RFC)"""
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = int.from_bytes(await reader.readexactly(2), "big")
+    elif n == 127:
+        n = int.from_bytes(await reader.readexactly(8), "big")
+    if n > _LIMITE_QUADRO_WS:
+        raise ValueError("quadro WebSocket grande demais")
+
+    mascara = await reader.readexactly(4) if b1 & 0x80 else None
+    dados = await reader.readexactly(n)
+    if mascara:
+        dados = bytes(b ^ mascara[i % 4] for i, b in enumerate(dados))
+    return b0 & 0x0F, dados
+
+
+def _resposta(status: int, corpo: bytes = b"", cabecalhos: Dict[str, str] | None = None,
+              incluir_corpo: bool = True) -> bytes:
+    linhas = [f"HTTP/1.1 {status} {_MOTIVOS.get(status, '')}"]
+    cabecalhos = dict(cabecalhos or {})
+    if status not in (101, 304):
+        cabecalhos.setdefault("Content-Type", "application/json; charset=utf-8")
+        cabecalhos["Content-Length"] = str(len(corpo))
+    linhas += [f"{nome}: {valor}" for nome, valor in cabecalhos.items()]
+    texto = ("\r\n".join(linhas) + "\r\n\r\n").encode()
+    return texto + corpo if incluir_corpo and status not in (101, 304) else texto
+
+
+def _json(dados) -> bytes:
+    return json.dumps(dados, ensure_ascii=False).encode()
+
+
+def _etag_confere(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ServidorOcupacao:
+    """Serviço local de ocupação: uma análise por câmera, qualquer número de clientes
+
+    As câmeras rodam num MotorMultiCamera; cada registro novo atualiza o
+    EstadoCamera no event loop. HTTP:
+
+    - GET /cameras: lista de câmeras com versão e vagas livres
+    - GET /cameras/<nome>: snapshot com ETag (If-None-Match -> 304)
+    - GET /estatisticas: motor, câmeras e clientes conectados
+    - GET /ws ou /ws/<nome> (WebSocket): snapshot inicial e depois só os diffs
+
+    Diffs são codificados uma vez e copiados para a fila de cada assinante;
+    clientes a mais não custam visão computacional. Um assinante que não
+    acompanha perde os diffs pendentes e recebe um snapshot novo.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", porta: int = 8080, workers: int | None = None,
+                 profundidade_cliente: int = 64):
+        self.host = host
+        self.porta = porta
+        self.profundidade_cliente = profundidade_cliente
+        self.motor = MotorMultiCamera(workers, ao_registrar=self._registro_recebido)
+        self.cameras: Dict[str, EstadoCamera] = {}
+        self.assinantes: Set[_Assinante] = set()
+        self._conexoes: Set[asyncio.StreamWriter] = set()
+        self.requisicoes = 0
+        self._loop = None
+        self._servidor = None
+        self.inicio = time.time()
+
+    def adicionar_camera(self, nome: str, fonte: str | Path, layout_path: str | Path, **opcoes):
+        """opcoes: as de MotorMultiCamera.adicionar_camera (loop, tempo_real, ...) e do classificador"""
+        self.motor.adicionar_camera(nome, fonte, layout_path, **opcoes)
+        self.cameras[nome] = EstadoCamera(nome)
+
+    async def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        # porta 0: o sistema escolhe; guarda a real
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        self.motor.iniciar()
+
+    async def encerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            # conexões abertas (WebSockets) seguram o wait_closed
+            for writer in list(self._conexoes):
+                writer.close()
+            await self._servidor.wait_closed()
+        await asyncio.to_thread(self.motor.parar)
+
+    async def servir(self):
+        await self.iniciar()
+        print(f"Servindo {len(self.cameras)} câmera(s) em http://{self.host}:{self.porta}", file=sys.stderr)
+        try:
+            await self._servidor.serve_forever()
+        finally:
+            await self.encerrar()
+
+    def _registro_recebido(self, registro: dict):
+        # thread do pool do motor: o estado só é tocado dentro do event loop
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._publicar, registro)
+
+    def _publicar(self, registro: dict):
+        camera = self.cameras[registro["camera"]]
+        diff = camera.atualizar(registro)
+        if diff is None:
+            return
+
+        quadro = _quadro_ws(0x1, _json(diff))
+        for assinante in self.assinantes:
+            if camera.nome in assinante.cameras:
+                assinante.enviar(quadro)
+
+    def estatisticas(self) -> dict:
+        motor = self.motor.estatisticas()
+        return {
+            "uptime_s": round(time.time() - self.inicio, 1),
+            "requisicoes": self.requisicoes,
+            "assinantes": len(self.assinantes),
+            "cameras": {
+                nome: {"versao": c.versao, "quadros": c.quadros, "mudancas": c.mudancas, **motor.get(nome, {})}
+                for nome, c in self.cameras.items()
+            },
+        }
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._conexoes.add(writer)
+        try:
+            while True:
+                try:
+                    cabecalho = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+
+                linhas = cabecalho.decode("latin-1").split("\r\n")
+                try:
+                    metodo, alvo, _ = linhas[0].split(" ", 2)
+                except ValueError:
+                    writer.write(_resposta(400, _json({"erro": "requisição inválida"})))
+                    return
+                cabecalhos = {}
+                for linha in linhas[1:]:
+                    nome, _, valor = linha.partition(":")
+                    if nome:
+                        cabecalhos[nome.strip().lower()] = valor.strip()
+                try:
+                    tamanho_corpo = int(cabecalhos.get("content-length", 0) or 0)
+                except ValueError:
+                    tamanho_corpo = -1
+                if not 0 <= tamanho_corpo <= _LIMITE_CORPO:
+                    writer.write(_resposta(400, _json({"erro": "content-length inválido"})))
+                    await writer.drain()
+                    return
+                if tamanho_corpo:
+                    try:
+                        await reader.readexactly(tamanho_corpo)
+                    except asyncio.IncompleteReadError:
+                        return
+
+                self.requisicoes += 1
+                caminho = alvo.split("?", 1)[0].rstrip("/") or "/"
+                if caminho == "/ws" or caminho.startswith("/ws/"):
+                    await self._websocket(caminho, cabecalhos, reader, writer)
+                    return
+
+                writer.write(self._http(metodo, caminho, cabecalhos))
+                await writer.drain()
+                if cabecalhos.get("connection", "").lower() == "close":
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self._conexoes.discard(writer)
+            writer.close()
+
+    def _http(self, metodo: str, caminho: str, cabecalhos: Dict[str, str]) -> bytes:
+        if metodo not in ("GET", "HEAD"):
+            return _resposta(405, _json({"erro": "use GET"}), {"Allow": "GET, HEAD"})
+        corpo_incluido = metodo == "GET"
+
+        if caminho == "/cameras":
+            lista = [{"camera": nome, "versao": c.versao, "livres": (c.registro or {}).get("livres"),
+                      "total": (c.registro or {}).get("total")} for nome, c in self.cameras.items()]
+            return _resposta(200, _json(lista), incluir_corpo=corpo_incluido)
+
+        if caminho.startswith("/cameras/"):
+            camera = self.cameras.get(caminho[len("/cameras/"):])
+            if camera is None:
+                return _resposta(404, _json({"erro": "câmera desconhecida"}), incluir_corpo=corpo_incluido)
+            corpo, etag = camera.snapshot()
+            extras = {"ETag": etag, "Cache-Control": "no-cache"}
+            if _etag_confere(cabecalhos.get("if-none-match"), etag):
+                return _resposta(304, cabecalhos=extras)
+            return _resposta(200, corpo, extras, incluir_corpo=corpo_incluido)
+
+        if caminho == "/estatisticas":
+            return _resposta(200, _json(self.estatisticas()), incluir_corpo=corpo_incluido)
+
+        return _resposta(404, _json({"erro": "não encontrado"}), incluir_corpo=corpo_incluido)
+
+    async def _websocket(self, caminho: str, cabecalhos: Dict[str, str], reader: asyncio.StreamReader,
+                         writer: asyncio.StreamWriter):
+        chave = cabecalhos.get("sec-websocket-key")
+        if cabecalhos.get("upgrade", "").lower() != "websocket" or not chave:
+            writer.write(_resposta(400, _json({"erro": "handshake WebSocket inválido"})))
+            return
+
+        nome = caminho[len("/ws/"):] if caminho.startswith("/ws/") else None
+        if nome is not None and nome not in self.cameras:
+            writer.write(_resposta(404, _json({"erro": "câmera desconhecida"})))
+            return
+
+        aceite = base64.b64encode(hashlib.sha1((chave + _GUID_WEBSOCKET).encode()).digest()).decode()
+        writer.write(_resposta(101, cabecalhos={"Upgrade": "websocket", "Connection": "Upgrade",
+                                                "Sec-WebSocket-Accept": aceite}, incluir_corpo=False))
+
+        assinante = _Assinante([nome] if nome is not None else list(self.cameras), self.profundidade_cliente)
+        self.assinantes.add(assinante)
+        envio = asyncio.create_task(self._enviar_para(assinante, writer))
+        try:
+            await self._receber_de(reader, writer)
+        finally:
+            self.assinantes.discard(assinante)
+            envio.cancel()
+            try:
+                await envio
+            except (asyncio.CancelledError, ConnectionError):
+                pass
+
+    def _snapshots(self, assinante: _Assinante) -> bytes:
+        return b"".join(_quadro_ws(0x1, self.cameras[nome].snapshot()[0]) for nome in assinante.cameras)
+
+    async def _enviar_para(self, assinante: _Assinante, writer: asyncio.StreamWriter):
+        writer.write(self._snapshots(assinante))
+        await writer.drain()
+        while True:
+            quadro = await assinante.fila.get()
+            writer.write(self._snapshots(assinante) if quadro is _RESSINCRONIZAR else quadro)
+            await writer.drain()
+
+    async def _receber_de(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Responde ping e close; mensagens de texto do cliente são ignoradas"""
+        while True:
+            try:
+                opcode, dados = await _ler_quadro_ws(reader)
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                return
+            if opcode == 0x8:
+                writer.write(_quadro_ws(0x8, dados[:2]))
+                await writer.drain()
+                return
+            if opcode == 0x9:
+                writer.write(_quadro_ws(0xA, dados))
+                await writer.drain()
+
+
+def _par(texto: str) -> tuple:
+    nome, _, valor = texto.partition("=")
+    if not nome or not valor:
+        raise argparse.ArgumentTypeError(f"use NOME=VALOR: {texto}")
+    return nome, valor
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serviço local de ocupação (HTTP + WebSocket)")
+    parser.add_argument("--camera", type=_par, action="append", required=True, metavar="NOME=FONTE",
+                        help="câmera e sua fonte (arquivo ou URL); repetível")
+    parser.add_argument("--layout", default="src/estacionamentoPos", help="layout padrão das câmeras")
+    parser.add_argument("--layout-camera", type=_par, action="append", default=[], metavar="NOME=LAYOUT",
+                        help="layout de uma câmera específica")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--workers", type=int, help="threads de classificação compartilhadas")
+    parser.add_argument("--loop", action="store_true", help="repete arquivos de vídeo (teste local)")
+    parser.add_argument("--tempo-real", action="store_true", help="lê arquivos na velocidade do vídeo")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = criar_parser().parse_args(argv)
+    layouts = dict(args.layout_camera)
+
+    servidor = ServidorOcupacao(args.host, args.porta, args.workers)
+    for nome, fonte in args.camera:
+        servidor.adicionar_camera(nome, fonte, layouts.get(nome, args.layout), loop=args.loop,
+                                  tempo_real=args.tempo_real)
+
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,129 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List
+import cv2
+from src.amostragem import AmostradorQuadros
+from src.batch import registro_ocupacao
+from src.utils import EstacionaClassifier
+
+
+# quadros classificados por faixa no padrão: 5 min a 30 fps; o aquecimento padrão custa ~3% a mais
+QUADROS_POR_SHARD = 9000
+
+def dividir_em_shards(total_frames: int, n_shards: int) -> List[tuple]:
+    """Divide [0, total_frames) em faixas contíguas; a última vai até o fim do vídeo"""
+    n_shards = max(1, min(n_shards, total_frames))
+    tamanho = -(-total_frames // n_shards)
+    shards = [(inicio, min(inicio + tamanho, total_frames)) for inicio in range(0, total_frames, tamanho)]
+
+    # CAP_PROP_FRAME_COUNT é uma estimativa: o último shard lê até acabar
+    inicio, _ = shards[-1]
+    shards[-1] = (inicio, None)
+    return shards
+
+
+def processar_shard(video_path: str | Path, layout_path: str | Path, inicio: int, fim: int | None,
+                    warmup: int = 300, every_n: int = 1, **classifier_kwargs) -> tuple:
+    """Processa a faixa [inicio, fim) após aquecer o estado adaptativo com os quadros anteriores
+
+    O aquecimento classifica sem emitir os `warmup` quadros que um processamento
+    sequencial teria classificado antes de `inicio`, para que empty_reference e
+    motion_history convirjam para o estado sequencial na fronteira do shard.
+    Com aquecimento cobrindo todo o histórico a saída é idêntica à sequencial.
+    Com `camera` o estado parte da calibração salva e o último shard a atualiza.
+    """
+    estatisticas = {"lidos": 0, "classificados": 0, "aquecimento": 0}
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise IOError(f"não foi possível abrir o vídeo: {video_path}")
+
+    # alinhado ao passo para classificar exatamente os mesmos quadros do modo sequencial
+    primeiro = max(0, inicio - warmup * every_n)
+    primeiro -= primeiro % every_n
+    if primeiro:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, primeiro)
+
+    classifier = EstacionaClassifier(layout_path, **classifier_kwargs)
+    total = len(classifier.posicao_carro_vaga_full)
+    registros = []
+
+    # o passo é contado a partir do índice absoluto, como no modo sequencial
+    amostrador = AmostradorQuadros(cap, passo=every_n, primeiro_indice=primeiro)
+    for frame_idx, t_ms, frame in amostrador:
+        if fim is not None and frame_idx >= fim:
+            break
+
+        resultados = classifier.classificar_quadro(frame)
+
+        if frame_idx >= inicio:
+            registros.append(registro_ocupacao(video_path, frame_idx, t_ms, resultados, total))
+            estatisticas["classificados"] += 1
+        else:
+            estatisticas["aquecimento"] += 1
+
+    cap.release()
+    if fim is None:
+        classifier.salvar_calibracao()
+    # quadros da faixa, sem contar o aquecimento
+    ultimo = amostrador.frame_idx if fim is None else min(amostrador.frame_idx, fim - 1)
+    estatisticas["lidos"] = max(0, ultimo - inicio + 1)
+    return registros, estatisticas
+
+
+def _executar_shard(tarefa: dict) -> tuple:
+    return processar_shard(**tarefa)
+
+
+def _juntar(resultado: tuple, estatisticas: dict | None) -> List[dict]:
+    registros, parcial = resultado
+    if estatisticas is not None:
+        for chave, valor in parcial.items():
+            estatisticas[chave] = estatisticas.get(chave, 0) + valor
+    return registros
+
+
+def processar_em_shards(video_path: str | Path, layout_path: str | Path, workers: int | None = None,
+                        n_shards: int | None = None, warmup: int = 300, every_n: int = 1,
+                        estatisticas: dict | None = None, **classifier_kwargs) -> Iterator[dict]:
+    """Processa um vídeo longo em faixas paralelas, devolvendo os registros em ordem
+
+    Sem `n_shards` as faixas têm QUADROS_POR_SHARD quadros classificados (ao menos
+    uma por worker). Só 2 faixas por worker ficam em andamento ou à espera da
+    vez: a memória não cresce com a duração do vídeo e os registros de uma
+    faixa saem assim que ela e as anteriores terminam.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise IOError(f"não foi possível abrir o vídeo: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    workers = workers or os.cpu_count() or 1
+    if n_shards is None:
+        n_shards = max(workers, -(-total_frames // (QUADROS_POR_SHARD * every_n)))
+    shards = dividir_em_shards(max(total_frames, 1), n_shards)
+
+    tarefas = (
+        dict(video_path=str(video_path), layout_path=str(layout_path), inicio=inicio, fim=fim,
+             warmup=warmup, every_n=every_n, **classifier_kwargs)
+        for inicio, fim in shards
+    )
+
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # janela de submissão em ordem: a junção é só concatenar
+        pendentes = deque()
+        for tarefa in tarefas:
+            pendentes.append(executor.submit(_executar_shard, tarefa))
+            if len(pendentes) >= 2 * workers:
+                yield from _juntar(pendentes.popleft().result(), estatisticas)
+        while pendentes:
+            yield from _juntar(pendentes.popleft().result(), estatisticas)
+
+    if estatisticas is not None:
+        estatisticas["segundos"] = time.perf_counter() - inicio
+        estatisticas["shards"] = len(shards)
@@ -1,23 +1,119 @@
 from pathlib import Path
 from typing import List
+import math
 import pickle
 import cv2
 import numpy as np
+from src.atlas import AtlasVagas, geometria_poligono, geometria_retangulo
+from src.calibracao import carregar_calibracao, salvar_calibracao
+from src.estado import EstadoVagas
+from src.layout import IndiceVagas, JournalLayout, ler_resolucao_referencia, retangulo
+from src.metricas import DESLIGADAS, Metricas
+from src.parametros import ParametrosClassificacao
+from src.pontuacao import PontuadorRegras, carregar_pontuador, montar_matriz
+from src.resultado import ResultadoVagas
 
 
 class EstacionaClassifier:
-    def __init__(self, posicoes_path: str | Path, rect_width: int = 107, rect_height: int = 48):
+    FEATURE_MODES = ("spot", "frame")
+    GATE_FATOR = 4
+    # alcance somado dos filtros de implement_process (adaptiveThreshold 25x25 + blur,
+    # mediana e morfologia): com essa margem o interior das vagas não sente a borda do tile
+    ROI_MARGEM = 24
+    
+    def __init__(self, posicoes_path: str | Path, rect_width: int = 107, rect_height: int = 48,
+                 feature_mode: str = "spot", gate_threshold: float | None = None, refresh_every: int = 30,
+                 camera: str | None = None, roi: bool = False, escala: float | None = None,
+                 tamanho_vaga: float | None = None, metricas: Metricas | None = None,
+                 parametros: ParametrosClassificacao | None = None, pontuador=None):
+        """escala: fator da resolução de análise em relação à do layout (0.5 = metade)
+        tamanho_vaga: alternativa a escala; menor lado médio das vagas, em pixels, na análise
+        metricas: registro de latências por etapa (desligado por padrão)
+        parametros: pesos, limites e constantes do pré-processamento (padrão: os históricos)
+        pontuador: decisão sobre a matriz N x 4 (padrão: as regras históricas); aceita o
+            caminho de um modelo treinado (benchmarks.treinar)
+        """
+        if feature_mode not in self.FEATURE_MODES:
+            raise ValueError(f"feature_mode inválido: {feature_mode} (use {', '.join(self.FEATURE_MODES)})")
+        if escala is not None and escala <= 0:
+            raise ValueError("escala deve ser > 0")
+        if tamanho_vaga is not None and tamanho_vaga <= 0:
+            raise ValueError("tamanho_vaga deve ser > 0")
+        
         self.rect_width = rect_width
         self.rect_height = rect_height
+        self.metricas = metricas or DESLIGADAS
+        self.parametros = parametros or ParametrosClassificacao()
+        if isinstance(pontuador, (str, Path)):
+            pontuador = carregar_pontuador(pontuador)
+        self.pontuador = pontuador or PontuadorRegras(self.parametros)
         self.posicao_carro_vaga = self._ler_posicoes(posicoes_path)
         self.posicao_carro_vaga_full = self._ler_posicoes_full(posicoes_path)
+        self.posicao_carro_vaga_4points = self._ler_posicoes_4points(posicoes_path)
         self.posicao_carro_vaga_path = posicoes_path
         
-        # parametros adaptativos
-        self.threshold_base = 900
-        self.threshold_margin = 0.15
-        self.motion_history = {}
-        self.empty_reference = {}
+        # resolução de análise: layout (em pixels da marcação) e quadros são levados à mesma escala
+        self.resolucao_referencia = ler_resolucao_referencia(posicoes_path)
+        self.escala = self._resolver_escala(escala, tamanho_vaga)
+        self._tamanho_analise = None
+        if self.resolucao_referencia is not None:
+            largura, altura = self.resolucao_referencia
+            self._tamanho_analise = (max(1, int(round(largura * self.escala))),
+                                     max(1, int(round(altura * self.escala))))
+        self._configurar_kernels()
+        
+        # geometria resolvida uma única vez: remap de todas as vagas para o atlas
+        self.atlas = self._construir_atlas()
+        
+        # modo "spot": features recorte a recorte no atlas
+        # modo "frame": mapas de todas as vagas de uma vez, reduzidos por vaga com reduceat
+        self.feature_mode = feature_mode
+        self._mapas = self._preparar_mapas() if feature_mode == "frame" else None
+        self._ultimo_gray = None
+        
+        # roi: pré-processa só os tiles que cobrem as vagas (caixas com margem, unidas)
+        self.roi = roi
+        self._tiles = None
+        
+        # gate de mudança: vagas cuja assinatura (cinza reduzido GATE_FATOR vezes) variou
+        # menos que gate_threshold níveis de cinza em média reutilizam as últimas features
+        # (a decisão é refeita, barata, com o estado atual);
+        # a cada refresh_every quadros todas as vagas são recalculadas
+        self.gate_threshold = gate_threshold
+        self.refresh_every = refresh_every
+        self._gate_rotulos = self.atlas.rotulos(self.GATE_FATOR)
+        self._gate_area = np.bincount(self._gate_rotulos.ravel(), minlength=len(self.atlas) + 1)[1:]
+        self._assinatura = None
+        self._quadros_desde_refresh = 0
+        self._ultimas_features = np.full((len(self.atlas), 5), np.nan)
+        self.estatisticas_gate = {"quadros": 0, "avaliadas": 0, "reutilizadas": 0}
+        
+        # parametros adaptativos (threshold_base é uma contagem de pixels: escala com a área)
+        self.threshold_base = 900 if self.escala == 1.0 else 900 * self.escala ** 2
+        self.threshold_margin = self.parametros.threshold_margin
+        self.estado = EstadoVagas(len(self.posicao_carro_vaga_full), janela=30)
+        self._vagas_validas = np.array(
+            [self._normalizar_vaga(spot) is not None for spot in self.posicao_carro_vaga_full], dtype=bool)
+        
+        # calibração persistida por câmera: referências aprendidas valem desde o primeiro quadro
+        self.camera = camera
+        self.calibracao_carregada = camera is not None and carregar_calibracao(self, camera)
+    
+    @property
+    def motion_history(self) -> dict:
+        """Visão somente leitura da janela de counts por vaga (compatibilidade)"""
+        return {int(i): self.estado.historico(i) for i in np.flatnonzero(self.estado.preenchidas)}
+    
+    @property
+    def empty_reference(self) -> dict:
+        """Visão somente leitura das referências de vaga vazia (compatibilidade)"""
+        return {int(i): int(self.estado.referencia[i]) for i in np.flatnonzero(self.estado.tem_referencia)}
+    
+    def salvar_calibracao(self) -> Path | None:
+        """Grava o estado aprendido ao lado do layout (só com câmera definida)"""
+        if self.camera is None:
+            return None
+        return salvar_calibracao(self, self.camera)
     
     def _ler_posicoes(self, caminho: str | Path) -> List:
         try:
@@ -38,6 +134,103 @@ class EstacionaClassifier:
         except:
             return [(x, y, self.rect_width, self.rect_height, 0) for x, y in self.posicao_carro_vaga]
     
+    def _ler_posicoes_4points(self, caminho: str | Path) -> List:
+        """Lê os polígonos de 4 cantos marcados na interface (se existirem)"""
+        try:
+            pontos_path = str(caminho).replace("estacionamentoPos", "estacionamentoPos_4points")
+            with open(pontos_path, "rb") as f:
+                return pickle.load(f)
+        except:
+            return []
+    
+    def _normalizar_vaga(self, spot) -> tuple | None:
+        if len(spot) == 5:
+            return spot
+        elif len(spot) == 4:
+            return (*spot, 0)
+        elif len(spot) == 2:
+            return (*spot, self.rect_width, self.rect_height, 0)
+        return None
+    
+    def _resolver_escala(self, escala: float | None, tamanho_vaga: float | None) -> float:
+        if tamanho_vaga is None:
+            return 1.0 if escala is None else float(escala)
+        
+        lados = [min(vaga[2], vaga[3]) for vaga in map(self._normalizar_vaga, self.posicao_carro_vaga_full)
+                 if vaga is not None and min(vaga[2], vaga[3]) > 0]
+        if not lados:
+            return 1.0
+        return float(tamanho_vaga / np.median(lados))
+    
+    @staticmethod
+    def _impar(valor: float, minimo: int) -> int:
+        n = max(minimo, int(round(valor)))
+        return n if n % 2 else n + 1
+    
+    def _configurar_kernels(self):
+        """Tamanhos de janela do pré-processamento e das features proporcionais à escala"""
+        s = self.escala
+        self._k_gauss = self._impar(5 * s, 3)
+        self._sigma_gauss = 1.5 * s
+        self._bloco_adaptativo = self._impar(self.parametros.bloco_adaptativo * s, 3)
+        self._k_mediana = self._impar(5 * s, 3)
+        self._k_morfologia = np.ones((self._impar(3 * s, 1),) * 2, np.uint8)
+        self._k_textura = self._impar(5 * s, 3)
+        # blocos adaptativos maiores que o padrão alcançam mais longe
+        extra = max(0, self.parametros.bloco_adaptativo - ParametrosClassificacao.bloco_adaptativo) // 2
+        self.roi_margem = max(4, math.ceil((self.ROI_MARGEM + extra) * s))
+    
+    def _escalar_vaga(self, vaga: tuple) -> tuple:
+        if self.escala == 1.0:
+            return vaga
+        x, y, w, h, angle = vaga
+        s = self.escala
+        return (int(round(x * s)), int(round(y * s)), max(1, int(round(w * s))), max(1, int(round(h * s))), angle)
+    
+    def _construir_atlas(self) -> AtlasVagas:
+        """Pré-calcula os mapas de remap de cada vaga (já na escala de análise)"""
+        # polígonos de 4 pontos só valem se corresponderem às vagas do arquivo completo
+        usar_poligonos = len(self.posicao_carro_vaga_4points) == len(self.posicao_carro_vaga_full)
+        
+        self._geometrias = geometrias = []
+        self._vagas_analise = []
+        for index, spot in enumerate(self.posicao_carro_vaga_full):
+            vaga = self._normalizar_vaga(spot)
+            if vaga is None:
+                geometrias.append(None)
+                self._vagas_analise.append(None)
+                continue
+            
+            vaga = self._escalar_vaga(vaga)
+            self._vagas_analise.append(vaga)
+            if usar_poligonos and len(self.posicao_carro_vaga_4points[index]) == 4:
+                pontos = np.asarray(self.posicao_carro_vaga_4points[index], dtype=np.float64) * self.escala
+                geometrias.append(geometria_poligono(pontos))
+            else:
+                geometrias.append(geometria_retangulo(*vaga))
+        
+        return AtlasVagas(geometrias)
+    
+    def preparar_quadro(self, frame: np.ndarray) -> np.ndarray:
+        """Leva o quadro decodificado à resolução de análise (um resize, logo após decodificar)
+        
+        A resolução de análise é a do layout (arquivo .resolucao.json ao lado dele, ou a
+        do primeiro quadro) vezes a escala; vídeos da mesma câmera em outras resoluções
+        usam o mesmo layout.
+        """
+        if self._tamanho_analise is None:
+            if self.escala == 1.0:
+                return frame
+            # sem resolução registrada: o layout foi marcado na resolução deste vídeo
+            self._tamanho_analise = (max(1, int(round(frame.shape[1] * self.escala))),
+                                     max(1, int(round(frame.shape[0] * self.escala))))
+        
+        largura, altura = self._tamanho_analise
+        if frame.shape[1] == largura and frame.shape[0] == altura:
+            return frame
+        interpolacao = cv2.INTER_AREA if largura < frame.shape[1] else cv2.INTER_LINEAR
+        return cv2.resize(frame, (largura, altura), interpolation=interpolacao)
+    
     def _get_rotated_crop(self, image: np.ndarray, x: int, y: int, w: int, h: int, angle: float) -> np.ndarray:
         """Extrai região rotacionada"""
         if angle == 0:
@@ -61,26 +254,13 @@ class EstacionaClassifier:
         
         return rotated[start_y:start_y+h, start_x:start_x+w]
     
-    def _calculate_dynamic_threshold(self, crop: np.ndarray, spot_index: int) -> int:
-        mean_intensity = np.mean(crop)
-        std_intensity = np.std(crop)
-        non_zero_count = cv2.countNonZero(crop)
-        
-        if spot_index in self.empty_reference:
-            ref_count = self.empty_reference[spot_index]
-            dynamic_threshold = ref_count * (1 + self.threshold_margin)
-        else:
-            dynamic_threshold = self.threshold_base * (1 + std_intensity / 100)
-        
-        if spot_index not in self.motion_history:
-            self.motion_history[spot_index] = []
-        
-        self.motion_history[spot_index].append(non_zero_count)
-        
-        if len(self.motion_history[spot_index]) > 30:
-            self.motion_history[spot_index].pop(0)
-        
-        return int(dynamic_threshold)
+    def _calculate_dynamic_threshold(self, indices: np.ndarray, non_zero_count: np.ndarray,
+                                     std_intensity: np.ndarray) -> np.ndarray:
+        """Limiar dinâmico de todas as vagas em lote; registra os counts na janela"""
+        dynamic_threshold = self.estado.threshold_dinamico(
+            indices, std_intensity, self.threshold_base, self.threshold_margin)
+        self.estado.registrar_contagens(indices, non_zero_count)
+        return dynamic_threshold
     
     def _detect_edges_features(self, crop: np.ndarray) -> float:
         """Densidade de bordas"""
@@ -90,7 +270,7 @@ class EstacionaClassifier:
     
     def _analyze_texture(self, crop_gray: np.ndarray) -> float:
         """Análise de textura"""
-        kernel_size = 5
+        kernel_size = self._k_textura
         kernel = np.ones((kernel_size, kernel_size), np.float32) / (kernel_size * kernel_size)
         
         local_mean = cv2.filter2D(crop_gray.astype(np.float32), -1, kernel)
@@ -99,58 +279,251 @@ class EstacionaClassifier:
         
         return texture_score
     
-    def classificar(self, image: np.ndarray, imagem_proce: np.ndarray, threshold: int = 900) -> np.ndarray:
-        """Classifica vagas com suporte a rotação"""
-        EstacionamentoVazio = 0
+    def _features_por_vaga(self, image: np.ndarray, imagem_proce: np.ndarray,
+                           vagas: np.ndarray | None = None) -> np.ndarray:
+        """Features calculadas recorte a recorte sobre o atlas (só das `vagas` marcadas)"""
+        # um remap por imagem extrai todas as vagas
+        atlas_proce = self.atlas.empacotar(imagem_proce)
+        atlas_color = self.atlas.empacotar(image)
+        atlas_gray = cv2.cvtColor(atlas_color, cv2.COLOR_BGR2GRAY)
         
-        for index, spot in enumerate(self.posicao_carro_vaga_full):
-            if len(spot) == 5:
-                x, y, w, h, angle = spot
-            elif len(spot) == 4:
-                x, y, w, h = spot
-                angle = 0
-            elif len(spot) == 2:
-                x, y = spot
-                w, h, angle = self.rect_width, self.rect_height, 0
-            else:
+        features = np.full((len(self.atlas), 5), np.nan)
+        indices = range(len(self.atlas)) if vagas is None else np.flatnonzero(vagas)
+        # tempo de cada feature somado sobre as vagas do quadro
+        cronometro = self.metricas.cronometro()
+        for index in indices:
+            crop = self.atlas.recorte(atlas_proce, index)
+            if crop.size == 0:
                 continue
             
-            # extrair região 
-            crop = self._get_rotated_crop(imagem_proce, x, y, w, h, angle)
-            crop_color = self._get_rotated_crop(image, x, y, w, h, angle)
-            
-            if crop.size == 0 or crop_color.size == 0:
-                continue
+            crop_color = self.atlas.recorte(atlas_color, index)
+            crop_gray = self.atlas.recorte(atlas_gray, index)
             
-            crop_gray = cv2.cvtColor(crop_color, cv2.COLOR_BGR2GRAY)
-            
-            # analise multi-criterio
+            cronometro.iniciar()
             count = cv2.countNonZero(crop)
-            dynamic_threshold = self._calculate_dynamic_threshold(crop, index)
+            proce_std = np.std(crop)
+            cronometro.marcar("feature.count")
             edge_density = self._detect_edges_features(crop_gray)
+            cronometro.marcar("feature.edges")
             texture_score = self._analyze_texture(crop_gray)
+            cronometro.marcar("feature.texture")
             color_std = np.std(crop_color)
+            cronometro.marcar("feature.color_std")
             
-            score = 0
-            if count < dynamic_threshold:
-                score += 0.4
-            if edge_density < 0.15:
-                score += 0.3
-            if texture_score < 150:
-                score += 0.2
-            if color_std < 30:
-                score += 0.1
+            features[index] = (count, proce_std, edge_density, texture_score, color_std)
+        
+        cronometro.fechar()
+        return features
+    
+    def _preparar_mapas(self) -> tuple:
+        """Atlas com moldura refletida e pixels de cada vaga agrupados para o modo "frame"
+        
+        A moldura cobre o alcance do Canny e das duas médias da textura: os mapas
+        calculados no atlas inteiro não veem o entorno da vaga (faixas pintadas,
+        vagas vizinhas), como no cálculo recorte a recorte.
+        """
+        atlas = AtlasVagas(self._geometrias, margem=2 * (self._k_textura // 2) + 1)
+        
+        # só os pixels das vagas entram nas reduções, agrupados por vaga
+        rotulos = atlas.rotulos().ravel()
+        pixels = np.flatnonzero(rotulos)
+        pixels = pixels[np.argsort(rotulos[pixels], kind="stable")]
+        area = np.bincount(rotulos[pixels], minlength=len(atlas) + 1)[1:]
+        inicios = np.concatenate([[0], np.cumsum(area)[:-1]])[area > 0]
+        return atlas, pixels, inicios, area
+    
+    def _cinza_em_cache(self, image: np.ndarray) -> np.ndarray | None:
+        """Cinza de implement_process se for deste mesmo quadro
+        
+        implement_process e analisar podem rodar em threads diferentes (VideoProcessor):
+        a tupla é lida uma única vez, então quadro e cinza sempre vêm do mesmo par.
+        """
+        cache = self._ultimo_gray
+        if cache is not None and cache[0] is image:
+            return cache[1]
+        return None
+    
+    def _features_por_mapa(self, image: np.ndarray, imagem_proce: np.ndarray) -> np.ndarray:
+        """Features a partir de mapas calculados de uma vez no atlas, reduzidas por vaga em um passo
+        
+        O cinza de implement_process vai para o atlas pelo mesmo remap, sem outro cvtColor.
+        Em vagas rotacionadas interpolar o cinza difere de converter a cor interpolada em
+        até 1 nível de cinza, a mesma tolerância do remap frente ao warpAffine do modo "spot".
+        """
+        atlas, pixels, inicios, area = self._mapas
+        
+        # um remap por imagem; o cinza de implement_process é reaproveitado quando é deste quadro
+        atlas_proce = atlas.empacotar(imagem_proce)
+        atlas_color = atlas.empacotar(image)
+        cinza = self._cinza_em_cache(image)
+        if cinza is not None:
+            gray = atlas.empacotar(cinza)
+        else:
+            gray = cv2.cvtColor(atlas_color, cv2.COLOR_BGR2GRAY)
+        
+        cronometro = self.metricas.cronometro()
+        edges = cv2.Canny(gray, 50, 150)
+        cronometro.marcar("feature.edges")
+        gray_f = gray.astype(np.float32)
+        k = (self._k_textura, self._k_textura)
+        local_mean = cv2.blur(gray_f, k)
+        local_var = cv2.blur((gray_f - local_mean) ** 2, k)
+        cronometro.marcar("feature.texture")
+        
+        def amostrar(mapa: np.ndarray) -> np.ndarray:
+            """Pixels rotulados, um canal por coluna"""
+            mapa = np.ascontiguousarray(mapa)
+            return np.take(mapa.reshape(mapa.shape[0] * mapa.shape[1], -1), pixels, axis=0).astype(np.float32)
+        
+        proce = amostrar(atlas_proce)[:, 0]
+        color = amostrar(atlas_color)
+        canais = color.shape[1]
+        
+        # todas as somas por vaga numa única redução
+        valores = np.empty((len(pixels), 7), dtype=np.float32)
+        valores[:, 0] = proce > 0
+        valores[:, 1] = proce
+        valores[:, 2] = proce * proce
+        valores[:, 3] = amostrar(edges)[:, 0]
+        valores[:, 4] = amostrar(local_var)[:, 0]
+        valores[:, 5] = 0
+        valores[:, 6] = 0
+        for c in range(canais):
+            valores[:, 5] += color[:, c]
+            valores[:, 6] += color[:, c] * color[:, c]
+        
+        somas = np.zeros((len(area), valores.shape[1]))
+        if len(inicios):
+            somas[area > 0] = np.add.reduceat(valores, inicios, axis=0)
+        
+        count, proce_sum, proce_sq, edge_sum, var_sum, color_sum, color_sq_sum = somas.T
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            proce_mean = proce_sum / area
+            proce_std = np.sqrt(np.maximum(proce_sq / area - proce_mean ** 2, 0))
+            edge_density = edge_sum / area
+            texture_score = var_sum / area
             
-            is_empty = score >= 0.5
+            n_color = area * canais
+            color_mean = color_sum / n_color
+            color_std = np.sqrt(np.maximum(color_sq_sum / n_color - color_mean ** 2, 0))
+        
+        features = np.column_stack([count, proce_std, edge_density, texture_score, color_std])
+        features[area == 0] = np.nan
+        # amostragem e redução por vaga de todas as features juntas
+        cronometro.marcar("feature.reducao")
+        cronometro.fechar()
+        return features
+    
+    def extrair_features(self, image: np.ndarray, imagem_proce: np.ndarray,
+                         vagas: np.ndarray | None = None) -> np.ndarray:
+        """Matriz N x 5: count, std processada, densidade de bordas, textura, std de cor
+        
+        `vagas` restringe o cálculo no modo "spot"; o modo "frame" sempre calcula todas.
+        """
+        if self.feature_mode == "frame":
+            return self._features_por_mapa(image, imagem_proce)
+        return self._features_por_vaga(image, imagem_proce, vagas)
+    
+    def _vagas_alteradas(self, image: np.ndarray) -> np.ndarray | None:
+        """Máscara das vagas que mudaram desde o último quadro em que cada uma foi classificada"""
+        if self.gate_threshold is None:
+            return None
+        
+        gray = self._cinza_em_cache(image)
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        assinatura = self.atlas.reduzir(self.atlas.empacotar(gray), self.GATE_FATOR)
+        
+        refresh = (self._assinatura is None or self._assinatura.shape != assinatura.shape
+                   or self._quadros_desde_refresh >= self.refresh_every)
+        if refresh:
+            self._assinatura = assinatura
+            self._quadros_desde_refresh = 0
+            return np.ones(len(self.atlas), dtype=bool)
+        
+        # diferença absoluta média por vaga numa única redução
+        diff = cv2.absdiff(assinatura, self._assinatura)
+        soma = np.bincount(self._gate_rotulos.ravel(), weights=diff.ravel(), minlength=len(self.atlas) + 1)[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media = soma / self._gate_area
+        alteradas = (media >= self.gate_threshold) | (self._gate_area == 0) | np.isnan(self._ultimas_features[:, 0])
+        
+        # a referência de cada vaga é o último quadro em que ela foi classificada
+        pixels = alteradas[np.maximum(self._gate_rotulos - 1, 0)] & (self._gate_rotulos > 0)
+        self._assinatura[pixels] = assinatura[pixels]
+        self._quadros_desde_refresh += 1
+        return alteradas
+    
+    def analisar(self, image: np.ndarray, imagem_proce: np.ndarray) -> ResultadoVagas:
+        """Classifica as vagas sem desenhar: arrays de ids, is_empty, score e features"""
+        image = self.preparar_quadro(image)
+        alteradas = self._vagas_alteradas(image)
+        with self.metricas.medir("features"):
+            features = self.extrair_features(image, imagem_proce, alteradas)
+        
+        self.estatisticas_gate["quadros"] += 1
+        if alteradas is not None:
+            # vagas sem mudança reaproveitam as features do último cálculo
+            features[~alteradas] = self._ultimas_features[~alteradas]
+            self._ultimas_features[alteradas] = features[alteradas]
+            self.estatisticas_gate["reutilizadas"] += int(np.count_nonzero(~alteradas))
+            self.estatisticas_gate["avaliadas"] += int(np.count_nonzero(alteradas))
+        
+        return self.decidir(features)
+    
+    def matriz_decisao(self, features: np.ndarray) -> tuple:
+        """(índices, counts, matriz N x 4) das vagas avaliadas; registra os counts na janela"""
+        indices = np.flatnonzero(self._vagas_validas & ~np.isnan(features[:, 0]))
+        count, proce_std, edge_density, texture_score, color_std = features[indices].T
+        count = count.astype(np.int64)
+        
+        with self.metricas.medir("threshold"):
+            dynamic_threshold = self._calculate_dynamic_threshold(indices, count, proce_std)
+        return indices, count, montar_matriz(count, dynamic_threshold, edge_density, texture_score, color_std)
+    
+    def aplicar_decisao(self, indices: np.ndarray, count: np.ndarray, matriz: np.ndarray,
+                        features: np.ndarray) -> ResultadoVagas:
+        """Pontua todas as vagas numa chamada só e atualiza o estado adaptativo"""
+        with self.metricas.medir("pontuacao"):
+            score = self.pontuador.pontuar(matriz)
+        is_empty = score >= self.pontuador.limite
+        
+        self.estado.atualizar_referencia(indices[is_empty], count[is_empty])
+        self.estado.registrar_resultado(indices, score, is_empty)
+        
+        return ResultadoVagas(indices, is_empty, score, features[indices], len(self.posicao_carro_vaga_full))
+    
+    def decidir(self, features: np.ndarray) -> ResultadoVagas:
+        """Decisão a partir da matriz N x 5 de extrair_features (atualiza o estado adaptativo)"""
+        indices, count, matriz = self.matriz_decisao(features)
+        return self.aplicar_decisao(indices, count, matriz, features)
+    
+    def classificar_vagas(self, image: np.ndarray, imagem_proce: np.ndarray) -> List[tuple]:
+        """Classifica as vagas sem desenhar: lista de (index, is_empty, score)"""
+        return self.analisar(image, imagem_proce).como_lista()
+    
+    def classificar_quadro(self, frame: np.ndarray) -> ResultadoVagas:
+        """Quadro decodificado até o resultado: preparar_quadro, implement_process e analisar"""
+        frame = self.preparar_quadro(frame)
+        return self.analisar(frame, self.implement_process(frame))
+    
+    def classificar(self, image: np.ndarray, imagem_proce: np.ndarray, threshold: int = 900) -> np.ndarray:
+        """Classifica vagas com suporte a rotação (desenha sobre o quadro na resolução de análise)"""
+        image = self.preparar_quadro(image)
+        resultado = self.analisar(image, imagem_proce)
+        return self.desenhar_vagas(image, resultado)
+    
+    def desenhar_vagas(self, image: np.ndarray, resultados: ResultadoVagas | List[tuple]) -> np.ndarray:
+        """Desenha o resultado da classificação sobre a imagem (no próprio array)"""
+        EstacionamentoVazio = 0
+        
+        for index, is_empty, score in resultados:
+            x, y, w, h, angle = self._vagas_analise[index]
             
             if is_empty:
                 EstacionamentoVazio += 1
                 color, thick = (0, 255, 0), 5
-                
-                if index not in self.empty_reference:
-                    self.empty_reference[index] = count
-                else:
-                    self.empty_reference[index] = int(0.9 * self.empty_reference[index] + 0.1 * count)
             else:
                 color, thick = (0, 0, 255), 2
             
@@ -178,55 +551,156 @@ class EstacionaClassifier:
         
         return image
     
-    def implement_process(self, image: np.ndarray) -> np.ndarray:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.equalizeHist(gray)
-        blur = cv2.GaussianBlur(gray, (5, 5), 1.5)
+    def _tiles_roi(self, shape: tuple) -> List[tuple]:
+        """Caixas das vagas com ROI_MARGEM, unidas até não haver sobreposição: (y0, y1, x0, x1)"""
+        if self._tiles is not None and self._tiles[0] == shape:
+            return self._tiles[1]
+        
+        altura, largura = shape[:2]
+        m = self.roi_margem
+        caixas = []
+        for geometria in self._geometrias:
+            if geometria is None:
+                continue
+            M, w, h = geometria
+            cantos = np.array([[0, 0, 1], [w - 1, 0, 1], [w - 1, h - 1, 1], [0, h - 1, 1]], dtype=np.float64) @ M.T
+            cantos = cantos[:, :2] / cantos[:, 2:]
+            x0, y0 = np.floor(cantos.min(axis=0)).astype(int) - m
+            x1, y1 = np.ceil(cantos.max(axis=0)).astype(int) + m + 1
+            x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, largura), min(y1, altura)
+            if x0 < x1 and y0 < y1:
+                caixas.append([y0, y1, x0, x1])
+        
+        # une caixas que se tocam até estabilizar; vagas vizinhas viram um tile só
+        unidas = True
+        while unidas:
+            unidas = False
+            tiles = []
+            for caixa in sorted(caixas):
+                for tile in tiles:
+                    if caixa[0] <= tile[1] and tile[0] <= caixa[1] and caixa[2] <= tile[3] and tile[2] <= caixa[3]:
+                        tile[:] = [min(tile[0], caixa[0]), max(tile[1], caixa[1]),
+                                   min(tile[2], caixa[2]), max(tile[3], caixa[3])]
+                        unidas = True
+                        break
+                else:
+                    tiles.append(list(caixa))
+            caixas = tiles
+        
+        tiles = [tuple(tile) for tile in caixas]
+        self._tiles = (shape, tiles)
+        return tiles
+    
+    def _processar_cinza(self, gray: np.ndarray) -> np.ndarray:
+        """Binarização de implement_process a partir do cinza já equalizado"""
+        blur = cv2.GaussianBlur(gray, (self._k_gauss, self._k_gauss), self._sigma_gauss)
         
         thr = cv2.adaptiveThreshold(
             blur, 255,
             cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
             cv2.THRESH_BINARY_INV,
-            25, 12
+            self._bloco_adaptativo, self.parametros.c_adaptativo
         )
         
-        thr = cv2.medianBlur(thr, 5)
-        kernel = np.ones((3, 3), np.uint8)
+        thr = cv2.medianBlur(thr, self._k_mediana)
+        kernel = self._k_morfologia
         thr = cv2.morphologyEx(thr, cv2.MORPH_CLOSE, kernel, iterations=1)
         dil = cv2.dilate(thr, kernel, iterations=1)
         
         return dil
+    
+    def _implement_process_roi(self, image: np.ndarray) -> np.ndarray:
+        """implement_process só nos tiles das vagas; fora deles a saída fica zerada"""
+        tiles = self._tiles_roi(image.shape)
+        gray = np.zeros(image.shape[:2], dtype=np.uint8)
+        saida = np.zeros(image.shape[:2], dtype=np.uint8)
+        
+        hist = np.zeros(256, dtype=np.int64)
+        for y0, y1, x0, x1 in tiles:
+            tile = cv2.cvtColor(image[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+            gray[y0:y1, x0:x1] = tile
+            hist += np.bincount(tile.ravel(), minlength=256)
+        self._ultimo_gray = (image, gray)
+        
+        # equalização com o histograma só da região das vagas (mesma LUT do equalizeHist)
+        lut = self._lut_equalizacao(hist)
+        for y0, y1, x0, x1 in tiles:
+            saida[y0:y1, x0:x1] = self._processar_cinza(cv2.LUT(gray[y0:y1, x0:x1], lut))
+        
+        return saida
+    
+    @staticmethod
+    def _lut_equalizacao(hist: np.ndarray) -> np.ndarray:
+        total = int(hist.sum())
+        naozero = np.flatnonzero(hist)
+        if len(naozero) == 0:
+            return np.arange(256, dtype=np.uint8)
+        
+        primeiro = naozero[0]
+        if hist[primeiro] == total:
+            return np.full(256, primeiro, dtype=np.uint8)
+        
+        escala = 255.0 / (total - hist[primeiro])
+        acumulado = np.cumsum(hist) - hist[primeiro]
+        lut = np.clip(np.rint(acumulado * escala), 0, 255).astype(np.uint8)
+        lut[:primeiro + 1] = 0
+        return lut
+    
+    def implement_process(self, image: np.ndarray) -> np.ndarray:
+        """Imagem binária na resolução de análise (quadros em outra resolução são redimensionados)"""
+        with self.metricas.medir("implement_process"):
+            return self._implement_process(self.preparar_quadro(image))
+    
+    def _implement_process(self, image: np.ndarray) -> np.ndarray:
+        if self.roi:
+            return self._implement_process_roi(image)
+        
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self._ultimo_gray = (image, gray)
+        gray = cv2.equalizeHist(gray)
+        return self._processar_cinza(gray)
 
 
 class Coordinate_denoter():
     def __init__(self, rect_width: int = 107, rect_height: int = 48, posicoes_path: str = "src/estacionamentoPos"):
         self.rect_width = rect_width
         self.rect_height = rect_height
-        self.posicao_carro_vaga = list()
         self.posicao_carro_vaga_path = posicoes_path
+        # edições vão para um diário; o pickle só é reescrito após um tempo sem edições
+        self.layout = JournalLayout(posicoes_path)
+        self.posicao_carro_vaga = self.layout.posicoes
+        self.indice = IndiceVagas()
 
     def ler_posicoes(self) -> list:
         try:
-            self.posicao_carro_vaga = pickle.load(open(self.posicao_carro_vaga_path, 'rb'))
+            self.layout.carregar()
         except Exception as e:
             print(f"Error: {e}\n Falha ao ler posições.")
 
+        self.posicao_carro_vaga = self.layout.posicoes
+        self.indice.reconstruir(self._retangulo(pos) for pos in self.posicao_carro_vaga)
         return self.posicao_carro_vaga
     
+    def _retangulo(self, pos: tuple) -> List[tuple]:
+        return retangulo(pos[0], pos[1], self.rect_width, self.rect_height)
+    
     def mouseClick(self, events: int, x: int, y: int, flags: int, params: int):
         if events == cv2.EVENT_LBUTTONDOWN:
-            self.posicao_carro_vaga.append((x, y))
+            self.layout.adicionar((x, y))
+            self.indice.adicionar(self._retangulo((x, y)))
         
         if events == cv2.EVENT_MBUTTONDOWN:
-            for index, pos in enumerate(self.posicao_carro_vaga):
-                x1, y1 = pos
-                
-                is_x_in_range = x1 <= x <= x1 + self.rect_width
-                is_y_in_range = y1 <= y <= y1 + self.rect_height
-                
-                if is_x_in_range and is_y_in_range:
-                    self.posicao_carro_vaga.pop(index)
-                    break
+            index = self.indice.vaga_em(x, y)
+            if index is not None:
+                self.layout.remover(index)
+                self.indice.remover(index)
 
-        with open(self.posicao_carro_vaga_path, 'wb') as f:
-            pickle.dump(self.posicao_carro_vaga, f)
\ No newline at end of file
+        # demais eventos (ex.: EVENT_MOUSEMOVE) não tocam o disco
+        self.layout.compactar_se_ocioso()
+    
+    def salvar_pendentes(self, forcar: bool = False):
+        """Compacta as edições pendentes após o tempo de espera (ou já, com forcar=True)"""
+        if forcar and self.layout.pendente:
+            self.layout.compactar()
+        else:
+            self.layout.compactar_se_ocioso()
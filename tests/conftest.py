@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+import pytest
+
+# os testes importam src/ e benchmarks/ a partir da raiz do repositório
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+
+@pytest.fixture(scope="session")
+def lote(tmp_path_factory) -> dict:
+    """Estacionamento sintético pequeno (vídeo, layout e gabarito), gerado uma vez por sessão"""
+    from benchmarks.sintetico import gerar_video
+
+    return gerar_video(tmp_path_factory.mktemp("lote"), largura=640, altura=360, n_vagas=20,
+                       quadros=40, troca=0.05, semente=1)
@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+from src.atlas import AtlasVagas, geometria_poligono, geometria_retangulo
+from src.utils import EstacionaClassifier
+
+
+def _imagem(semente: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(semente)
+    return cv2.GaussianBlur(rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8), (7, 7), 0)
+
+
+def test_remap_igual_ao_warp_affine_das_vagas_rotacionadas(lote):
+    # mapas em ponto fixo: no máximo 1 nível de cinza de diferença
+    imagem = _imagem()
+    vagas = [(100, 100, 107, 48, 0), (300, 200, 107, 48, 10), (500, 300, 80, 60, -25),
+             (700, 400, 107, 48, 45), (200, 500, 61, 33, 17.5)]
+    atlas = AtlasVagas([geometria_retangulo(*vaga) for vaga in vagas])
+    empacotado = atlas.empacotar(imagem)
+
+    classifier = EstacionaClassifier(lote["layout"])
+    for index, vaga in enumerate(vagas):
+        esperado = classifier._get_rotated_crop(imagem, *vaga)
+        recorte = atlas.recorte(empacotado, index)
+        assert recorte.shape == esperado.shape
+        assert np.abs(recorte.astype(np.int16) - esperado).max() <= 1
+
+
+def test_remap_igual_ao_warp_perspective_dos_poligonos():
+    imagem = _imagem(1)
+    poligonos = [[(400, 400), (520, 410), (530, 470), (390, 460)],
+                 [(800, 500), (900, 480), (950, 560), (820, 590)]]
+    geometrias = [geometria_poligono(pontos) for pontos in poligonos]
+    atlas = AtlasVagas(geometrias)
+    empacotado = atlas.empacotar(imagem)
+
+    for index, (H, w, h) in enumerate(geometrias):
+        esperado = cv2.warpPerspective(imagem, H, (w, h), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP)
+        assert np.abs(atlas.recorte(empacotado, index).astype(np.int16) - esperado).max() <= 1
+
+
+def test_margem_reflete_o_recorte():
+    imagem = _imagem(2)
+    geometrias = [geometria_retangulo(50, 60, 30, 12, 0), geometria_retangulo(300, 200, 41, 17, 20)]
+    sem_margem = AtlasVagas(geometrias)
+    com_margem = AtlasVagas(geometrias, margem=5)
+    a, b = sem_margem.empacotar(imagem), com_margem.empacotar(imagem)
+
+    for index, (w, h) in enumerate(com_margem.tamanhos):
+        ox, oy = com_margem.offsets[index]
+        moldura = b[oy - 5:oy + h + 5, ox - 5:ox + w + 5]
+        esperado = cv2.copyMakeBorder(sem_margem.recorte(a, index), 5, 5, 5, 5, cv2.BORDER_REFLECT_101)
+        assert np.array_equal(moldura, esperado)
+
+
+def test_modo_frame_decide_como_modo_spot(lote):
+    # mesmas decisões e scores; bordas toleram o Canny na borda do recorte (até 2% de 255)
+    spot = EstacionaClassifier(lote["layout"], feature_mode="spot")
+    frame = EstacionaClassifier(lote["layout"], feature_mode="frame")
+    cap = cv2.VideoCapture(str(lote["video"]))
+    quadros = 0
+    while True:
+        ok, imagem = cap.read()
+        if not ok:
+            break
+        a = spot.classificar_quadro(imagem)
+        b = frame.classificar_quadro(imagem)
+        quadros += 1
+
+        assert np.array_equal(a.ids, b.ids)
+        assert np.array_equal(a.is_empty, b.is_empty)
+        assert np.array_equal(a.score, b.score)
+        np.testing.assert_array_equal(a.features[:, 0], b.features[:, 0])
+        np.testing.assert_allclose(a.features[:, [1, 3, 4]], b.features[:, [1, 3, 4]], rtol=1e-4, atol=1e-3)
+        assert np.abs(a.features[:, 2] - b.features[:, 2]).max() <= 0.02 * 255
+    cap.release()
+    assert quadros == lote["quadros"]
+
+
+def test_cinza_empacotado_igual_ao_cinza_do_atlas():
+    # o modo "frame" empacota o cinza de implement_process em vez de converter o atlas colorido
+    imagem = _imagem(3)
+    vagas = [(100, 100, 107, 48, 0), (300, 200, 107, 48, 10), (500, 300, 80, 60, -25), (700, 400, 107, 48, 45)]
+    atlas = AtlasVagas([geometria_retangulo(*vaga) for vaga in vagas], margem=7)
+    cinza = atlas.empacotar(cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY))
+    esperado = cv2.cvtColor(atlas.empacotar(imagem), cv2.COLOR_BGR2GRAY)
+    assert np.abs(cinza.astype(np.int16) - esperado).max() <= 1
+    # sem rotação os mapas são inteiros e o resultado é idêntico
+    ox, oy = atlas.offsets[0]
+    w, h = atlas.tamanhos[0]
+    assert np.array_equal(cinza[oy:oy + h, ox:ox + w], esperado[oy:oy + h, ox:ox + w])
@@ -0,0 +1,42 @@
+import shutil
+import cv2
+import pytest
+from src.calibracao import hash_layout
+from src.parametros import ParametrosClassificacao
+from src.utils import EstacionaClassifier
+
+
+@pytest.fixture
+def layout(lote, tmp_path):
+    """Cópia do layout do lote: as calibrações ficam ao lado dele"""
+    for caminho in lote["layout"].parent.glob(lote["layout"].name + "*"):
+        if ".calib." not in caminho.name:
+            shutil.copy(caminho, tmp_path / caminho.name)
+    return tmp_path / lote["layout"].name
+
+
+@pytest.mark.parametrize("opcoes", [
+    {"escala": 0.5},
+    {"roi": True},
+    {"parametros": ParametrosClassificacao(bloco_adaptativo=ParametrosClassificacao.bloco_adaptativo + 2)},
+])
+def test_hash_muda_com_o_que_muda_os_counts(layout, opcoes):
+    padrao = hash_layout(EstacionaClassifier(layout))
+    assert hash_layout(EstacionaClassifier(layout)) == padrao
+    assert hash_layout(EstacionaClassifier(layout, **opcoes)) != padrao
+
+
+def test_calibracao_so_vale_para_a_mesma_configuracao(lote, layout):
+    classifier = EstacionaClassifier(layout, camera="entrada")
+    cap = cv2.VideoCapture(str(lote["video"]))
+    for _ in range(10):
+        ok, frame = cap.read()
+        assert ok
+        classifier.classificar_quadro(frame)
+    cap.release()
+    assert classifier.salvar_calibracao() is not None
+
+    assert EstacionaClassifier(layout, camera="entrada").calibracao_carregada
+    assert not EstacionaClassifier(layout, camera="saida").calibracao_carregada
+    assert not EstacionaClassifier(layout, camera="entrada", roi=True).calibracao_carregada
+    assert not EstacionaClassifier(layout, camera="entrada", escala=0.5).calibracao_carregada
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from src.estado import EstadoVagas
+
+THRESHOLD_BASE = 900
+THRESHOLD_MARGIN = 0.15
+
+
+class _EstadoAntigo:
+    """O estado de antes de EstadoVagas: dicionários de listas, vaga a vaga"""
+
+    def __init__(self):
+        self.motion_history = {}
+        self.empty_reference = {}
+
+    def calculate_dynamic_threshold(self, spot_index: int, non_zero_count: int, std_intensity: float) -> int:
+        if spot_index in self.empty_reference:
+            dynamic_threshold = self.empty_reference[spot_index] * (1 + THRESHOLD_MARGIN)
+        else:
+            dynamic_threshold = THRESHOLD_BASE * (1 + std_intensity / 100)
+
+        if spot_index not in self.motion_history:
+            self.motion_history[spot_index] = []
+        self.motion_history[spot_index].append(non_zero_count)
+        if len(self.motion_history[spot_index]) > 30:
+            self.motion_history[spot_index].pop(0)
+        return int(dynamic_threshold)
+
+    def vaga_vazia(self, index: int, count: int):
+        if index not in self.empty_reference:
+            self.empty_reference[index] = count
+        else:
+            self.empty_reference[index] = int(0.9 * self.empty_reference[index] + 0.1 * count)
+
+
+def _alimentar(estado: EstadoVagas, antigo: _EstadoAntigo | None, quadros: int, semente: int = 0):
+    rng = np.random.default_rng(semente)
+    for _ in range(quadros):
+        # nem toda vaga é avaliada em todo quadro (gate de mudança)
+        indices = np.flatnonzero(rng.random(estado.n_vagas) < 0.8)
+        contagens = rng.integers(0, 3000, len(indices))
+        std = rng.random(len(indices)) * 120
+        vazias = rng.random(len(indices)) < 0.4
+
+        limiar = estado.threshold_dinamico(indices, std, THRESHOLD_BASE, THRESHOLD_MARGIN)
+        estado.registrar_contagens(indices, contagens)
+        estado.atualizar_referencia(indices[vazias], contagens[vazias])
+        estado.registrar_resultado(indices, rng.random(len(indices)), vazias)
+        if antigo is None:
+            continue
+
+        esperado = [antigo.calculate_dynamic_threshold(int(i), int(c), float(s))
+                    for i, c, s in zip(indices, contagens, std)]
+        for i, c in zip(indices[vazias], contagens[vazias]):
+            antigo.vaga_vazia(int(i), int(c))
+        assert limiar.tolist() == esperado
+
+
+def test_igual_ao_estado_em_dicionarios():
+    estado, antigo = EstadoVagas(25, janela=30), _EstadoAntigo()
+    # 95 quadros: a janela de 30 dá a volta três vezes
+    _alimentar(estado, antigo, quadros=95)
+
+    assert int(estado.preenchidas.max()) == 30
+    for i in range(estado.n_vagas):
+        assert estado.historico(i) == antigo.motion_history.get(i, [])
+    referencias = {int(i): int(estado.referencia[i]) for i in np.flatnonzero(estado.tem_referencia)}
+    assert referencias == antigo.empty_reference
+
+
+def test_salvar_e_carregar(tmp_path):
+    estado = EstadoVagas(25, janela=30)
+    _alimentar(estado, None, quadros=40)
+    caminho = tmp_path / "estado.npz"
+    estado.salvar(caminho)
+
+    carregado = EstadoVagas(25, janela=30)
+    carregado.carregar(caminho)
+    for nome, array in estado.snapshot().items():
+        np.testing.assert_array_equal(carregado.snapshot()[nome], array)
+    assert carregado.historico(3) == estado.historico(3)
+
+    # continuam iguais depois de carregar
+    _alimentar(estado, None, quadros=10, semente=1)
+    _alimentar(carregado, None, quadros=10, semente=1)
+    np.testing.assert_array_equal(carregado.referencia, estado.referencia)
+
+
+@pytest.mark.parametrize("n_vagas, janela", [(26, 30), (25, 20)])
+def test_carregar_forma_diferente(tmp_path, n_vagas, janela):
+    caminho = tmp_path / "estado.npz"
+    EstadoVagas(25, janela=30).salvar(caminho)
+    with pytest.raises(ValueError, match="incompatível"):
+        EstadoVagas(n_vagas, janela=janela).carregar(caminho)
+
+
+def test_carregar_versao_desconhecida(tmp_path):
+    estado = EstadoVagas(5)
+    arrays = estado.snapshot()
+    arrays["versao"][0] = EstadoVagas.VERSAO + 1
+    caminho = tmp_path / "estado.npz"
+    np.savez(caminho, **arrays)
+    with pytest.raises(ValueError, match="versão"):
+        estado.carregar(caminho)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+import cv2
+import pytest
+from src import fluxo
+from src.batch import processar_video
+from src.fluxo import FluxoOcupacao, ocupacao, ocupacao_async
+
+
+class _Capturas:
+    """cv2 do módulo fluxo com VideoCapture vigiado: guarda as capturas abertas"""
+
+    def __init__(self):
+        self.abertas = []
+
+    def __getattr__(self, nome):
+        return getattr(cv2, nome)
+
+    def VideoCapture(self, *args):
+        captura = _CapturaVigiada(*args)
+        self.abertas.append(captura)
+        return captura
+
+
+class _CapturaVigiada:
+    def __init__(self, *args):
+        self._cap = cv2.VideoCapture(*args)
+        self.liberada = False
+
+    def __getattr__(self, nome):
+        return getattr(self._cap, nome)
+
+    def release(self):
+        self.liberada = True
+        self._cap.release()
+
+
+@pytest.fixture
+def capturas(monkeypatch) -> _Capturas:
+    capturas = _Capturas()
+    monkeypatch.setattr(fluxo, "cv2", capturas)
+    return capturas
+
+
+def _esperar(condicao, timeout: float = 10.0) -> bool:
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_gerador_igual_ao_lote(lote):
+    esperados = []
+    processar_video(str(lote["video"]), lote["layout"], esperados.append)
+
+    registros = list(ocupacao(lote["video"], lote["layout"], buffer=2))
+    assert registros == esperados
+    assert len(registros) == lote["quadros"]
+
+
+def test_fechar_o_gerador_para_a_producao(lote, capturas):
+    gerador = ocupacao(lote["video"], lote["layout"], loop=True, buffer=1)
+    next(gerador)
+    assert len(capturas.abertas) == 1 and not capturas.abertas[0].liberada
+
+    gerador.close()
+    assert capturas.abertas[0].liberada
+
+
+def test_sair_do_with_para_a_thread(lote, capturas):
+    with FluxoOcupacao(lote["video"], lote["layout"], loop=True, buffer=1) as fluxo_:
+        next(fluxo_)
+        thread = fluxo_._thread
+        assert thread.is_alive()
+    assert not thread.is_alive()
+    assert capturas.abertas[0].liberada
+    # o buffer limita a produção: o consumidor leu 1, a fila guarda 1
+    assert fluxo_.produzidos <= 3
+
+
+@pytest.mark.parametrize("usar_gerador", [False, True])
+def test_cancelar_a_task_libera_a_captura(lote, capturas, usar_gerador):
+    recebidos = []
+
+    async def consumir():
+        if usar_gerador:
+            fonte = ocupacao_async(lote["video"], lote["layout"], loop=True, buffer=1)
+        else:
+            fonte = FluxoOcupacao(lote["video"], lote["layout"], loop=True, buffer=1)
+        async for registro in fonte:
+            recebidos.append(registro)
+
+    async def principal():
+        task = asyncio.create_task(consumir())
+        while len(recebidos) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(principal())
+    assert _esperar(lambda: capturas.abertas[0].liberada)
+
+
+def test_erro_na_producao_chega_ao_consumidor(lote, tmp_path):
+    with pytest.raises(IOError, match="não foi possível abrir"):
+        next(ocupacao(tmp_path / "nao_existe.avi", lote["layout"]))
+    with pytest.raises(ValueError, match="feature_mode"):
+        list(ocupacao(lote["video"], lote["layout"], feature_mode="inexistente"))
+
+
+def test_erro_na_producao_chega_ao_consumidor_async(lote):
+    async def consumir():
+        return [registro async for registro in ocupacao_async(lote["video"], lote["layout"],
+                                                               feature_mode="inexistente")]
+
+    with pytest.raises(ValueError, match="feature_mode"):
+        asyncio.run(consumir())
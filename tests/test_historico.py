@@ -0,0 +1,96 @@
+import os
+import numpy as np
+import pytest
+from src.historico import DESCONHECIDA, GravadorHistorico, HistoricoOcupacao
+
+VAGAS = 12
+CONFIRMACOES = 3
+
+
+def _quadros(n: int = 300, semente: int = 0) -> list:
+    """Letras por quadro: cada vaga alterna entre livre e ocupada, com ruído e quadros sem avaliação"""
+    rng = np.random.default_rng(semente)
+    estado = rng.random(VAGAS) < 0.5
+    quadros = []
+    for _ in range(n):
+        estado ^= rng.random(VAGAS) < 0.08
+        observado = estado ^ (rng.random(VAGAS) < 0.1)
+        letras = np.where(observado, "L", "O")
+        letras[rng.random(VAGAS) < 0.1] = "-"
+        quadros.append("".join(letras))
+    return quadros
+
+
+def _forca_bruta(quadros: list, retomadas: tuple = ()) -> np.ndarray:
+    """Debounce vaga a vaga, quadro a quadro; numa retomada só o estado confirmado sobrevive"""
+    codigo = {"L": 1, "O": 0}
+    esperado = np.empty((len(quadros), VAGAS), dtype=np.int8)
+    for vaga in range(VAGAS):
+        confirmado, candidato, seguidos = DESCONHECIDA, None, 0
+        for i, letras in enumerate(quadros):
+            if i in retomadas:
+                candidato, seguidos = None, 0
+            letra = letras[vaga]
+            if letra != "-":
+                if codigo[letra] == confirmado:
+                    candidato, seguidos = None, 0
+                elif codigo[letra] == candidato:
+                    seguidos += 1
+                else:
+                    candidato, seguidos = codigo[letra], 1
+                if seguidos >= CONFIRMACOES:
+                    confirmado, candidato, seguidos = candidato, None, 0
+            esperado[i, vaga] = confirmado
+    return esperado
+
+
+def _gravar(caminho, quadros: list, tempos: np.ndarray, tamanho_bloco: int):
+    with GravadorHistorico(caminho, VAGAS, confirmacoes=CONFIRMACOES, tamanho_bloco=tamanho_bloco) as gravador:
+        for t, letras in zip(tempos, quadros):
+            gravador.registrar(t, letras)
+
+
+@pytest.mark.parametrize("tamanho_bloco", [1, 7, 4096])
+def test_linha_do_tempo_igual_ao_debounce_por_forca_bruta(tmp_path, tamanho_bloco):
+    quadros = _quadros()
+    tempos = np.arange(len(quadros)) * 33
+    caminho = tmp_path / "h.hist"
+    _gravar(caminho, quadros, tempos, tamanho_bloco)
+
+    esperado = _forca_bruta(quadros)
+    with HistoricoOcupacao(caminho) as historico:
+        assert historico.transicoes_total == int(np.count_nonzero(np.diff(esperado, axis=0))
+                                                 + np.count_nonzero(esperado[0] != DESCONHECIDA))
+        np.testing.assert_array_equal(historico.linha_do_tempo(tempos), esperado)
+        zona = [1, 4, 9]
+        np.testing.assert_array_equal(historico.linha_do_tempo(tempos[50:200], zona), esperado[50:200][:, zona])
+        for i in (0, 99, len(tempos) - 1):
+            np.testing.assert_array_equal(historico.estado_em(tempos[i]), esperado[i])
+
+
+@pytest.mark.parametrize("lixo", [b"BLOC\x05\x00", b"BLOC" + (5).to_bytes(4, "little") + bytes(20)])
+def test_reabrir_com_bloco_truncado_no_fim(tmp_path, lixo):
+    quadros = _quadros(semente=1)
+    tempos = np.arange(len(quadros)) * 33
+    caminho = tmp_path / "h.hist"
+    metade = len(quadros) // 2
+    _gravar(caminho, quadros[:metade], tempos[:metade], tamanho_bloco=16)
+
+    # queda no meio da gravação de um bloco: o .idx não foi atualizado
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, "ab") as f:
+        f.write(lixo)
+
+    esperado = _forca_bruta(quadros, retomadas=(metade,))
+    with HistoricoOcupacao(caminho) as historico:
+        np.testing.assert_array_equal(historico.linha_do_tempo(tempos[:metade]), esperado[:metade])
+
+    # o gravador descarta o bloco incompleto e continua do último estado gravado
+    with GravadorHistorico(caminho, VAGAS, confirmacoes=CONFIRMACOES, tamanho_bloco=16) as gravador:
+        assert os.path.getsize(caminho) == tamanho
+        for t, letras in zip(tempos[metade:], quadros[metade:]):
+            gravador.registrar(t, letras)
+
+    with HistoricoOcupacao(caminho) as historico:
+        np.testing.assert_array_equal(historico.linha_do_tempo(tempos), esperado)
+        assert historico.t_fim <= tempos[-1]
@@ -0,0 +1,174 @@
+import pickle
+from pathlib import Path
+from types import SimpleNamespace
+import cv2
+import numpy as np
+import pytest
+from src import layout
+from src.layout import IndiceVagas, JournalLayout
+
+
+def _layout(tmp_path, posicoes=None) -> Path:
+    caminho = tmp_path / "estacionamentoPos"
+    if posicoes is not None:
+        caminho.write_bytes(pickle.dumps(posicoes))
+    return caminho
+
+
+def test_diario_reaplicado_depois_de_queda_antes_da_compactacao(tmp_path):
+    caminho = _layout(tmp_path, [(1, 1)])
+    journal = JournalLayout(caminho, atraso=60)
+    journal.carregar()
+    journal.adicionar((2, 2))
+    journal.adicionar((3, 3))
+    journal.remover(0)
+    # queda: o pickle ainda é o original, as edições só estão no diário
+    assert pickle.loads(caminho.read_bytes()) == [(1, 1)]
+
+    reaberto = JournalLayout(caminho)
+    assert reaberto.carregar() == [(2, 2), (3, 3)]
+    # a recuperação já compacta
+    assert pickle.loads(caminho.read_bytes()) == [(2, 2), (3, 3)]
+    assert not reaberto.caminho_journal.exists()
+
+
+def test_diario_descartado_se_a_base_ja_foi_trocada(tmp_path, monkeypatch):
+    caminho = _layout(tmp_path, [(1, 1)])
+    journal = JournalLayout(caminho)
+    journal.carregar()
+    journal.adicionar((2, 2))
+
+    # queda logo depois do os.replace, antes de apagar o diário
+    class Queda(Exception):
+        pass
+
+    def cair(self, *args, **kwargs):
+        raise Queda()
+
+    with monkeypatch.context() as m:
+        m.setattr(Path, "unlink", cair)
+        with pytest.raises(Queda):
+            journal.compactar()
+    assert journal.caminho_journal.exists()
+
+    reaberto = JournalLayout(caminho)
+    # o diário vale para o pickle antigo: reaplicar duplicaria a vaga
+    assert reaberto.carregar() == [(1, 1), (2, 2)]
+    assert not reaberto.caminho_journal.exists()
+
+
+def test_linha_truncada_encerra_a_reaplicacao(tmp_path):
+    caminho = _layout(tmp_path, [])
+    journal = JournalLayout(caminho, atraso=60)
+    journal.carregar()
+    journal.adicionar((1, 1))
+    journal.adicionar((2, 2))
+    with open(journal.caminho_journal, "a", encoding="utf-8") as f:
+        f.write('{"op": "remover", "ind')
+
+    assert JournalLayout(caminho).carregar() == [(1, 1), (2, 2)]
+
+
+def test_compacta_so_depois_do_atraso_sem_edicoes(tmp_path, monkeypatch):
+    relogio = [100.0]
+    monkeypatch.setattr(layout, "time", SimpleNamespace(monotonic=lambda: relogio[0]))
+    caminho = _layout(tmp_path, [])
+    journal = JournalLayout(caminho, atraso=1.0)
+    journal.carregar()
+
+    assert not journal.compactar_se_ocioso()
+    journal.adicionar((1, 1))
+    relogio[0] += 0.6
+    assert not journal.compactar_se_ocioso()
+    # uma edição nova reinicia a contagem
+    journal.adicionar((2, 2))
+    relogio[0] += 0.6
+    assert not journal.compactar_se_ocioso()
+    assert pickle.loads(caminho.read_bytes()) == []
+
+    relogio[0] += 0.4
+    assert journal.compactar_se_ocioso()
+    assert pickle.loads(caminho.read_bytes()) == [(1, 1), (2, 2)]
+    assert not journal.caminho_journal.exists()
+    assert not journal.compactar_se_ocioso()
+
+
+def _poligonos(n: int = 1200, semente: int = 0) -> list:
+    """Retângulos rotacionados com cantos inteiros, muitos cruzando bordas de célula e se sobrepondo"""
+    rng = np.random.default_rng(semente)
+    poligonos = []
+    for _ in range(n):
+        centro = rng.uniform(0, 2000, 2)
+        tamanho = rng.uniform(8, 150, 2)
+        angulo = rng.choice([0, 0, 15, 45, -30, rng.uniform(-90, 90)])
+        poligonos.append(np.round(cv2.boxPoints((tuple(centro), tuple(tamanho), float(angulo)))).astype(np.float32))
+    return poligonos
+
+
+def _pontos(poligonos: list, semente: int = 1) -> list:
+    """Pontos aleatórios, cantos e pontos exatamente sobre as arestas"""
+    rng = np.random.default_rng(semente)
+    pontos = [tuple(p) for p in rng.uniform(-50, 2050, (3000, 2))]
+    for poligono in poligonos[::5]:
+        a, b = poligono[0], poligono[1]
+        pontos += [tuple(a), tuple((a + b) / 2), tuple(a + (b - a) * 0.25)]
+    # bordas das células da grade
+    pontos += [(64.0 * i, 64.0 * j) for i in range(0, 32, 3) for j in range(0, 32, 3)]
+    return pontos
+
+
+def _vaga_em_linear(poligonos: list, x: float, y: float) -> int | None:
+    """A busca de antes do índice: todas as vagas, em ordem"""
+    for index, poligono in enumerate(poligonos):
+        if cv2.pointPolygonTest(poligono, (float(x), float(y)), False) >= 0:
+            return index
+    return None
+
+
+def _no_retangulo_linear(poligonos: list, x0, y0, x1, y1) -> list:
+    return [i for i, p in enumerate(poligonos)
+            if p[:, 0].min() <= x1 and p[:, 0].max() >= x0 and p[:, 1].min() <= y1 and p[:, 1].max() >= y0]
+
+
+def test_vaga_em_igual_a_busca_linear():
+    poligonos = _poligonos()
+    indice = IndiceVagas(poligonos)
+    encontradas = 0
+    for x, y in _pontos(poligonos):
+        esperado = _vaga_em_linear(poligonos, x, y)
+        assert indice.vaga_em(x, y) == esperado, (x, y)
+        encontradas += esperado is not None
+    assert encontradas > 500
+
+
+def test_vagas_no_retangulo_e_na_regiao():
+    poligonos = _poligonos(semente=2)
+    indice = IndiceVagas(poligonos)
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        x0, y0, x1, y1 = rng.uniform(0, 2000, 4)
+        esperado = _no_retangulo_linear(poligonos, min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        assert indice.vagas_no_retangulo(x0, y0, x1, y1) == esperado
+
+    regiao = np.array([(100, 100), (1500, 300), (1200, 1700), (200, 1200)], dtype=np.float32)
+    esperado = [i for i, p in enumerate(poligonos)
+                if cv2.pointPolygonTest(regiao, tuple(float(v) for v in p.mean(axis=0)), False) >= 0]
+    assert indice.vagas_na_regiao(regiao) == esperado
+    assert len(esperado) > 100
+
+
+def test_remover_igual_a_reindexar():
+    poligonos = _poligonos(300, semente=4)
+    indice = IndiceVagas(poligonos)
+    restantes = list(poligonos)
+    rng = np.random.default_rng(5)
+    # a primeira, a última (por índice e por -1) e ao acaso
+    for index in [0, len(restantes) - 2, -1] + list(rng.integers(0, 200, 40)):
+        indice.remover(int(index))
+        restantes.pop(int(index))
+
+    novo = IndiceVagas(restantes)
+    assert len(indice) == len(novo)
+    assert dict(indice._grade) == dict(novo._grade)
+    for x, y in _pontos(restantes):
+        assert indice.vaga_em(x, y) == _vaga_em_linear(restantes, x, y)
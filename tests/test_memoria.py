@@ -0,0 +1,101 @@
+import threading
+import time
+import cv2
+import numpy as np
+import pytest
+from src.memoria import AnelQuadros, processar_em_memoria
+from src.utils import EstacionaClassifier
+
+
+def _quadro(valor: int) -> np.ndarray:
+    return np.full((4, 5, 3), valor, dtype=np.uint8)
+
+
+def test_anel_sem_sobrescrita_espera_o_consumidor():
+    anel = AnelQuadros.criar((4, 5), slots=2, consumidores=1)
+    leitor = AnelQuadros.abrir(anel.nome).como_consumidor(0)
+    try:
+        anel.escrever(_quadro(0), 0, 0.0, sobrescrever=False)
+        anel.escrever(_quadro(1), 1, 33.3, sobrescrever=False)
+        # o slot do quadro 0 ainda não foi concluído: o escritor espera (aqui, até `parar`)
+        parar = threading.Event()
+        parar.set()
+        assert anel.reservar(sobrescrever=False, parar=parar) is None
+
+        seq, frame_idx, _, quadro = leitor.proximo(timeout=0)
+        assert (seq, frame_idx, int(quadro[0, 0, 0])) == (0, 0, 0)
+        leitor.concluir(seq)
+        anel.escrever(_quadro(2), 2, 66.7, sobrescrever=False)
+
+        lidos = []
+        anel.encerrar_escrita()
+        while (item := leitor.proximo(timeout=0)) is not None:
+            lidos.append(int(item[3][0, 0, 0]))
+            leitor.concluir(item[0])
+        assert lidos == [1, 2]
+        assert leitor.perdidos == 0 and anel.sobrescritos == 0
+    finally:
+        leitor.fechar()
+        anel.fechar()
+
+
+def test_anel_com_sobrescrita_pula_para_o_mais_antigo():
+    anel = AnelQuadros.criar((4, 5), slots=3, consumidores=1)
+    leitor = AnelQuadros.abrir(anel.nome).como_consumidor(0)
+    try:
+        for valor in range(5):
+            anel.escrever(_quadro(valor), valor, 0.0, sobrescrever=True)
+        assert anel.sobrescritos == 2
+
+        seq, _, _, quadro = leitor.proximo(timeout=0)
+        assert seq == 2 and int(quadro[0, 0, 0]) == 2
+        assert leitor.perdidos == 2
+    finally:
+        leitor.fechar()
+        anel.fechar()
+
+
+def test_registros_em_ordem_sem_perdas(lote):
+    estatisticas = {}
+    registros = list(processar_em_memoria(lote["video"], lote["layout"], consumidores=2, slots=4,
+                                          estatisticas=estatisticas))
+
+    assert [registro["frame"] for registro in registros] == list(range(lote["quadros"]))
+    assert estatisticas["classificados"] == lote["quadros"]
+    assert estatisticas["perdidos"] == estatisticas["sobrescritos"] == estatisticas["descartados"] == 0
+
+
+def test_um_consumidor_igual_ao_sequencial(lote):
+    classifier = EstacionaClassifier(lote["layout"])
+    cap = cv2.VideoCapture(str(lote["video"]))
+    esperados = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        esperados.append(classifier.classificar_quadro(frame).estado())
+    cap.release()
+
+    registros = list(processar_em_memoria(lote["video"], lote["layout"], consumidores=1))
+    assert [registro["estado"] for registro in registros] == esperados
+
+
+def test_consumidor_com_falha_levanta_erro(lote):
+    # o classificador falha ao ser criado: o pai precisa levantar o erro, não esperar para sempre
+    saida = {}
+
+    def executar():
+        inicio = time.perf_counter()
+        try:
+            list(processar_em_memoria(lote["video"], lote["layout"], consumidores=2, feature_mode="inexistente"))
+        except Exception as e:
+            saida["erro"] = e
+        saida["segundos"] = time.perf_counter() - inicio
+
+    thread = threading.Thread(target=executar, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "processar_em_memoria travou com um consumidor que falhou"
+    with pytest.raises(RuntimeError, match="feature_mode"):
+        raise saida["erro"]
+    assert saida["segundos"] < 10
@@ -0,0 +1,110 @@
+import threading
+import time
+from src.multicamera import MotorMultiCamera
+
+
+def _lento(fonte, segundos: float, vigia: dict):
+    """Classificação mais lenta que o decode, contando quantos quadros da câmera estão em processamento"""
+    classificar = fonte.classifier.classificar_quadro
+
+    def classificar_devagar(frame):
+        with vigia["lock"]:
+            vigia["em_voo"][fonte.nome] = vigia["em_voo"].get(fonte.nome, 0) + 1
+            vigia["maximo"] = max(vigia["maximo"], vigia["em_voo"][fonte.nome])
+        try:
+            time.sleep(segundos)
+            return classificar(frame)
+        finally:
+            with vigia["lock"]:
+                vigia["em_voo"][fonte.nome] -= 1
+
+    fonte.classifier.classificar_quadro = classificar_devagar
+
+
+def _vigia() -> dict:
+    return {"lock": threading.Lock(), "em_voo": {}, "maximo": 0}
+
+
+def test_rodizio_com_um_quadro_por_camera(lote):
+    ordem = []
+    motor = MotorMultiCamera(workers=1, ao_registrar=lambda registro: ordem.append(registro["camera"]))
+    vigia = _vigia()
+    for nome in ("a", "b", "c"):
+        fonte = motor.adicionar_camera(nome, lote["video"], lote["layout"], descartar_antigos=False)
+        _lento(fonte, 0.005, vigia)
+
+    motor.iniciar()
+    assert motor.aguardar(timeout=60)
+    motor.parar()
+
+    assert len(ordem) == 3 * lote["quadros"]
+    assert vigia["maximo"] == 1
+    # com as três filas cheias nenhuma câmera é atendida duas vezes antes das outras
+    for i in range(6, len(ordem) - 6):
+        assert len(set(ordem[i - 2:i + 1])) == 3, ordem[i - 2:i + 1]
+
+
+def test_no_maximo_um_quadro_por_camera_com_varios_workers(lote):
+    motor = MotorMultiCamera(workers=4)
+    vigia = _vigia()
+    for nome in ("a", "b"):
+        _lento(motor.adicionar_camera(nome, lote["video"], lote["layout"], descartar_antigos=False), 0.002, vigia)
+
+    motor.iniciar()
+    assert motor.aguardar(timeout=60)
+    motor.parar()
+    assert vigia["maximo"] == 1
+    assert all(e["classificados"] == lote["quadros"] for e in motor.estatisticas().values())
+
+
+def test_descartar_antigos_perde_quadros(lote):
+    motor = MotorMultiCamera(workers=1)
+    fonte = motor.adicionar_camera("a", lote["video"], lote["layout"], profundidade=1, descartar_antigos=True)
+    _lento(fonte, 0.02, _vigia())
+
+    motor.iniciar()
+    assert motor.aguardar(timeout=60)
+    motor.parar()
+
+    estatisticas = motor.estatisticas()["a"]
+    assert estatisticas["decodificados"] == lote["quadros"]
+    assert estatisticas["descartados"] > 0
+    assert estatisticas["classificados"] + estatisticas["descartados"] == lote["quadros"]
+
+
+def test_contrapressao_segura_o_decodificador(lote):
+    motor = MotorMultiCamera(workers=1)
+    fonte = motor.adicionar_camera("a", lote["video"], lote["layout"], profundidade=2, descartar_antigos=False)
+    _lento(fonte, 0.01, _vigia())
+
+    motor.iniciar()
+    adiantamento = 0
+    while not motor.aguardar(timeout=0.002):
+        estatisticas = motor.estatisticas()["a"]
+        adiantamento = max(adiantamento, estatisticas["decodificados"] - estatisticas["classificados"])
+    motor.parar()
+
+    # fila cheia (profundidade) mais o quadro em classificação
+    assert 0 < adiantamento <= 2 + 1
+    estatisticas = motor.estatisticas()["a"]
+    assert estatisticas["descartados"] == 0
+    assert estatisticas["classificados"] == lote["quadros"]
+
+
+def test_parar_encerra_todas_as_threads(lote):
+    antes = set(threading.enumerate())
+    motor = MotorMultiCamera(workers=2)
+    for nome in ("a", "b"):
+        # em loop e sem consumir rápido: as threads nunca terminariam sozinhas
+        fonte = motor.adicionar_camera(nome, lote["video"], lote["layout"], descartar_antigos=False, loop=True)
+        _lento(fonte, 0.005, _vigia())
+
+    motor.iniciar()
+    time.sleep(0.2)
+    assert set(threading.enumerate()) - antes
+
+    parada = threading.Thread(target=motor.parar, daemon=True)
+    parada.start()
+    parada.join(timeout=10)
+    assert not parada.is_alive(), "parar() não retornou"
+    assert not {t for t in set(threading.enumerate()) - antes if t is not parada and t.is_alive()}
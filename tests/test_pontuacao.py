@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+import pytest
+from src.parametros import ParametrosClassificacao
+from src.pontuacao import (PontuadorArvores, PontuadorLogistico, PontuadorRegras, carregar_pontuador,
+                           montar_matriz, salvar_pontuador, treinar_arvores, treinar_logistico)
+from src.utils import EstacionaClassifier
+
+
+def _cascata(count, limiar, edge_density, texture_score, color_std, p=ParametrosClassificacao()) -> np.ndarray:
+    """A decisão de antes dos pontuadores, escrita sobre as features cruas"""
+    score = np.zeros(len(count))
+    score += np.where(count < limiar, p.peso_count, 0)
+    score += np.where(edge_density < p.limite_bordas, p.peso_bordas, 0)
+    score += np.where(texture_score < p.limite_textura, p.peso_textura, 0)
+    score += np.where(color_std < p.limite_cor, p.peso_cor, 0)
+    return score
+
+
+def test_regras_igual_a_cascata_nos_limites():
+    rng = np.random.default_rng(0)
+    p = ParametrosClassificacao()
+    n = 5000
+    limiar = rng.integers(0, 2000, n)
+    # metade dos counts exatamente no limiar ou a um pixel dele
+    count = np.where(rng.random(n) < 0.5, limiar + rng.integers(-1, 2, n), rng.integers(0, 3000, n))
+    bordas = np.where(rng.random(n) < 0.3, p.limite_bordas, rng.random(n) * 0.3)
+    textura = np.where(rng.random(n) < 0.3, p.limite_textura, rng.random(n) * 300)
+    cor = np.where(rng.random(n) < 0.3, p.limite_cor, rng.random(n) * 60)
+
+    score = PontuadorRegras().pontuar(montar_matriz(count, limiar, bordas, textura, cor))
+    assert np.array_equal(score, _cascata(count, limiar, bordas, textura, cor))
+
+
+def test_regras_igual_a_cascata_no_lote(lote):
+    classifier = EstacionaClassifier(lote["layout"])
+    limiares = []
+    calcular = classifier._calculate_dynamic_threshold
+
+    def gravar_limiar(*args):
+        limiares.append(calcular(*args))
+        return limiares[-1]
+
+    classifier._calculate_dynamic_threshold = gravar_limiar
+    cap = cv2.VideoCapture(str(lote["video"]))
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        resultado = classifier.classificar_quadro(frame)
+        count, _, edge_density, texture_score, color_std = resultado.features.T
+        esperado = _cascata(count.astype(np.int64), limiares[-1], edge_density, texture_score, color_std)
+        assert np.array_equal(resultado.score, esperado)
+        assert np.array_equal(resultado.is_empty, esperado >= ParametrosClassificacao.limite_score)
+    cap.release()
+    assert len(limiares) == lote["quadros"]
+
+
+def _exemplos(n: int = 600, semente: int = 0) -> tuple:
+    rng = np.random.default_rng(semente)
+    matriz = np.column_stack([rng.normal(0, 1, n), rng.random(n) * 0.3, rng.random(n) * 300, rng.random(n) * 60])
+    rotulos = (matriz[:, 0] < 0) & (matriz[:, 2] < 200) | (rng.random(n) < 0.05)
+    return matriz, rotulos
+
+
+@pytest.mark.parametrize("treinar, classe", [
+    (lambda m, r: treinar_logistico(m, r, limite=0.4), PontuadorLogistico),
+    (lambda m, r: treinar_arvores(m, r, arvores=10, limite=0.6), PontuadorArvores),
+])
+def test_modelo_treinado_sobrevive_a_salvar_e_carregar(tmp_path, treinar, classe):
+    matriz, rotulos = _exemplos()
+    pontuador = treinar(matriz, rotulos)
+    # o modelo aprende alguma coisa: melhor que chutar a classe mais comum
+    acerto = np.mean((pontuador.pontuar(matriz) >= pontuador.limite) == rotulos)
+    assert acerto > max(rotulos.mean(), 1 - rotulos.mean())
+
+    caminho = tmp_path / "modelo.npz"
+    salvar_pontuador(pontuador, caminho)
+    carregado = carregar_pontuador(caminho)
+
+    assert isinstance(carregado, classe)
+    assert carregado.limite == pontuador.limite
+    assert carregado.assinatura() == pontuador.assinatura()
+    novos, _ = _exemplos(semente=1)
+    assert np.array_equal(carregado.pontuar(novos), pontuador.pontuar(novos))
+
+
+def test_regras_nao_sao_salvas(tmp_path):
+    with pytest.raises(ValueError):
+        salvar_pontuador(PontuadorRegras(), tmp_path / "regras.npz")
@@ -0,0 +1,85 @@
+import asyncio
+import base64
+import json
+import os
+from src.servidor import ServidorOcupacao
+
+
+async def _http(porta: int, requisicao: str) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    writer.write(requisicao.encode())
+    await writer.drain()
+    dados = await reader.read()
+    writer.close()
+    cabecalho, _, corpo = dados.partition(b"\r\n\r\n")
+    linhas = cabecalho.decode().split("\r\n")
+    cabecalhos = {nome.lower(): valor.strip() for nome, _, valor in (l.partition(":") for l in linhas[1:])}
+    return int(linhas[0].split()[1]), cabecalhos, corpo
+
+
+def _get(caminho: str, **cabecalhos) -> str:
+    extras = "".join(f"{nome.replace('_', '-')}: {valor}\r\n" for nome, valor in cabecalhos.items())
+    return f"GET {caminho} HTTP/1.1\r\nHost: teste\r\nConnection: close\r\n{extras}\r\n"
+
+
+async def _primeira_mensagem_ws(porta: int, caminho: str) -> dict:
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    chave = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET {caminho} HTTP/1.1\r\nHost: teste\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {chave}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    cabecalho = await reader.readuntil(b"\r\n\r\n")
+    assert cabecalho.split(b"\r\n")[0].split()[1] == b"101"
+
+    primeiro, segundo = await reader.readexactly(2)
+    tamanho = segundo & 0x7F
+    if tamanho == 126:
+        tamanho = int.from_bytes(await reader.readexactly(2), "big")
+    elif tamanho == 127:
+        tamanho = int.from_bytes(await reader.readexactly(8), "big")
+    assert primeiro & 0x0F == 0x1
+    mensagem = json.loads(await reader.readexactly(tamanho))
+    writer.close()
+    return mensagem
+
+
+async def _cenario(lote: dict):
+    servidor = ServidorOcupacao(porta=0, workers=1)
+    servidor.adicionar_camera("teste", str(lote["video"]), str(lote["layout"]))
+    await servidor.iniciar()
+    try:
+        porta = servidor.porta
+        # sem loop o vídeo acaba e o estado para de mudar: o ETag fica estável
+        for _ in range(600):
+            if servidor.estatisticas()["cameras"]["teste"]["terminou"]:
+                break
+            await asyncio.sleep(0.05)
+
+        status, cabecalhos, corpo = await _http(porta, _get("/cameras/teste"))
+        assert status == 200
+        snapshot = json.loads(corpo)
+        assert snapshot["pronto"] and len(snapshot["estado"]) == lote["n_vagas"]
+
+        status, _, corpo = await _http(porta, _get("/cameras/teste", If_None_Match=cabecalhos["etag"]))
+        assert status == 304 and corpo == b""
+
+        mensagem = await _primeira_mensagem_ws(porta, "/ws/teste")
+        assert mensagem["tipo"] == "snapshot"
+        assert (mensagem["versao"], mensagem["estado"]) == (snapshot["versao"], snapshot["estado"])
+
+        status, _, _ = await _http(porta, "GET /cameras HTTP/1.1\r\nContent-Length: abc\r\nConnection: close\r\n\r\n")
+        assert status == 400
+        status, _, _ = await _http(porta, "GET /cameras HTTP/1.1\r\nContent-Length: -5\r\nConnection: close\r\n\r\n")
+        assert status == 400
+        status, _, _ = await _http(porta, "GET /cameras HTTP/1.1\r\nContent-Length: 999999999\r\n"
+                                          "Connection: close\r\n\r\n")
+        assert status == 400
+
+        # o servidor continua atendendo depois das requisições inválidas
+        status, _, _ = await _http(porta, _get("/estatisticas"))
+        assert status == 200
+    finally:
+        await servidor.encerrar()
+
+
+def test_http_etag_e_snapshot_websocket(lote):
+    asyncio.run(asyncio.wait_for(_cenario(lote), 60))
@@ -0,0 +1,33 @@
+import pytest
+from src import shards
+from src.batch import main
+
+
+def _lote(lote, destino, *opcoes) -> bytes:
+    assert main([str(lote["video"]), "--layout", str(lote["layout"]), "-o", str(destino), *opcoes]) == 0
+    return destino.read_bytes()
+
+
+@pytest.mark.parametrize("opcoes", [[], ["--every-n", "3"]])
+def test_workers_igual_ao_sequencial(lote, tmp_path, opcoes):
+    # o aquecimento padrão (300) cobre o vídeo todo: a saída tem que ser idêntica
+    sequencial = _lote(lote, tmp_path / "seq.csv", *opcoes)
+    paralelo = _lote(lote, tmp_path / "par.csv", "--workers", "2", "--shards", "5", *opcoes)
+    assert paralelo == sequencial
+    assert sequencial.count(b"\n") > 1
+
+
+def test_faixas_padrao_pelo_orcamento_de_quadros(lote, monkeypatch):
+    monkeypatch.setattr(shards, "QUADROS_POR_SHARD", 6)
+    estatisticas = {}
+    registros = list(shards.processar_em_shards(lote["video"], lote["layout"], workers=2,
+                                                estatisticas=estatisticas))
+
+    assert estatisticas["shards"] == -(-lote["quadros"] // 6)
+    assert [registro["frame"] for registro in registros] == list(range(lote["quadros"]))
+    assert estatisticas["classificados"] == lote["quadros"]
+
+
+def test_dividir_em_shards():
+    assert shards.dividir_em_shards(10, 3) == [(0, 4), (4, 8), (8, None)]
+    assert shards.dividir_em_shards(2, 5) == [(0, 1), (1, None)]
@@ -0,0 +1,25 @@
+import cv2
+import numpy as np
+from src.utils import EstacionaClassifier
+
+
+def test_regras_detectam_vagas_livres_do_lote_sintetico(lote):
+    gabarito = np.load(lote["gabarito"])
+    classifier = EstacionaClassifier(lote["layout"])
+    cap = cv2.VideoCapture(str(lote["video"]))
+
+    vp = previstas = 0
+    for quadro in range(len(gabarito)):
+        ok, frame = cap.read()
+        assert ok
+        resultado = classifier.classificar_quadro(frame)
+        esperado = gabarito[quadro, resultado.ids]
+        vp += int(np.count_nonzero(resultado.is_empty & esperado))
+        previstas += int(np.count_nonzero(resultado.is_empty))
+    cap.release()
+
+    livres = int(np.count_nonzero(gabarito))
+    assert 0 < livres < gabarito.size
+    # as regras históricas precisam enxergar as vagas vazias desenhadas pelo gerador
+    assert vp / livres >= 0.8
+    assert vp / previstas >= 0.8
@@ -0,0 +1,25 @@
+from benchmarks.varredura import escolher
+
+
+def _resultado(fps, precisao, recall, f1, nome):
+    return {"config": {"nome": nome}, "fps": fps, "precisao": precisao, "recall": recall, "f1": f1}
+
+
+RESULTADOS = [
+    _resultado(300.0, 0.0, 0.0, 0.0, "cega"),
+    _resultado(120.0, 0.9, 0.8, 0.85, "rapida"),
+    _resultado(60.0, 0.97, 0.95, 0.96, "precisa"),
+]
+
+
+def test_sem_metas_escolhe_melhor_f1():
+    assert escolher(RESULTADOS)["config"]["nome"] == "precisa"
+
+
+def test_com_metas_escolhe_a_mais_rapida_que_atinge():
+    assert escolher(RESULTADOS, precisao_min=0.85, recall_min=0.7)["config"]["nome"] == "rapida"
+
+
+def test_recall_zero_nunca_e_escolhida():
+    assert escolher(RESULTADOS[:1]) is None
+    assert escolher(RESULTADOS[:1], precisao_min=0.0, recall_min=0.0) is None